@@ -0,0 +1,695 @@
+"""bench.py: Benchmarks for mjscore.
+
+Usage:
+  python -m mjstat.bench import-time [--repeat <N>] [--threshold <MS>]
+    [--forbid <MODULE> ...] [-- <mjscore arguments> ...]
+  python -m mjstat.bench run [--games <N>] [--seed <N>] [--repeat <N>]
+    [--memory] [--label <TEXT>] [-o | --output <FILE>] [<INPUT> ...]
+  python -m mjstat.bench compare [--tolerance <RATE>] <BASE> <NEW>
+  python -m mjstat.bench patterns [--games <N>] [--seed <N>] [--repeat <N>]
+    [<INPUT> ...]
+"""
+
+from __future__ import annotations
+
+import datetime
+import json
+import os
+import platform
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from argparse import Namespace
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, NotRequired, TypedDict
+
+import click
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator, Mapping, Sequence
+    from typing import Final
+
+    from .profiling import CountingPattern
+
+# The script of the command line interface.
+MJSCORE_PATH: Final = Path(__file__).resolve().parent.parent / "mjscore"
+
+# The alternations of `mjstat.patterns`, by the prefixes of their names.
+ALTERNATIONS: Final = ("ROUND_STATE", "ROUND_CLOSING")
+
+# The states of `mjstat.streamparser.MJScoreStreamParser` given the lines of each
+# of `ALTERNATIONS`.
+STATE_METHODS: Final = {"ROUND_STATE": "round_state", "ROUND_CLOSING": "round_closing"}
+
+# `mjstat.patterns.WINNING_RE` before its value was restricted. On a line without ロン
+# or ツモ, e.g. 流局, the value runs to the end of the line and backtracks.
+LEGACY_WINNING_RE: Final = re.compile(
+    r"""
+    (?P<winning_value>.+)
+    (?P<winning_decl>(ロン|ツモ))
+    \s
+    (
+      ((?P<winning_yaku_with_dora>.+)
+        \s
+        ドラ(?P<winning_dora>\d+)
+      )|
+      (?P<winning_yaku_without_dora>.+)
+    )
+""",
+    re.VERBOSE,
+)
+
+# e.g. "import time:       473 |      32574 | click"
+IMPORT_TIME_RE: Final = re.compile(
+    r"^import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \| (?P<name>.*)$"
+)
+
+
+class StageResult(TypedDict):
+    """The cost of a stage of the pipeline.
+
+    Attributes:
+      :wall:         The elapsed time in seconds.
+      :cpu:          The CPU time of the process in seconds.
+      :peak_memory:  The peak size of memory allocated by the stage in bytes, which
+                     is measured by `tracemalloc` only if requested.
+    """
+
+    wall: float
+    cpu: float
+    peak_memory: NotRequired[int]
+
+
+class BenchmarkResult(TypedDict):
+    """The content of a JSON file written by command `run`.
+
+    Attributes:
+      :label:        An arbitrary label, e.g. a version or a commit.
+      :created_at:   The time the benchmark was run, in ISO 8601.
+      :python:       The version of Python.
+      :platform:     The platform.
+      :inputs:       The paths and the sizes of input files.
+      :games:        The number of games.
+      :rounds:       The number of rounds.
+      :stages:       The mapping from the names of stages to their costs.
+      :max_rss:      The maximum resident set size of the process in bytes.
+    """
+
+    label: str
+    created_at: str
+    python: str
+    platform: str
+    inputs: list[dict[str, object]]
+    games: int
+    rounds: int
+    stages: dict[str, StageResult]
+    max_rss: int
+
+
+def create_settings(**kwargs: object) -> Namespace:
+    """Return settings equivalent to the default command line arguments of mjscore
+    with `-F -Y -T all`, updated with `kwargs`.
+    """
+
+    settings = Namespace(
+        verbose=False,
+        language="en",
+        today=False,
+        since=None,
+        until=None,
+        target_player="all",
+        fundamental=True,
+        yaku=True,
+        start_hands=False,
+        head_to_head=False,
+        bootstrap=0,
+        bootstrap_unit="games",
+        seed=None,
+        cache=False,
+        cache_dir=None,
+        totals=False,
+        jobs=1,
+        columnar=False,
+        debug=False,
+    )
+    vars(settings).update(kwargs)
+    return settings
+
+
+@contextmanager
+def measure(
+    results: dict[str, StageResult],
+    name: str,
+    trace_memory: bool = False,
+) -> Iterator[None]:
+    """Measure the cost of the code in the `with` block as a stage named `name`.
+
+    If `trace_memory` is True, `tracemalloc` must have been started.
+    """
+
+    if trace_memory:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    wall, cpu = time.perf_counter(), time.process_time()
+    yield
+    result = StageResult(
+        wall=time.perf_counter() - wall,
+        cpu=time.process_time() - cpu,
+    )
+    if trace_memory:
+        result["peak_memory"] = tracemalloc.get_traced_memory()[1] - baseline
+    results[name] = result
+
+
+def run_pipeline(
+    source_paths: Sequence[str],
+    settings: Namespace,
+    trace_memory: bool = False,
+) -> tuple[dict[str, StageResult], int, int]:
+    """Run the stages of mjscore one by one and measure them.
+
+    The stages are the parse, `apply_transforms`, `create_player_stats`, each
+    `evaluate_*` function for all the players, `evaluate_players`,
+    `fill_template` and `tally_replays`.
+
+    Returns:
+      A tuple of the results of the stages, the number of games and the number of
+      rounds.
+    """
+
+    from .io import MJScoreFileInput
+    from .languages import get_language
+    from .model import apply_transforms, merge_games
+    from .reader import MJScoreReader
+    from .replay import tally_replays
+    from .stat import (
+        create_player_stats,
+        evaluate_losing,
+        evaluate_melding,
+        evaluate_placing,
+        evaluate_players,
+        evaluate_riichi,
+        evaluate_start_hands,
+        evaluate_winning,
+        evaluate_yaku_frequency,
+    )
+    from .streamparser import MJScoreStreamParser
+    from .writer import fill_template
+
+    results = dict[str, StageResult]()
+    reader = MJScoreReader()
+    parser = MJScoreStreamParser()
+
+    with measure(results, "parse", trace_memory):
+        sheet = merge_games([
+            reader.read(MJScoreFileInput(source_path=i), parser, settings)
+            for i in source_paths
+        ])
+
+    with measure(results, "apply_transforms", trace_memory):
+        apply_transforms(sheet)
+
+    games = sheet["games"]
+    player_names = {name for game in games for name in game["players"]}
+    with measure(results, "create_player_stats", trace_memory):
+        player_stats_list = create_player_stats(sheet, *player_names)
+
+    for func in (
+        evaluate_placing,
+        evaluate_winning,
+        evaluate_losing,
+        evaluate_riichi,
+        evaluate_melding,
+        evaluate_yaku_frequency,
+        evaluate_start_hands,
+    ):
+        with measure(results, func.__name__, trace_memory):
+            for player_stats in player_stats_list:
+                func(player_stats)
+
+    with measure(results, "evaluate_players", trace_memory):
+        evaluate_players(sheet, create_player_stats(sheet, *player_names))
+
+    with measure(results, "fill_template", trace_memory):
+        fill_template(player_stats_list, get_language(settings.language), True, True)
+
+    with measure(results, "tally_replays", trace_memory):
+        tally_replays(games)
+
+    return results, len(games), sum(len(i["rounds"]) for i in games)
+
+
+def collect_state_lines(
+    source_paths: Sequence[str],
+    settings: Namespace,
+) -> dict[str, list[str]]:
+    """Parse `source_paths` and return the lines each of `ALTERNATIONS` stands for
+    is given, i.e. the lines passed to the states of
+    `mjstat.streamparser.MJScoreStreamParser` in `STATE_METHODS`.
+    """
+
+    from .io import MJScoreFileInput
+    from .reader import MJScoreReader
+    from .streamparser import MJScoreStreamParser
+
+    def record(
+        method: Callable[[str, Iterator[str]], object],
+        strings: list[str],
+    ) -> Callable[[str, Iterator[str]], object]:
+        def wrapper(line: str, lines: Iterator[str]) -> object:
+            strings.append(line)
+            return method(line, lines)
+
+        return wrapper
+
+    lines: dict[str, list[str]] = {name: [] for name in ALTERNATIONS}
+    parser = MJScoreStreamParser()
+    # The states return each other through the attributes of the instance.
+    for name, method_name in STATE_METHODS.items():
+        setattr(parser, method_name, record(getattr(parser, method_name), lines[name]))
+
+    reader = MJScoreReader()
+    for i in source_paths:
+        reader.read(MJScoreFileInput(source_path=i), parser, settings)
+    return lines
+
+
+def create_matchers(
+    patterns: Mapping[str, re.Pattern[str] | CountingPattern],
+) -> dict[tuple[str, str], Callable[[str], object]]:
+    """Return the ways the lines of each of `ALTERNATIONS` are matched before and
+    after the alternation, by pairs of the name of the alternation and a case.
+
+    The cases are those of the docutils state machine, which tries the transitions
+    of a state in order, and of `mjstat.streamparser.MJScoreStreamParser`, which
+    tests line prefixes first.
+
+    Args:
+      :patterns: A mapping from the names of `mjstat.patterns` and
+                 `LEGACY_WINNING_RE` to the patterns, or to their proxies that count
+                 attempts.
+    """
+
+    hand_header = patterns["HAND_HEADER_RE"]
+    game_result = patterns["GAME_RESULT_RE"]
+    round_state = patterns["ROUND_STATE_RE"]
+    legacy_winning = patterns["LEGACY_WINNING_RE"]
+    draw = patterns["DRAW_RE"]
+    round_closing = patterns["ROUND_CLOSING_RE"]
+
+    def match_stream_state(line: str) -> object:
+        # The stream parser keeps matching the header lines of a round this way.
+        if line.startswith(("東", "南")) and (match := hand_header.match(line)):
+            return match
+        return line.startswith("-") and game_result.match(line)
+
+    def match_stream_closing(line: str) -> object:
+        if ("ロン" in line or "ツモ" in line) and (match := legacy_winning.match(line)):
+            return match
+        return draw.match(line)
+
+    return {
+        ("ROUND_STATE", "docutils before"): (
+            lambda line: hand_header.match(line) or game_result.match(line)
+        ),
+        ("ROUND_STATE", "docutils after"): round_state.match,
+        ("ROUND_STATE", "stream before"): match_stream_state,
+        ("ROUND_STATE", "stream after"): match_stream_state,
+        ("ROUND_CLOSING", "docutils before"): (
+            lambda line: legacy_winning.match(line) or draw.match(line)
+        ),
+        ("ROUND_CLOSING", "docutils after"): round_closing.match,
+        ("ROUND_CLOSING", "stream before"): match_stream_closing,
+        ("ROUND_CLOSING", "stream after"): round_closing.match,
+    }
+
+
+def measure_matchers(
+    matchers: Mapping[tuple[str, str], Callable[[str], object]],
+    lines: Mapping[str, Sequence[str]],
+    repeat: int = 1,
+) -> dict[tuple[str, str], float]:
+    """Return the shortest of `repeat` times per line in seconds to match the lines
+    of each alternation with each of `matchers`.
+
+    The matchers take turns in each repetition, so that a drift of the speed of the
+    machine affects all of them alike.
+    """
+
+    best = dict.fromkeys(matchers, float("inf"))
+    for _ in range(repeat):
+        for key, match in matchers.items():
+            strings = lines[key[0]]
+            start = time.perf_counter()
+            for line in strings:
+                match(line)
+            elapsed = (time.perf_counter() - start) / max(1, len(strings))
+            best[key] = min(best[key], elapsed)
+    return best
+
+
+def measure_import_time(args: Sequence[str]) -> tuple[float, set[str]]:
+    """Run mjscore once and return the time spent on imports in milliseconds and the
+    names of imported modules.
+
+    Args:
+      :args: Command line arguments of mjscore.
+    """
+
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", str(MJSCORE_PATH), *args],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+
+    total = 0
+    modules = set[str]()
+    for line in process.stderr.splitlines():
+        if m := IMPORT_TIME_RE.match(line):
+            total += int(m["self"])
+            modules.add(m["name"].strip())
+    return total / 1000, modules
+
+
+@click.group()
+@click.help_option(help="show this message and exit")
+def main() -> None:
+    """Benchmarks for mjscore."""
+
+
+@main.command("import-time")
+@click.option(
+    "-n",
+    "--repeat",
+    type=click.IntRange(min=1),
+    default=10,
+    metavar="N",
+    help="run mjscore N times",
+)
+@click.option(
+    "--threshold",
+    type=float,
+    default=120.0,
+    metavar="MS",
+    help="fail if the median import time exceeds MS milliseconds",
+)
+@click.option(
+    "--forbid",
+    multiple=True,
+    default=("docutils", "jinja2", "dateutil"),
+    metavar="MODULE",
+    help="fail if MODULE is imported (repeatable)",
+)
+@click.argument("args", nargs=-1)
+def import_time(
+    repeat: int,
+    threshold: float,
+    forbid: Sequence[str],
+    args: Sequence[str],
+) -> None:
+    """Measure the time mjscore spends on imports.
+
+    ARGS are passed to mjscore; the default is `--version`. For arguments that
+    analyze games, e.g. `-- -F --since 2016/01/01 mjscore.txt`, relax `--forbid`
+    accordingly, e.g. `--forbid ''`.
+
+    \b
+    Examples:
+    python -m mjstat.bench import-time
+    python -m mjstat.bench import-time --forbid jinja2 -- --today mjscore.txt
+    """
+
+    args = args or ("--version",)
+    results = [measure_import_time(args) for _ in range(repeat)]
+    times = [t for t, _ in results]
+    median = statistics.median(times)
+    click.echo(
+        f"import time: median {median:.1f} ms,"
+        f" min {min(times):.1f} ms, max {max(times):.1f} ms"
+        f" ({repeat} runs of mjscore {' '.join(args)})"
+    )
+
+    failed = False
+    if median > threshold:
+        click.echo(f"regression: exceeds the threshold {threshold:.1f} ms", err=True)
+        failed = True
+
+    modules = results[0][1]
+    for name in filter(None, forbid):
+        if name in modules:
+            click.echo(f"regression: {name} is imported", err=True)
+            failed = True
+
+    if failed:
+        raise SystemExit(1)
+
+
+@main.command()
+@click.argument("inputs", nargs=-1, type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "-n",
+    "--games",
+    type=click.IntRange(min=1),
+    default=2000,
+    metavar="N",
+    help="generate N games if no INPUT is given",
+)
+@click.option("--seed", type=int, default=0, help="set the seed of generated games")
+@click.option(
+    "--repeat",
+    type=click.IntRange(min=1),
+    default=1,
+    metavar="N",
+    help="run the pipeline N times and keep the fastest of each stage",
+)
+@click.option(
+    "--memory",
+    is_flag=True,
+    help="run the pipeline once more under tracemalloc to measure peak memory",
+)
+@click.option("--label", default="", help="set a label, e.g. a version or a commit")
+@click.option(
+    "-o",
+    "--output",
+    type=click.File("w"),
+    default="-",
+    metavar="FILE",
+    help="write the results in JSON to FILE (default: stdout)",
+)
+def run(
+    inputs: Sequence[str],
+    games: int,
+    seed: int,
+    repeat: int,
+    memory: bool,
+    label: str,
+    output: click.utils.LazyFile,
+) -> None:
+    """Measure each stage of mjscore on INPUT files.
+
+    If no INPUT is given, a synthetic mjscore.txt is generated by `mjstat.synth`.
+
+    \b
+    Examples:
+    python -m mjstat.bench run -n 10000 --memory -o before.json
+    python -m mjstat.bench run --label v1.2.0 /path/to/mjscore.txt
+    """
+
+    settings = create_settings()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if not inputs:
+            from .synth import write_mjscore
+
+            inputs = (os.path.join(temp_dir, "mjscore.txt"),)
+            write_mjscore(inputs[0], seed=seed, num_games=games)
+
+        stages = dict[str, StageResult]()
+        for _ in range(repeat):
+            results, num_games, num_rounds = run_pipeline(inputs, settings)
+            for name, result in results.items():
+                if name not in stages or result["wall"] < stages[name]["wall"]:
+                    stages[name] = result
+
+        if memory:
+            tracemalloc.start()
+            try:
+                results, _, _ = run_pipeline(inputs, settings, trace_memory=True)
+            finally:
+                tracemalloc.stop()
+            for name, result in results.items():
+                stages[name]["peak_memory"] = result["peak_memory"]
+
+        input_list = [
+            {"path": os.path.abspath(i), "size": os.path.getsize(i)} for i in inputs
+        ]
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        max_rss *= 1024
+
+    benchmark = BenchmarkResult(
+        label=label,
+        created_at=datetime.datetime.now().isoformat(timespec="seconds"),
+        python=platform.python_version(),
+        platform=platform.platform(),
+        inputs=input_list,
+        games=num_games,
+        rounds=num_rounds,
+        stages=stages,
+        max_rss=max_rss,
+    )
+    json.dump(benchmark, output, indent=2)
+    output.write("\n")
+
+    for name, result in stages.items():
+        peak = (
+            f" {result['peak_memory'] / 2**20:9.1f} MiB"
+            if "peak_memory" in result
+            else ""
+        )
+        click.echo(
+            f"{name:24} {result['wall']:9.3f} s {result['cpu']:9.3f} s{peak}",
+            err=True,
+        )
+
+
+@main.command()
+@click.argument("base", type=click.File())
+@click.argument("new", type=click.File())
+@click.option(
+    "--tolerance",
+    type=float,
+    default=0.1,
+    metavar="RATE",
+    help="fail if a stage is slower than BASE by more than RATE",
+)
+def compare(
+    base: click.utils.LazyFile,
+    new: click.utils.LazyFile,
+    tolerance: float,
+) -> None:
+    """Compare two results of command `run`.
+
+    \b
+    Examples:
+    python -m mjstat.bench compare before.json after.json
+    """
+
+    base_result: BenchmarkResult = json.load(base)
+    new_result: BenchmarkResult = json.load(new)
+
+    failed = False
+    for name, new_stage in new_result["stages"].items():
+        if not (base_stage := base_result["stages"].get(name)):
+            click.echo(f"{name:24} {'':>9}   {new_stage['wall']:9.3f} s")
+            continue
+        ratio = new_stage["wall"] / base_stage["wall"] if base_stage["wall"] else 1.0
+        mark = ""
+        if ratio > 1 + tolerance:
+            mark = " regression"
+            failed = True
+        click.echo(
+            f"{name:24} {base_stage['wall']:9.3f} s {new_stage['wall']:9.3f} s"
+            f" {ratio:6.2f}x{mark}"
+        )
+
+    if failed:
+        raise SystemExit(1)
+
+
+@main.command()
+@click.argument("inputs", nargs=-1, type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "-n",
+    "--games",
+    type=click.IntRange(min=1),
+    default=2000,
+    metavar="N",
+    help="generate N games if no INPUT is given",
+)
+@click.option("--seed", type=int, default=0, help="set the seed of generated games")
+@click.option(
+    "--repeat",
+    type=click.IntRange(min=1),
+    default=10,
+    metavar="N",
+    help="match the lines N times and keep the fastest",
+)
+def patterns(inputs: Sequence[str], games: int, seed: int, repeat: int) -> None:
+    """Compare the matching of lines before and after the alternations.
+
+    The lines each alternation of `mjstat.patterns` stands for are collected while
+    INPUT files are parsed. They are matched as the docutils state machine and the
+    stream parser did before the alternation, i.e. with the separate regexes and
+    `LEGACY_WINNING_RE`, and as they do now. Each row shows the regex attempts and
+    the time per line, and the speedup over "before" of the same parser.
+
+    \b
+    Examples:
+    python -m mjstat.bench patterns -n 10000
+    python -m mjstat.bench patterns /path/to/mjscore.txt
+    """
+
+    from collections import Counter
+
+    from . import patterns as module
+    from .profiling import CountingPattern
+
+    settings = create_settings()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if not inputs:
+            from .synth import write_mjscore
+
+            inputs = (os.path.join(temp_dir, "mjscore.txt"),)
+            write_mjscore(inputs[0], seed=seed, num_games=games)
+        lines = collect_state_lines(inputs, settings)
+
+    names = (
+        "HAND_HEADER_RE",
+        "GAME_RESULT_RE",
+        "ROUND_STATE_RE",
+        "DRAW_RE",
+        "ROUND_CLOSING_RE",
+    )
+    compiled = {name: getattr(module, name) for name in names}
+    compiled["LEGACY_WINNING_RE"] = LEGACY_WINNING_RE
+    counters = Counter[str]()
+    counting = create_matchers({
+        name: CountingPattern(pattern, counters, name)
+        for name, pattern in compiled.items()
+    })
+
+    click.echo(
+        f"{'alternation':16} {'case':16} {'lines':>8}"
+        f" {'attempts/line':>14} {'ns/line':>8} {'speedup':>8}"
+    )
+    before: dict[tuple[str, str], float] = {}
+    times = measure_matchers(create_matchers(compiled), lines, repeat)
+    for (name, case), elapsed in times.items():
+        counters.clear()
+        for line in lines[name]:
+            counting[name, case](line)
+        attempts = sum(
+            value for key, value in counters.items() if key.startswith("regex attempts")
+        ) / max(1, len(lines[name]))
+
+        parser, when = case.split()
+        if when == "before":
+            before[name, parser] = elapsed
+        speedup = before[name, parser] / elapsed if elapsed else 1.0
+        click.echo(
+            f"{name:16} {case:16} {len(lines[name]):8}"
+            f" {attempts:14.2f} {elapsed * 1e9:8.0f} {speedup:7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
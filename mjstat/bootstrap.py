@@ -0,0 +1,280 @@
+"""bootstrap.py: Estimate confidence intervals of player stats by the bootstrap.
+
+The rates and means of `mjstat.model.PlayerStats` are ratios of two sums, e.g.
+'winning_rate' is the number of wins over the number of rounds. This module puts
+the terms of those sums into arrays with a row per game (or round) and a column per
+player and term, so that a resample is a vector of weights, i.e. how many times
+each row is drawn, and the sums of thousands of resamples are a single product of
+a weight matrix and the arrays. The Python evaluators are never run again.
+
+Since the rounds of a game are not independent of each other, resampling games is
+the default. Resampling rounds instead treats them as independent, which narrows
+the intervals of the round-based rates; placing is always resampled by games.
+
+This module requires NumPy.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+    from typing import Final
+
+    from numpy.typing import NDArray
+
+    from .model import GameStats, PlayerStats, RoundStats, ScoreSheet
+
+from .model import scan_actions
+from .profiling import stage
+from .stat import count_winning_han
+
+# The terms summed over games and over rounds.
+GAME_TERMS: Final = ("count_games", "first_placing", "last_placing", "placing_sum")
+ROUND_TERMS: Final = (
+    "count_rounds",
+    "winning_count",
+    "winning_points",
+    "winning_han",
+    "winning_turns",
+    "lod_count",
+    "lod_points",
+    "riichi_count",
+    "melding_count",
+)
+
+# The items of `PlayerStats` and their numerators and denominators, which are the
+# same as those of `mjstat.stat.StatsTable.fill_player_stats`.
+RATIOS: Final = {
+    "first_placing_rate": ("first_placing", "count_games"),
+    "last_placing_rate": ("last_placing", "count_games"),
+    "mean_placing": ("placing_sum", "count_games"),
+    "winning_rate": ("winning_count", "count_rounds"),
+    "winning_mean": ("winning_points", "winning_count"),
+    "winning_mean_han": ("winning_han", "winning_count"),
+    "winning_mean_turns": ("winning_turns", "winning_count"),
+    "lod_rate": ("lod_count", "count_rounds"),
+    "lod_mean": ("lod_points", "lod_count"),
+    "riichi_rate": ("riichi_count", "count_rounds"),
+    "melding_rate": ("melding_count", "count_rounds"),
+}
+
+UNITS: Final = ("games", "rounds")
+
+# The level of the intervals.
+CONFIDENCE: Final = 0.95
+
+# The maximum number of weights drawn at once, which bounds the memory in use.
+CHUNK_SIZE: Final = 1 << 24
+
+
+class Samples:
+    """The terms of the statistics of players by game and by round.
+
+    Attributes:
+      :players:     The names of the players, in the order of the columns.
+      :games:       An array of shape (games, players, `GAME_TERMS`).
+      :rounds:      An array of shape (rounds, players, `ROUND_TERMS`).
+      :round_games: The index of the game of each round.
+    """
+
+    def __init__(self, sheet: ScoreSheet, players: Sequence[str]) -> None:
+        self.players = list(players)
+        player_ids = {name: i for i, name in enumerate(self.players)}
+        games = sheet["games"]
+        num_rounds = sum(len(i["rounds"]) for i in games)
+        self.games = np.zeros((len(games), len(players), len(GAME_TERMS)))
+        self.rounds = np.zeros((num_rounds, len(players), len(ROUND_TERMS)))
+        self.round_games = np.zeros(num_rounds, dtype=np.intp)
+
+        with stage("bootstrap_samples"):
+            index = 0
+            for game_index, game in enumerate(games):
+                names = game["players"]
+                # A seat of a player is the first one in `names`, like
+                # `mjstat.stat.StatsTable`.
+                seats = [
+                    (seat, player_ids[name])
+                    for seat, name in enumerate(names)
+                    if name in player_ids and names.index(name) == seat
+                ]
+                if not seats:
+                    index += len(game["rounds"])
+                    continue
+
+                self.add_game(game_index, game, seats)
+                for round in game["rounds"]:
+                    self.round_games[index] = game_index
+                    self.add_round(index, round, names, seats)
+                    index += 1
+
+    def add_game(
+        self,
+        index: int,
+        game: GameStats,
+        seats: Iterable[tuple[int, int]],
+    ) -> None:
+        """Fill the terms of a game."""
+
+        row = self.games[index]
+        places = {}
+        for place, i in enumerate(game["result"], 1):
+            places.setdefault(i["player"], place)
+        for seat, player_id in seats:
+            terms = row[player_id]
+            terms[0] = 1
+            if place := places.get(game["players"][seat], 0):
+                terms[1] = place == 1
+                terms[2] = place == 4
+                terms[3] = place
+
+    def add_round(
+        self,
+        index: int,
+        round: RoundStats,
+        names: Sequence[str],
+        seats: Iterable[tuple[int, int]],
+    ) -> None:
+        """Fill the terms of a round."""
+
+        if "draw_counts" not in round:
+            scan_actions(round)
+
+        row = self.rounds[index]
+        num_actions = len(round["action_table"])
+        chows, pungs, kongs = round["chows"], round["pungs"], round["kongs"]
+        winner = round.get("winner")
+        loser_seat = round.get("deal_in_seat")
+        for seat, player_id in seats:
+            name = names[seat]
+            terms = row[player_id]
+            terms[0] = 1
+            melds = len(chows[seat]) + len(pungs[seat]) + len(kongs[seat])
+            if winner == name:
+                terms[1] = 1
+                terms[2] = round["balance"][name]
+                terms[3] = count_winning_han(
+                    round["winning_value"],
+                    round["winning_yaku_list"],
+                    round["winning_dora"],
+                    not melds,
+                )
+                terms[4] = round["draw_counts"][seat]
+            if loser_seat is not None and names[loser_seat] == name:
+                terms[5] = 1
+                terms[6] = round["balance"][name]
+            if (pos := round["riichi_positions"][seat]) >= 0:
+                # Same as `mjstat.stat.evaluate_riichi`.
+                num_rest_actions = num_actions - pos - 1
+                terms[7] = num_rest_actions == 1 or num_rest_actions > 2
+            terms[8] = melds
+
+    def sum_rounds_by_game(self) -> NDArray[np.float64]:
+        """Return the sums of the round terms of each game."""
+
+        sums = np.zeros((len(self.games), *self.rounds.shape[1:]))
+        np.add.at(sums, self.round_games, self.rounds)
+        return sums
+
+
+def resample_sums(
+    values: NDArray[np.float64],
+    resamples: int,
+    rng: np.random.Generator,
+) -> NDArray[np.float64]:
+    """Return the column sums of `resamples` resamples of the rows of `values`.
+
+    Args:
+      :values:    A 2-D array.
+      :resamples: The number of resamples.
+      :rng:       The random number generator.
+
+    Returns:
+      An array of shape (resamples, columns).
+    """
+
+    num_rows = len(values)
+    result = np.zeros((resamples, values.shape[1]))
+    if not num_rows:
+        return result
+
+    chunk = max(1, CHUNK_SIZE // num_rows)
+    for start in range(0, resamples, chunk):
+        size = min(chunk, resamples - start)
+        # The weight of a row is the number of times it is drawn.
+        drawn = rng.integers(0, num_rows, (size, num_rows))
+        drawn += np.arange(size)[:, np.newaxis] * num_rows
+        weights = np.bincount(drawn.ravel(), minlength=size * num_rows)
+        # A product of floats is much faster than that of integers.
+        weights = weights.reshape(size, num_rows).astype(values.dtype)
+        result[start : start + size] = weights @ values
+    return result
+
+
+def evaluate_intervals(
+    sheet: ScoreSheet,
+    player_stats_list: Sequence[PlayerStats],
+    resamples: int,
+    unit: str = "games",
+    seed: int | None = None,
+) -> None:
+    """Store the confidence intervals of the items of `RATIOS` as 'intervals' of
+    each element of `player_stats_list`.
+
+    The intervals are the percentile ones at level `CONFIDENCE`. A resample whose
+    denominator is zero is left out; an interval of no resamples is (0, 0).
+
+    Args:
+      :sheet:             See `mjstat.model.create_score_records`, after
+                          `mjstat.model.apply_transforms`.
+      :player_stats_list: See `mjstat.stat.create_player_stats`.
+      :resamples:         The number of resamples.
+      :unit:              One of `UNITS`.
+      :seed:              The seed of the random number generator, or None.
+    """
+
+    if unit not in UNITS:
+        raise ValueError(f"unknown unit: {unit}")
+
+    samples = Samples(sheet, [i["name"] for i in player_stats_list])
+    num_players = len(samples.players)
+    rng = np.random.default_rng(seed)
+    with stage("bootstrap"):
+        if unit == "games":
+            values = np.concatenate(
+                (samples.games, samples.sum_rounds_by_game()), axis=2
+            )
+            sums = resample_sums(values.reshape(len(values), -1), resamples, rng)
+        else:
+            game_sums = resample_sums(
+                samples.games.reshape(len(samples.games), -1), resamples, rng
+            )
+            round_sums = resample_sums(
+                samples.rounds.reshape(len(samples.rounds), -1), resamples, rng
+            )
+            sums = np.concatenate(
+                (
+                    game_sums.reshape(resamples, num_players, -1),
+                    round_sums.reshape(resamples, num_players, -1),
+                ),
+                axis=2,
+            )
+        sums = sums.reshape(resamples, num_players, -1)
+
+        terms = {name: i for i, name in enumerate(GAME_TERMS + ROUND_TERMS)}
+        tail = (1 - CONFIDENCE) / 2 * 100
+        for player_id, player_stats in enumerate(player_stats_list):
+            intervals = {}
+            for item, (numerator, denominator) in RATIOS.items():
+                x = sums[:, player_id, terms[numerator]]
+                y = sums[:, player_id, terms[denominator]]
+                ratios = x[y > 0] / y[y > 0]
+                if not len(ratios):
+                    intervals[item] = (0.0, 0.0)
+                    continue
+                low, high = np.percentile(ratios, (tail, 100 - tail))
+                intervals[item] = (float(low), float(high))
+            player_stats["intervals"] = intervals
@@ -0,0 +1,349 @@
+"""cache.py: Keep the parsed games of mjscore.txt in a cache file.
+
+Since mjscore.txt is append-only, a cache file records the packed games (see
+`mjstat.model.pack_game`) parsed so far, together with the size and the modification
+time of the source file, and a digest of the parsed prefix of it. If the source file
+has grown and the prefix is unchanged, only the appended tail is parsed next time.
+
+The packed games are grouped by month and each group is compressed separately, so
+that only the months in the reference period are expanded.
+
+A totals file works the same way, but it records a `mjstat.stat.StatsTable` of all
+the games instead of the games themselves, so that the all-time statistics are
+updated by folding only the appended games into it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import zlib
+from itertools import groupby
+from pathlib import Path
+from typing import TYPE_CHECKING, TypedDict, cast
+
+if TYPE_CHECKING:
+    import mmap
+    from collections.abc import Buffer, Iterable, Sequence
+    from typing import Final
+
+    from .io import MJScoreFileInput
+    from .stat import StatsTable
+    from .streamparser import MJScoreStreamParser
+
+from .index import scan_games
+from .io import decode_lines, split_blocks
+from .model import (
+    GameStats,
+    ScoreSheet,
+    pack_game,
+    scan_actions,
+    unpack_game,
+)
+from .profiling import count, stage
+
+# Increase this whenever the layout of a cache file or a packed game changes.
+CACHE_VERSION: Final = 4
+
+
+class CacheHeader(TypedDict):
+    """Common content of cache files.
+
+    Attributes:
+      :version:      See `CACHE_VERSION`.
+      :source_path:  The absolute path of the source file.
+      :size:         The size of the source file when the cache was saved.
+      :mtime_ns:     The modification time of the source file in nanoseconds.
+      :end:          The byte offset up to which all the games are complete and cached.
+      :digest:       The BLAKE2b digest of the source file up to `end`.
+    """
+
+    version: int
+    source_path: str
+    size: int
+    mtime_ns: int
+    end: int
+    digest: bytes
+
+
+class GameCache(CacheHeader):
+    """Content of a cache file.
+
+    Attributes:
+      :months:       The mapping from e.g. "2016/01" to the compressed packed games.
+    """
+
+    months: dict[str, bytes]
+
+
+class TotalsCache(CacheHeader):
+    """Content of a totals file.
+
+    Attributes:
+      :table:        The tallies of all the games up to `end`.
+    """
+
+    table: StatsTable
+
+
+def get_cache_path(cache_dir: Path, source_path: Path) -> Path:
+    """Return the path of the cache file for `source_path`."""
+
+    name = hashlib.sha1(os.fsencode(source_path)).hexdigest()
+    return cache_dir / f"{name}.cache"
+
+
+def get_totals_path(cache_dir: Path, source_path: Path) -> Path:
+    """Return the path of the totals file for `source_path`."""
+
+    return get_cache_path(cache_dir, source_path).with_suffix(".totals")
+
+
+def load_cache(cache_path: Path, source_path: Path) -> CacheHeader | None:
+    """Load a cache file, or return None if it is missing or unusable."""
+
+    try:
+        with stage("load_cache"), open(cache_path, "rb") as fin:
+            cache: CacheHeader = pickle.load(fin)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+
+    if cache.get("version") != CACHE_VERSION:
+        return None
+    if cache["source_path"] != os.fspath(source_path):
+        return None
+    return cache
+
+
+def save_cache(cache_path: Path, cache: CacheHeader) -> None:
+    """Save `cache` atomically."""
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    with stage("save_cache"), open(temp_path, "wb") as fout:
+        pickle.dump(cache, fout, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, cache_path)
+
+
+def compute_digest(data: Buffer, end: int) -> bytes:
+    """Return the digest of the first `end` bytes of `data`."""
+
+    with memoryview(data) as view, view[:end] as prefix:
+        return hashlib.blake2b(prefix).digest()
+
+
+def is_valid_cache(cache: CacheHeader, data: Buffer, stat: os.stat_result) -> bool:
+    """Return True if the source file has not changed up to `cache["end"]`."""
+
+    if (cache["size"], cache["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+        # Unchanged since the last time.
+        return True
+
+    # Some games may have been appended.
+    with memoryview(data) as view:
+        return cache["end"] <= len(view) and cache["digest"] == compute_digest(
+            data, cache["end"]
+        )
+
+
+def find_line_end(data: mmap.mmap | bytes, end: int) -> int:
+    """Return the byte offset just after the last newline of `data`, but not before
+    `end`, so that a line that is being written is left out.
+    """
+
+    return max(end, data.rfind(b"\n", end) + 1)
+
+
+def find_complete_games(
+    data: Buffer,
+    end: int,
+    limit: int,
+    new_games: Sequence[GameStats],
+) -> tuple[Sequence[GameStats], int]:
+    """Exclude a game that is being written from the games parsed from
+    `data[end:limit]`.
+
+    Returns:
+      A pair of the complete games and the byte offset up to which they are. The
+      offset never exceeds `limit`, so that a header line being written after it is
+      parsed next time.
+    """
+
+    headers = scan_games(data, end, limit)
+    if len(headers) != len(new_games):
+        return [], end
+    if new_games and not new_games[-1]["finished_at"]:
+        return new_games[:-1], headers[-1].offset
+    return new_games, limit
+
+
+def add_games(months: dict[str, bytes], games: Iterable[GameStats]) -> None:
+    """Pack `games` and append them to the month groups they belong to."""
+
+    for month, group in groupby(games, key=lambda i: i["started_at"][:7]):
+        records = (
+            pickle.loads(zlib.decompress(months[month])) if month in months else []
+        )
+        records.extend(pack_game(i) for i in group)
+        months[month] = zlib.compress(
+            pickle.dumps(records, protocol=pickle.HIGHEST_PROTOCOL)
+        )
+
+
+def get_games(months: dict[str, bytes], since: str, until: str) -> list[GameStats]:
+    """Unpack the cached games that started in `[since, until)`."""
+
+    games = list[GameStats]()
+    with stage("unpack_games"):
+        for month in sorted(months):
+            if since and month < since[:7]:
+                continue
+            if until and month > until[:7]:
+                break
+            games.extend(
+                unpack_game(record)
+                for record in pickle.loads(zlib.decompress(months[month]))
+                if (not since or since <= record[0])
+                and (not until or record[0] < until)
+            )
+    count("games unpacked", len(games))
+    return games
+
+
+def read_cached(
+    source: MJScoreFileInput,
+    parser: MJScoreStreamParser,
+    sheet: ScoreSheet,
+    cache_dir: Path,
+) -> None:
+    """Populate `sheet` with the games of `source`, parsing only what is not cached.
+
+    Args:
+      :source:    The input file.
+      :parser:    The parser for the part of the file that is not cached.
+      :sheet:     See `mjstat.model.create_score_records`.
+      :cache_dir: The directory where cache files are saved.
+    """
+
+    source_path = Path(source.source_path).resolve()
+    cache_path = get_cache_path(cache_dir, source_path)
+    stat = source_path.stat()
+
+    with source.map() as data:
+        end = 0
+        months: dict[str, bytes] = {}
+        cache = cast("GameCache | None", load_cache(cache_path, source_path))
+        if cache and is_valid_cache(cache, data, stat):
+            end, months = cache["end"], cache["months"]
+
+        # Parse the tail of the file regardless of the reference period, up to the
+        # last complete line.
+        limit = find_line_end(data, end)
+        tail_sheet = ScoreSheet(
+            games=[], settings=sheet["settings"], since="", until=""
+        )
+        parser.parse_lines(
+            decode_lines(data, split_blocks(data, end, limit), source.encoding),
+            tail_sheet,
+        )
+        new_games = tail_sheet["games"]
+
+        # A game that is being written is parsed but not cached.
+        complete_games, new_end = find_complete_games(data, end, limit, new_games)
+
+        if new_end != end or not cache:
+            with stage("pack_games"):
+                add_games(months, complete_games)
+            save_cache(
+                cache_path,
+                GameCache(
+                    version=CACHE_VERSION,
+                    source_path=os.fspath(source_path),
+                    size=stat.st_size,
+                    mtime_ns=stat.st_mtime_ns,
+                    end=new_end,
+                    digest=compute_digest(data, new_end),
+                    months=months,
+                ),
+            )
+
+    since, until = sheet["since"], sheet["until"]
+    sheet["games"].extend(get_games(months, since, until))
+    sheet["games"].extend(
+        i
+        for i in new_games[len(complete_games) :]
+        if (not since or since <= i["started_at"])
+        and (not until or i["started_at"] < until)
+    )
+
+
+def update_totals(
+    source: MJScoreFileInput,
+    parser: MJScoreStreamParser,
+    sheet: ScoreSheet,
+    cache_dir: Path,
+) -> StatsTable:
+    """Return the tallies of all the complete games of `source`, regardless of the
+    reference period, folding only the games that are not in the totals file.
+
+    Args:
+      :source:    The input file.
+      :parser:    The parser for the part of the file that is not folded yet.
+      :sheet:     See `mjstat.model.create_score_records`. Only the settings are used.
+      :cache_dir: The directory where totals files are saved.
+    """
+
+    from .stat import StatsTable
+
+    source_path = Path(source.source_path).resolve()
+    totals_path = get_totals_path(cache_dir, source_path)
+    stat = source_path.stat()
+
+    with source.map() as data:
+        end = 0
+        start_hands = sheet["settings"].start_hands
+        table = StatsTable(start_hands)
+        cache = cast("TotalsCache | None", load_cache(totals_path, source_path))
+        # A table without the tallies of start hands is useless if they are needed.
+        if (
+            cache
+            and is_valid_cache(cache, data, stat)
+            and (cache["table"].start_hands or not start_hands)
+        ):
+            end, table = cache["end"], cache["table"]
+
+        limit = find_line_end(data, end)
+        tail_sheet = ScoreSheet(
+            games=[], settings=sheet["settings"], since="", until=""
+        )
+        parser.parse_lines(
+            decode_lines(data, split_blocks(data, end, limit), source.encoding),
+            tail_sheet,
+        )
+
+        # A game that is being written is folded next time.
+        complete_games, new_end = find_complete_games(
+            data, end, limit, tail_sheet["games"]
+        )
+        with stage("tally"):
+            for game in complete_games:
+                for round in game["rounds"]:
+                    scan_actions(round)
+                table.add_game(game)
+
+        if new_end != end or not cache:
+            save_cache(
+                totals_path,
+                TotalsCache(
+                    version=CACHE_VERSION,
+                    source_path=os.fspath(source_path),
+                    size=stat.st_size,
+                    mtime_ns=stat.st_mtime_ns,
+                    end=new_end,
+                    digest=compute_digest(data, new_end),
+                    table=table,
+                ),
+            )
+
+    return table
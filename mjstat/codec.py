@@ -0,0 +1,169 @@
+"""codec.py: Encode tiles and actions into small integers.
+
+An action such as "1G3s" or "4C4s5S" is encoded into an integer of 15 bits:
+
+  =======  ================================================================
+  Bits     Field
+  =======  ================================================================
+  0-1      The seat index (0-3) of the player, i.e. the first digit minus 1.
+  2-4      The index of the action type in `ACTION_TYPES`.
+  5-10     The code of the first tile in `TILES`, or 0 if none.
+  11-14    The rank (1-9) of the second tile of a chow, 10 for a red five, or
+           0 if none. The suit is always that of the first tile.
+  =======  ================================================================
+
+so that a sequence of actions fits in an `array.array` of type "H". The codes of
+a given seat and type, e.g. riichi of seat 2, can be compared as they are, and
+`decode_action` converts a code back into the original text.
+"""
+
+from __future__ import annotations
+
+from array import array
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from typing import Final
+
+# Code 0 means "none".
+TILES: Final = (
+    *(f"{i}m" for i in range(1, 10)),
+    *(f"{i}p" for i in range(1, 10)),
+    *(f"{i}s" for i in range(1, 10)),
+    *"東南西北白発中",
+    "5M",
+    "5P",
+    "5S",
+)
+TILE_CODES: Final = {tile: i for i, tile in enumerate(TILES, 1)}
+
+# 和了, 吃, 打牌 (after a draw), 自摸, 槓, 碰, 立直 and 打牌 (after a call).
+ACTION_TYPES: Final = "ACDGKNRd"
+ACTION_TYPE_CODES: Final = {k: i for i, k in enumerate(ACTION_TYPES)}
+
+AGARI: Final = ACTION_TYPE_CODES["A"]
+CHOW: Final = ACTION_TYPE_CODES["C"]
+DISCARD: Final = ACTION_TYPE_CODES["D"]
+DRAW: Final = ACTION_TYPE_CODES["G"]
+KONG: Final = ACTION_TYPE_CODES["K"]
+PUNG: Final = ACTION_TYPE_CODES["N"]
+RIICHI: Final = ACTION_TYPE_CODES["R"]
+DISCARD_AFTER_CALL: Final = ACTION_TYPE_CODES["d"]
+
+# The typecode of `array.array` for encoded actions.
+ACTION_ARRAY_TYPE: Final = "H"
+
+RED_RANK: Final = 10
+
+
+def split_tiles(tiles: str) -> list[str]:
+    """Split a string of tiles such as "1m2m5M東" into tiles."""
+
+    result = []
+    i = 0
+    while i < len(tiles):
+        width = 2 if tiles[i].isdigit() else 1
+        result.append(tiles[i : i + width])
+        i += width
+    return result
+
+
+# Mapping from actions to their codes, filled by `encode_action`. The number of
+# distinct actions is a few thousand at most.
+action_codes: dict[str, int] = {}
+
+
+def encode_action(action: str) -> int:
+    """Encode `action`, e.g. "1G3s", into an integer.
+
+    Raises:
+      ValueError: if `action` is not a valid action.
+    """
+
+    try:
+        return action_codes[action]
+    except KeyError:
+        code = action_codes[action] = parse_action(action)
+        return code
+
+
+def parse_action(action: str) -> int:
+    """Encode `action` without the help of `action_codes`."""
+
+    try:
+        seat = "1234".index(action[0])
+        action_type = ACTION_TYPE_CODES[action[1]]
+        tiles = split_tiles(action[2:])
+        if len(tiles) > 2 or (len(tiles) == 2 and action_type != CHOW):
+            raise ValueError(action)
+
+        code = seat | action_type << 2
+        if tiles:
+            code |= TILE_CODES[tiles[0]] << 5
+        if len(tiles) == 2:
+            rank, suit = tiles[1]
+            if suit.lower() != tiles[0][1].lower():
+                raise ValueError(action)
+            code |= (RED_RANK if suit.isupper() else int(rank)) << 11
+    except (IndexError, KeyError):
+        raise ValueError(action) from None
+    return code
+
+
+def decode_action(code: int) -> str:
+    """Convert a code made by `encode_action` back into the action."""
+
+    text = f"{(code & 3) + 1}{ACTION_TYPES[code >> 2 & 7]}"
+    if tile := code >> 5 & 63:
+        text += TILES[tile - 1]
+    if rank := code >> 11:
+        suit = TILES[tile - 1][1].lower()
+        text += f"5{suit.upper()}" if rank == RED_RANK else f"{rank}{suit}"
+    return text
+
+
+def encode_actions(actions: Iterable[str]) -> array[int]:
+    """Encode `actions` into an array of codes."""
+
+    return array(ACTION_ARRAY_TYPE, map(encode_action, actions))
+
+
+def decode_actions(codes: Iterable[int]) -> list[str]:
+    """Convert codes made by `encode_actions` back into the actions."""
+
+    return [decode_action(i) for i in codes]
+
+
+def make_action(seat: int, action_type: int, tile: int = 0) -> int:
+    """Return the code of an action of a seat index (0-3) with at most one tile."""
+
+    return seat | action_type << 2 | tile << 5
+
+
+# The bits of the seat and the type of an action, see `make_action`.
+KIND_MASK: Final = 0x1F
+
+
+def action_seat(code: int) -> int:
+    """Return the seat index (0-3) of the player of an action."""
+
+    return code & 3
+
+
+def action_type(code: int) -> int:
+    """Return the index of the type of an action in `ACTION_TYPES`."""
+
+    return code >> 2 & 7
+
+
+def action_tile(code: int) -> int:
+    """Return the code of the first tile of an action, or 0."""
+
+    return code >> 5 & 63
+
+
+def action_tiles(code: int) -> str:
+    """Return the tiles of an action as text, e.g. "4s5S" for "4C4s5S"."""
+
+    return decode_action(code)[2:]
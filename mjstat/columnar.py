@@ -0,0 +1,404 @@
+"""columnar.py: Define class ColumnarScoreSheet, a compact store of game records.
+
+A `ScoreSheet` holds a dict and several lists for each round, which is costly for
+a long history. `ColumnarScoreSheet` holds the same data in parallel columns
+instead: a per-action column of the codes of `mjstat.codec` backed by
+`array.array`, and per-round and per-game columns.
+
+The columns are read through `GameView` and `RoundView`, lazy read-only mappings
+that look like `GameStats` and `RoundStats`, so that `mjstat.stat` and
+`mjstat.writer` work on them as is. Since what `mjstat.model.scan_actions` finds
+for each round is computed when a game is added, or decoded from the actions by the
+view in the case of meldings, `apply_transforms` is not necessary (nor possible)
+for the views.
+"""
+
+from __future__ import annotations
+
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import TYPE_CHECKING, cast, overload
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from typing import Final
+
+from .codec import (
+    ACTION_ARRAY_TYPE,
+    AGARI,
+    DRAW,
+    RIICHI,
+    TILE_CODES,
+    TILES,
+    action_seat,
+    action_type,
+    split_tiles,
+)
+from .model import (
+    YAKU_NUMBERS,
+    GameStats,
+    Place,
+    RoundStats,
+    ScoreSheet,
+    YakuTable,
+    find_meldings,
+)
+from .stat import DEFAULT_PLAYERS
+
+# Code 0 means "none" in every column below.
+ENDINGS: Final = (
+    "ロン",
+    "ツモ",
+    "流局",
+    "九種公九牌倒牌",
+    "三家和",
+    "四風連打",
+    "四槓開",
+    "四家リーチ",
+)
+ENDING_CODES: Final = {k: i for i, k in enumerate(ENDINGS, 1)}
+
+WINDS: Final = "東南西北"
+WIND_CODES: Final = {k: i for i, k in enumerate(WINDS, 1)}
+
+# The names that appear in the balance of a round, in the order of the columns.
+BALANCE_NAMES: Final = tuple(DEFAULT_PLAYERS)
+
+YAKU_LIST: Final = tuple(YakuTable)
+
+
+class ColumnarScoreSheet(Sequence["GameView"]):
+    """Game records stored in parallel columns.
+
+    This object is a sequence of `GameView`. Each column is a public attribute:
+
+    Per game:
+      :started_at, finished_at:  Lists of str.
+      :players:                  A list of tuples of the four players.
+      :result:                   A list of tuples of (player, points) pairs.
+      :round_offsets:            The index of the first round of each game, followed
+                                 by the total number of rounds.
+
+    Per round:
+      :title:              A list of str.
+      :ending:             Codes of `ENDINGS`.
+      :winner:             The seat index (0-3) of the winner, or -1.
+      :winning_value:      A list of str or None.
+      :winning_dora:       The number of dora of the win, or -1.
+      :balance:            Four values per round in the order of `BALANCE_NAMES`.
+      :balance_mask:       Bit i is set if `BALANCE_NAMES[i]` is in the balance.
+      :seat_table:         Four codes of `WINDS` per round.
+      :start_hands:        52 codes of `mjstat.codec.TILES` per round, or 13 for
+                           each seat.
+      :dora_table:         A list of tuples of str or None.
+      :action_offsets:     The index of the first action of each round, followed by
+                           the total number of actions.
+      :yaku_offsets:       The index of the first yaku of each round, followed by the
+                           total number of yaku.
+      :draw_counts:        Four counts of draws per round.
+      :riichi_positions:   Four indices of the first riichi in the actions of the
+                           round per round, or -1.
+      :deal_in_seat:       The seat index (0-3) of the player who dealt in, or -1.
+
+    Per action:
+      :actions:  Codes made by `mjstat.codec.encode_action`.
+
+    Per yaku:
+      :yaku:  Serial numbers of `YakuTable`, see `mjstat.model.YAKU_NUMBERS`.
+    """
+
+    def __init__(self, games: Iterable[GameStats] = ()) -> None:
+        self.started_at: list[str] = []
+        self.finished_at: list[str] = []
+        self.players: list[tuple[str, str, str, str]] = []
+        self.result: list[tuple[tuple[str, int], ...]] = []
+        self.round_offsets = array("I", [0])
+
+        self.title: list[str] = []
+        self.ending = array("B")
+        self.winner = array("b")
+        self.winning_value: list[str | None] = []
+        self.winning_dora = array("b")
+        self.balance = array("i")
+        self.balance_mask = array("B")
+        self.seat_table = array("B")
+        self.start_hands = array("B")
+        self.dora_table: list[tuple[str | None, ...]] = []
+        self.action_offsets = array("I", [0])
+        self.yaku_offsets = array("I", [0])
+        self.draw_counts = array("H")
+        self.riichi_positions = array("i")
+        self.deal_in_seat = array("b")
+
+        self.actions = array(ACTION_ARRAY_TYPE)
+
+        self.yaku = array("B")
+
+        # Intern repeated strings.
+        self.strings: dict[str, str] = {}
+
+        for game in games:
+            self.append_game(game)
+
+    def intern(self, value: str) -> str:
+        """Return the shared instance of `value`."""
+
+        return self.strings.setdefault(value, value)
+
+    def append_game(self, game: GameStats) -> None:
+        """Add a game record (before `apply_transforms`) to the columns."""
+
+        intern = self.intern
+        self.started_at.append(game["started_at"])
+        self.finished_at.append(game["finished_at"])
+        self.players.append(
+            cast(tuple[str, str, str, str], tuple(map(intern, game["players"])))
+        )
+        self.result.append(
+            tuple((intern(i["player"]), i["points"]) for i in game["result"])
+        )
+
+        for round in game["rounds"]:
+            self.append_round(round)
+        self.round_offsets.append(len(self.title))
+
+    def append_round(self, round: RoundStats) -> None:
+        """Add a round record to the columns."""
+
+        self.title.append(self.intern(round["title"]))
+        self.ending.append(ENDING_CODES.get(round.get("ending", ""), 0))
+
+        balance = round["balance"]
+        self.balance.extend(balance.get(i, 0) for i in BALANCE_NAMES)
+        self.balance_mask.append(
+            sum(1 << i for i, name in enumerate(BALANCE_NAMES) if name in balance)
+        )
+        self.seat_table.extend(WIND_CODES.get(i, 0) for i in round["seat_table"])
+        for hand in round["start_hand_table"]:
+            codes = [TILE_CODES[i] for i in split_tiles(hand)]
+            self.start_hands.extend(codes + [0] * (13 - len(codes)))
+        self.dora_table.append(
+            tuple(
+                self.intern(i) if i is not None else None for i in round["dora_table"]
+            )
+        )
+
+        # Actions, and what `mjstat.model.scan_actions` finds except meldings, which
+        # `RoundView` decodes from the actions.
+        draws = [0] * 4
+        riichi_positions = [-1] * 4
+        winner = -1
+        actions = round["action_table"]
+        self.actions.extend(actions)
+        for pos, action in enumerate(actions):
+            player = action_seat(action)
+            kind = action_type(action)
+            if kind == DRAW:
+                draws[player] += 1
+            elif kind == RIICHI and riichi_positions[player] < 0:
+                riichi_positions[player] = pos
+            elif kind == AGARI and winner < 0:
+                winner = player
+        self.action_offsets.append(len(self.actions))
+        self.draw_counts.extend(draws)
+        self.riichi_positions.extend(riichi_positions)
+        self.deal_in_seat.append(
+            action_seat(actions[-2])
+            if round.get("ending") == "ロン" and len(actions) > 1
+            else -1
+        )
+
+        self.winner.append(winner)
+        if (value := round.get("winning_value")) is not None:
+            yaku_list = round["winning_yaku_list"]
+            self.winning_value.append(self.intern(value))
+            self.winning_dora.append(round["winning_dora"])
+            self.yaku.extend(YAKU_NUMBERS[i] for i in yaku_list)
+        else:
+            self.winning_value.append(None)
+            self.winning_dora.append(-1)
+        self.yaku_offsets.append(len(self.yaku))
+
+    def to_score_sheet(self, sheet: ScoreSheet) -> ScoreSheet:
+        """Return a copy of `sheet` whose games are the views of this object."""
+
+        result = sheet.copy()
+        result["games"] = cast(list[GameStats], self)
+        return result
+
+    def __len__(self) -> int:
+        return len(self.started_at)
+
+    @overload
+    def __getitem__(self, index: int) -> GameView: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[GameView]: ...
+
+    def __getitem__(self, index: int | slice) -> GameView | list[GameView]:
+        if isinstance(index, slice):
+            return [GameView(self, i) for i in range(len(self))[index]]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return GameView(self, index)
+
+
+class GameView(Mapping[str, object]):
+    """A read-only view of a game in `ColumnarScoreSheet` like `GameStats`."""
+
+    KEYS: Final = ("finished_at", "rounds", "players", "result", "started_at")
+
+    def __init__(self, store: ColumnarScoreSheet, index: int) -> None:
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, key: str) -> object:
+        store, index = self.store, self.index
+        match key:
+            case "finished_at":
+                return store.finished_at[index]
+            case "started_at":
+                return store.started_at[index]
+            case "players":
+                return store.players[index]
+            case "result":
+                return [Place(player=p, points=q) for p, q in store.result[index]]
+            case "rounds":
+                return [
+                    RoundView(self, i)
+                    for i in range(
+                        store.round_offsets[index], store.round_offsets[index + 1]
+                    )
+                ]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.KEYS)
+
+    def __len__(self) -> int:
+        return len(self.KEYS)
+
+
+class RoundView(Mapping[str, object]):
+    """A read-only view of a round in `ColumnarScoreSheet` like `RoundStats`."""
+
+    def __init__(self, game: GameView, index: int) -> None:
+        self.game = game
+        self.store = game.store
+        self.index = index
+        self.melding_cache: dict[str, list[list[str]]] | None = None
+
+    def keys_available(self) -> list[str]:
+        """Return the keys this round has, like a round after `apply_transforms`."""
+
+        store, index = self.store, self.index
+        keys = [
+            "action_table",
+            "balance",
+            "chows",
+            "dora_table",
+            "draw_counts",
+            "game",
+            "kongs",
+            "pungs",
+            "riichi_positions",
+            "seat_table",
+            "start_hand_table",
+            "title",
+        ]
+        if store.deal_in_seat[index] >= 0:
+            keys.append("deal_in_seat")
+        if store.ending[index]:
+            keys.append("ending")
+        if store.winner[index] >= 0:
+            keys.append("winner")
+        if store.winning_value[index] is not None:
+            keys.extend(("winning_dora", "winning_value", "winning_yaku_list"))
+        return keys
+
+    def __getitem__(self, key: str) -> object:
+        store, index = self.store, self.index
+        match key:
+            case "action_table":
+                return self.action_table()
+            case "balance":
+                mask = store.balance_mask[index]
+                return {
+                    name: store.balance[index * 4 + i]
+                    for i, name in enumerate(BALANCE_NAMES)
+                    if mask & (1 << i)
+                }
+            case "chows" | "pungs" | "kongs":
+                return self.meldings()[key]
+            case "deal_in_seat" if store.deal_in_seat[index] >= 0:
+                return store.deal_in_seat[index]
+            case "dora_table":
+                return list(store.dora_table[index])
+            case "draw_counts":
+                return store.draw_counts[index * 4 : index * 4 + 4].tolist()
+            case "riichi_positions":
+                return store.riichi_positions[index * 4 : index * 4 + 4].tolist()
+            case "ending" if store.ending[index]:
+                return ENDINGS[store.ending[index] - 1]
+            case "game":
+                return self.game
+            case "seat_table":
+                return [
+                    WINDS[i - 1] if i else ""
+                    for i in store.seat_table[index * 4 : index * 4 + 4]
+                ]
+            case "start_hand_table":
+                hands = store.start_hands[index * 52 : index * 52 + 52]
+                return [
+                    "".join(TILES[i - 1] for i in hands[j * 13 : j * 13 + 13] if i)
+                    for j in range(4)
+                ]
+            case "title":
+                return store.title[index]
+            case "winner" if store.winner[index] >= 0:
+                return store.players[self.game.index][store.winner[index]]
+            case "winning_dora" if store.winning_value[index] is not None:
+                return store.winning_dora[index]
+            case "winning_value" if store.winning_value[index] is not None:
+                return store.winning_value[index]
+            case "winning_yaku_list" if store.winning_value[index] is not None:
+                return [
+                    YAKU_LIST[i]
+                    for i in store.yaku[
+                        store.yaku_offsets[index] : store.yaku_offsets[index + 1]
+                    ]
+                ]
+        raise KeyError(key)
+
+    def action_table(self) -> array[int]:
+        """Return the codes of the actions of this round."""
+
+        store = self.store
+        return store.actions[
+            store.action_offsets[self.index] : store.action_offsets[self.index + 1]
+        ]
+
+    def meldings(self) -> dict[str, list[list[str]]]:
+        """Decode the meldings of this round like `mjstat.model.find_meldings`, only
+        once for the view.
+        """
+
+        if self.melding_cache is None:
+            self.melding_cache = find_meldings_of(self.action_table())
+        return self.melding_cache
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys_available())
+
+    def __len__(self) -> int:
+        return len(self.keys_available())
+
+
+def find_meldings_of(actions: Sequence[int]) -> dict[str, list[list[str]]]:
+    """Return the chows, the pungs and the kongs in `actions`."""
+
+    round = RoundStats(action_table=array(ACTION_ARRAY_TYPE, actions))
+    find_meldings(round)
+    return {"chows": round["chows"], "pungs": round["pungs"], "kongs": round["kongs"]}
@@ -0,0 +1,229 @@
+"""daemon.py: Follow mjscore.txt and serve reports over HTTP.
+
+`ScoreFollower` keeps the complete games of mjscore.txt in memory together with a
+`mjstat.stat.StatsTable` of all of them. Since the file is append-only, each call of
+`ScoreFollower.poll` parses only the games appended since the last call, like
+`mjstat.cache.read_cached` does with a cache file.
+
+`serve` answers a query such as ``GET /?fundamental&today`` with the same report as
+``mjscore -F --today`` would write, without starting a process, importing modules
+or parsing the file again. The parameters of a query are the long options of
+mjscore in `QUERY_OPTIONS`, with underscores or hyphens; a flag is set by its
+presence. The file is polled before each query and every `interval` seconds while
+idle.
+"""
+
+from __future__ import annotations
+
+import os
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import TYPE_CHECKING
+from urllib.parse import parse_qs, urlsplit
+
+if TYPE_CHECKING:
+    import mmap
+    from argparse import Namespace
+    from typing import Final
+
+    from .model import GameStats
+
+from docutils.io import StringOutput  # type: ignore[import-untyped]
+
+from .cache import find_complete_games, find_line_end
+from .index import scan_games
+from .io import MJScoreFileInput, decode_lines, split_blocks
+from .model import ScoreSheet, create_score_records, scan_actions
+from .profiling import count, stage
+from .stat import StatsTable
+from .streamparser import MJScoreStreamParser
+from .writer import MJScoreWriter
+
+# The settings that a query can change, and whether they are flags.
+QUERY_OPTIONS: Final = {
+    "fundamental": True,
+    "yaku": True,
+    "start_hands": True,
+    "head_to_head": True,
+    "today": True,
+    "since": False,
+    "until": False,
+    "target_player": False,
+    "language": False,
+}
+
+# The number of bytes before the end of the parsed games that are compared to tell
+# an appended file from a replaced one.
+MARK_SIZE: Final = 256
+
+
+class ScoreFollower:
+    """Keep the games of mjscore.txt up to date with the file.
+
+    Args:
+      :source_path: The path of mjscore.txt.
+      :settings:    Command line arguments, etc. `settings.start_hands` tells
+                    whether `table` has the tallies of start hands.
+    """
+
+    def __init__(self, source_path: str, settings: Namespace) -> None:
+        self.source = MJScoreFileInput(source_path=source_path)
+        self.settings = settings
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget all the games."""
+
+        self.games: list[GameStats] = []
+        # The times the games started, for finding a reference period by bisection.
+        self.started_at: list[str] = []
+        self.table = StatsTable(self.settings.start_hands)
+        # The byte offset up to which all the games are complete and parsed.
+        self.end = 0
+        self.mark = b""
+        self.stat: tuple[int, int] | None = None
+
+    def poll(self) -> int:
+        """Parse the games appended to the file since the last call.
+
+        If the file has been truncated or replaced, it is parsed from the beginning.
+
+        Returns:
+          The number of new games.
+        """
+
+        stat = os.stat(self.source.source_path)
+        if (stat.st_size, stat.st_mtime_ns) == self.stat:
+            return 0
+
+        with stage("poll"), self.source.map() as data:
+            if data[max(0, self.end - MARK_SIZE) : self.end] != self.mark:
+                count("files replaced")
+                self.reset()
+
+            # A line that is being written is left for the next time.
+            limit = find_line_end(data, self.end)
+            try:
+                new_games = self.parse(data, limit)
+            except (AssertionError, ValueError):
+                # The parser may fail in the middle of a game that is being
+                # written, so that the game is left for the next time.
+                headers = scan_games(data, self.end, limit)
+                limit = headers[-1].offset if headers else self.end
+                new_games = self.parse(data, limit)
+            games, self.end = find_complete_games(data, self.end, limit, new_games)
+            self.mark = data[max(0, self.end - MARK_SIZE) : self.end]
+
+        for game in games:
+            for round in game["rounds"]:
+                scan_actions(round)
+            self.table.add_game(game)
+        self.games.extend(games)
+        self.started_at.extend(i["started_at"] for i in games)
+        self.stat = (stat.st_size, stat.st_mtime_ns)
+        count("games followed", len(games))
+        return len(games)
+
+    def parse(self, data: mmap.mmap | bytes, limit: int) -> list[GameStats]:
+        """Parse the games in `data[self.end:limit]`."""
+
+        sheet = ScoreSheet(games=[], settings=self.settings, since="", until="")
+        MJScoreStreamParser().parse_lines(
+            decode_lines(
+                data, split_blocks(data, self.end, limit), self.source.encoding
+            ),
+            sheet,
+        )
+        return sheet["games"]
+
+    def render(self, settings: Namespace) -> str:
+        """Return the report of the games in the reference period of `settings`."""
+
+        sheet = create_score_records(settings)
+        since, until = sheet["since"], sheet["until"]
+        table: StatsTable | None = None
+        # The table lacks what needs the games themselves.
+        if (
+            since
+            or until
+            or (settings.start_hands and not self.table.start_hands)
+            or settings.head_to_head
+            or int(settings.bootstrap)
+        ):
+            first = bisect_left(self.started_at, since) if since else 0
+            last = bisect_left(self.started_at, until) if until else len(self.games)
+            sheet["games"] = self.games[first:last]
+        else:
+            # All the games, whose tallies are ready.
+            sheet["games"] = self.games
+            table = self.table
+        return MJScoreWriter().write(sheet, StringOutput(encoding="unicode"), table)
+
+
+def parse_query(query: str, settings: Namespace) -> Namespace:
+    """Return a copy of `settings` updated with the parameters of `query`.
+
+    Raises:
+      ValueError: if a parameter is not in `QUERY_OPTIONS`.
+    """
+
+    result = vars(settings).copy()
+    for key, values in parse_qs(query, keep_blank_values=True).items():
+        name = key.replace("-", "_")
+        if (is_flag := QUERY_OPTIONS.get(name)) is None:
+            raise ValueError(f"unknown parameter: {key}")
+        result[name] = values[-1] not in ("0", "false") if is_flag else values[-1]
+    return type(settings)(**result)
+
+
+def serve(
+    source_path: str,
+    settings: Namespace,
+    address: tuple[str, int],
+    interval: float = 1.0,
+) -> None:
+    """Follow `source_path` and answer queries at `address` until interrupted.
+
+    Args:
+      :source_path: The path of mjscore.txt.
+      :settings:    Command line arguments, etc., which queries start from.
+      :address:     The pair of the host and the port to listen to.
+      :interval:    The seconds between polls of the file while idle.
+    """
+
+    follower = ScoreFollower(source_path, settings)
+    follower.poll()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            url = urlsplit(self.path)
+            if url.path != "/":
+                self.send_error(404)
+                return
+
+            follower.poll()
+            try:
+                # A bad date in the query is found while rendering.
+                text = follower.render(parse_query(url.query, settings))
+            except ValueError as e:
+                self.send_error(400, str(e))
+                return
+
+            body = text.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: object) -> None:
+            if settings.verbose:
+                super().log_message(format, *args)
+
+    # Requests are handled one at a time in this thread, between polls, so that
+    # the games are never read and updated at the same time.
+    with HTTPServer(address, Handler) as server:
+        server.timeout = interval
+        while True:
+            server.handle_request()
+            follower.poll()
@@ -0,0 +1,332 @@
+"""export.py: Define class MJScoreExporter, which writes games as columnar tables.
+
+Unlike `mjstat.writer.MJScoreWriter`, which writes a report for people, this module
+writes the games of a score sheet as four tables with typed columns, so that they
+can be analyzed with e.g. pandas or DuckDB without parsing mjscore.txt again:
+
+  =======  ===================================================================
+  Table    Rows
+  =======  ===================================================================
+  games    A game, with the players, the places and the points of each seat.
+  rounds   A round, with its ending, the winner and the balance of each seat.
+  actions  An action, with its seat, type and tiles.
+  yaku     A yaku of a winning hand.
+  =======  ===================================================================
+
+Column `started_at` of every table identifies a game, and column `round` of the
+tables other than games the index of a round in the game. Seats are indices 0-3
+as in `mjstat.codec`.
+
+The tables are written in Parquet if pyarrow is available, otherwise in the NumPy
+`.npz` format. Each table is partitioned by the month the games started in, like
+``<directory>/rounds/month=2016-01/part-0000.parquet``, which both pandas and
+DuckDB understand as a Hive partitioning. Appending a sheet adds a new part to
+each partition instead of replacing the existing ones.
+"""
+
+from __future__ import annotations
+
+import pathlib
+from datetime import datetime
+from itertools import groupby
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Mapping, Sequence
+    from typing import Final
+
+    from .model import GameStats, RoundStats, ScoreSheet
+
+from .codec import ACTION_TYPES, action_tiles
+from .model import scan_actions
+from .profiling import stage
+from .stat import count_han, count_winning_han
+
+# The columns of each table and their types. A type is an alias of a NumPy dtype,
+# "string", or "timestamp" (in seconds).
+SCHEMA: Final[dict[str, dict[str, str]]] = {
+    "games": {
+        "started_at": "timestamp",
+        "finished_at": "timestamp",
+        **{f"player_{i}": "string" for i in range(4)},
+        **{f"place_{i}": "int8" for i in range(4)},
+        **{f"points_{i}": "int32" for i in range(4)},
+        "rounds": "int16",
+    },
+    "rounds": {
+        "started_at": "timestamp",
+        "round": "int16",
+        "title": "string",
+        "ending": "string",
+        "winner": "int8",
+        "deal_in": "int8",
+        "winning_value": "string",
+        "winning_han": "int8",
+        "winning_dora": "int8",
+        **{f"balance_{i}": "int32" for i in range(4)},
+        **{f"draws_{i}": "int16" for i in range(4)},
+        **{f"melds_{i}": "int8" for i in range(4)},
+        "actions": "int16",
+    },
+    "actions": {
+        "started_at": "timestamp",
+        "round": "int16",
+        "position": "int16",
+        "seat": "int8",
+        "type": "string",
+        "tiles": "string",
+        "code": "uint16",
+    },
+    "yaku": {
+        "started_at": "timestamp",
+        "round": "int16",
+        "seat": "int8",
+        "yaku": "string",
+        "han": "int8",
+    },
+}
+
+FORMATS: Final = ("auto", "parquet", "npz")
+
+TIMESTAMP_FORMAT: Final = "%Y/%m/%d %H:%M"
+
+Columns = dict[str, list[object]]
+
+
+class MJScoreExporter:
+    """Write the games of a score sheet as columnar tables.
+
+    Args:
+      :format: One of `FORMATS`. "auto" means "parquet" if pyarrow can be imported,
+               otherwise "npz".
+
+    Raises:
+      ImportError: if `format` is "parquet" and pyarrow is not available.
+    """
+
+    def __init__(self, format: str = "auto") -> None:
+        if format not in FORMATS:
+            raise ValueError(f"unknown format: {format}")
+
+        if format != "npz":
+            try:
+                import pyarrow  # type: ignore[import-not-found]  # noqa: F401
+            except ImportError:
+                if format == "parquet":
+                    raise
+                format = "npz"
+        self.format = format
+
+    def write(
+        self,
+        sheet: ScoreSheet,
+        directory: str | pathlib.Path,
+        append: bool = False,
+    ) -> list[pathlib.Path]:
+        """Write the games of `sheet` under `directory`.
+
+        Args:
+          :sheet:     See function `mjstat.model.create_score_records`.
+          :directory: The root directory of the tables.
+          :append:    If true, add new parts to the partitions; otherwise replace
+                      the parts of the partitions that `sheet` has games of.
+
+        Returns:
+          The paths of the files written.
+        """
+
+        directory = pathlib.Path(directory)
+        paths = []
+        with stage("export"):
+            for month, games in groupby(
+                sorted(sheet["games"], key=get_month), key=get_month
+            ):
+                tables = create_tables(games)
+                for name, columns in tables.items():
+                    partition = directory / name / f"month={month}"
+                    partition.mkdir(parents=True, exist_ok=True)
+                    if not append:
+                        for i in partition.glob(f"part-*.{self.format}"):
+                            i.unlink()
+                    path = partition / next_part_name(partition, self.format)
+                    if self.format == "parquet":
+                        write_parquet(path, columns, SCHEMA[name])
+                    else:
+                        write_npz(path, columns, SCHEMA[name])
+                    paths.append(path)
+        return paths
+
+
+def get_month(game: GameStats) -> str:
+    """Return the partition key of `game`, e.g. "2016-01"."""
+
+    return game["started_at"][:7].replace("/", "-")
+
+
+def next_part_name(partition: pathlib.Path, extension: str) -> str:
+    """Return the name of a new part in `partition`."""
+
+    numbers = [
+        int(i.stem.removeprefix("part-"))
+        for i in partition.glob(f"part-*.{extension}")
+        if i.stem.removeprefix("part-").isdigit()
+    ]
+    return f"part-{max(numbers, default=-1) + 1:04d}.{extension}"
+
+
+def parse_timestamp(value: str) -> datetime | None:
+    """Convert a timestamp of mjscore.txt, or "" for none."""
+
+    return datetime.strptime(value, TIMESTAMP_FORMAT) if value else None
+
+
+def create_tables(games: Iterable[GameStats]) -> dict[str, Columns]:
+    """Create the columns of the tables from `games`."""
+
+    tables = {name: {i: [] for i in schema} for name, schema in SCHEMA.items()}
+    for game in games:
+        started_at = parse_timestamp(game["started_at"])
+        players = game["players"]
+        places = {i["player"]: (n, i["points"]) for n, i in enumerate(game["result"])}
+
+        row: dict[str, object] = {
+            "started_at": started_at,
+            "finished_at": parse_timestamp(game["finished_at"]),
+            "rounds": len(game["rounds"]),
+        }
+        for seat, player in enumerate(players):
+            # Place 0 means unknown, e.g. in a game that is not closed.
+            place, points = places.get(player, (-1, 0))
+            row[f"player_{seat}"] = player
+            row[f"place_{seat}"] = place + 1
+            row[f"points_{seat}"] = points
+        append_row(tables["games"], row)
+
+        for index, round in enumerate(game["rounds"]):
+            append_round(tables, started_at, index, round, players)
+    return tables
+
+
+def append_round(
+    tables: dict[str, Columns],
+    started_at: datetime | None,
+    index: int,
+    round: RoundStats,
+    players: Sequence[str],
+) -> None:
+    """Append the rows of `round` to the columns of `tables`."""
+
+    if "draw_counts" not in round:
+        scan_actions(round)
+
+    actions = round["action_table"]
+    melds = [
+        len(round["chows"][i]) + len(round["pungs"][i]) + len(round["kongs"][i])
+        for i in range(4)
+    ]
+    # The seat of a player is the first one in `players`, like `mjstat.stat`.
+    winner = players.index(name) if (name := round.get("winner")) is not None else -1
+
+    balance = round["balance"]
+    row: dict[str, object] = {
+        "started_at": started_at,
+        "round": index,
+        "title": round["title"],
+        "ending": round.get("ending", ""),
+        "winner": winner,
+        "deal_in": round.get("deal_in_seat", -1),
+        "winning_value": round.get("winning_value", ""),
+        "winning_han": 0,
+        "winning_dora": round.get("winning_dora", -1),
+        "actions": len(actions),
+    }
+    for seat, player in enumerate(players):
+        row[f"balance_{seat}"] = balance.get(player, 0)
+        row[f"draws_{seat}"] = round["draw_counts"][seat]
+        row[f"melds_{seat}"] = melds[seat]
+
+    if winner >= 0 and (value := round.get("winning_value")) is not None:
+        yaku_list = round["winning_yaku_list"]
+        is_concealed = not melds[winner]
+        row["winning_han"] = count_winning_han(
+            value, yaku_list, round["winning_dora"], is_concealed
+        )
+        yaku = tables["yaku"]
+        for i in yaku_list:
+            yaku["started_at"].append(started_at)
+            yaku["round"].append(index)
+            yaku["seat"].append(winner)
+            yaku["yaku"].append(i.value.name)
+            yaku["han"].append(count_han((i,), is_concealed))
+    append_row(tables["rounds"], row)
+
+    columns = tables["actions"]
+    num_actions = len(actions)
+    columns["started_at"].extend([started_at] * num_actions)
+    columns["round"].extend([index] * num_actions)
+    columns["position"].extend(range(num_actions))
+    columns["seat"].extend(i & 3 for i in actions)
+    columns["type"].extend(ACTION_TYPES[i >> 2 & 7] for i in actions)
+    columns["tiles"].extend(map(action_tiles, actions))
+    columns["code"].extend(actions)
+
+
+def append_row(columns: Columns, row: Mapping[str, object]) -> None:
+    """Append `row` to `columns`."""
+
+    for name, values in columns.items():
+        values.append(row[name])
+
+
+def write_parquet(
+    path: pathlib.Path,
+    columns: Columns,
+    schema: Mapping[str, str],
+) -> None:
+    """Write `columns` into a Parquet file."""
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq  # type: ignore[import-not-found]
+
+    def arrow_type(name: str) -> pa.DataType:
+        if name == "timestamp":
+            return pa.timestamp("s")
+        return pa.type_for_alias(name)
+
+    table = pa.table({
+        name: pa.array(columns[name], type=arrow_type(dtype))
+        for name, dtype in schema.items()
+    })
+    pq.write_table(table, path)
+
+
+def write_npz(
+    path: pathlib.Path,
+    columns: Columns,
+    schema: Mapping[str, str],
+) -> None:
+    """Write `columns` into a compressed `.npz` file with an array per column.
+
+    Strings are stored as fixed-width Unicode arrays, so that the file can be loaded
+    without `allow_pickle`, and timestamps as ``datetime64[s]``, where NaT means
+    none.
+    """
+
+    import numpy as np
+
+    def numpy_type(name: str) -> str:
+        if name == "timestamp":
+            return "datetime64[s]"
+        if name == "string":
+            return "str"
+        return name
+
+    # `numpy.savez_compressed` appends the extension if missing.
+    with open(path, "wb") as fout:
+        np.savez_compressed(
+            fout,
+            **{
+                name: np.array(columns[name], dtype=numpy_type(dtype))
+                for name, dtype in schema.items()
+            },
+        )
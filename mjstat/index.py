@@ -0,0 +1,101 @@
+"""index.py: Locate games in the raw bytes of mjscore.txt without parsing them.
+
+The header line of a game, e.g. ``===== 東風戦：ランキング卓 64卓 開始 2016/01/01 00:43
+=====``, is searched for in the Shift-JIS encoded content itself, so that no line is
+decoded here. Since mjscore.txt is appended game by game, the headers are in
+chronological order and a reference period can be converted to a byte range by
+binary search.
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+from bisect import bisect_left
+from itertools import pairwise
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from collections.abc import Buffer, Sequence
+    from typing import Final
+
+ENCODING: Final = "sjis"
+
+# The byte-level counterpart of `mjstat.patterns.GAME_OPENING_RE`. No trail byte of a
+# double-byte character in Shift-JIS is either b"\n" or b"=", so that a match is
+# always at the beginning of a line.
+GAME_HEADER_RE: Final = re.compile(
+    rb"^[ \t]*=+[ \t]"
+    + re.escape("東風戦：ランキング卓 64卓 開始 ".encode(ENCODING))
+    + rb"(?P<timestamp>\d{4}/\d{2}/\d{2} \d{2}:\d{2})",
+    re.MULTILINE,
+)
+
+
+class GameOffset(NamedTuple):
+    """The location of a game in mjscore.txt.
+
+    Attributes:
+      :offset:      The byte offset of the header line of the game.
+      :started_at:  The time the game started, e.g. "2016/01/01 00:43".
+    """
+
+    offset: int
+    started_at: str
+
+
+def scan_games(
+    data: Buffer, pos: int = 0, endpos: int = sys.maxsize
+) -> list[GameOffset]:
+    """Find all the header lines of games in `data`.
+
+    Args:
+      :data:   The raw content of mjscore.txt, e.g. a bytes or an mmap object.
+      :pos:    The byte offset where the search starts.
+      :endpos: The byte offset where the search ends.
+
+    Returns:
+      A list of `GameOffset` in the order of appearance.
+    """
+
+    return [
+        GameOffset(m.start(), m.group("timestamp").decode("ascii"))
+        for m in GAME_HEADER_RE.finditer(data, pos, endpos)  # type: ignore[call-overload]
+    ]
+
+
+def find_game_range(
+    games: Sequence[GameOffset],
+    since: str,
+    until: str,
+    size: int,
+) -> tuple[int, int]:
+    """Return the byte range that contains all the games in the reference period.
+
+    Args:
+      :games: The result of `scan_games`.
+      :since: The lower bound (inclusive) of the period, or "" if unbounded.
+      :until: The upper bound (exclusive) of the period, or "" if unbounded.
+      :size:  The size of the whole content.
+
+    Returns:
+      A pair of byte offsets `(start, end)`. If the games are not in chronological
+      order, the range covers the whole content.
+    """
+
+    if not (since or until):
+        return 0, size
+    if any(a > b for a, b in pairwise(i.started_at for i in games)):
+        return 0, size
+
+    start = 0
+    if since:
+        first = bisect_left(games, since, key=lambda i: i.started_at)
+        start = games[first].offset if first < len(games) else size
+
+    end = size
+    if until:
+        last = bisect_left(games, until, key=lambda i: i.started_at)
+        end = games[last].offset if last < len(games) else size
+
+    return start, max(start, end)
@@ -0,0 +1,186 @@
+"""io.py: Define class MJScoreFileInput."""
+
+from __future__ import annotations
+
+import mmap
+from contextlib import AbstractContextManager, nullcontext
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from typing import Final
+
+    from .index import GameOffset
+
+from docutils.io import Input  # type: ignore[import-untyped]
+
+from .index import ENCODING, find_game_range, scan_games
+from .profiling import count, stage
+
+# The number of bytes decoded at a time by `MJScoreFileInput.iter_lines`, unless
+# the games are located by a reference period.
+BLOCK_SIZE: Final = 1 << 20
+
+
+class MJScoreFileInput(Input):  # type: ignore[misc]
+    """Input for mjscore.txt that reads only the games in a reference period.
+
+    Call method `set_reference_period` before reading; otherwise the whole file is
+    read. The input can also be limited to a byte range of the file, which must
+    start at the header line of a game.
+    """
+
+    def __init__(
+        self,
+        source_path: str,
+        encoding: str = ENCODING,
+        start: int = 0,
+        end: int | None = None,
+    ) -> None:
+        super().__init__(source_path=source_path, encoding=encoding)
+        self.since = ""
+        self.until = ""
+        self.start = start
+        self.end = end
+
+    def set_reference_period(self, since: str, until: str) -> None:
+        """Restrict the input to the games started in `[since, until)`.
+
+        The format of the arguments is `mjstat.model.DATETIME_FORMAT`, and an empty
+        string means the period is unbounded.
+        """
+
+        self.since = since
+        self.until = until
+
+    def map(self) -> AbstractContextManager[mmap.mmap | bytes]:
+        """Return a context manager that maps the whole file into memory."""
+
+        with open(self.source_path, "rb") as fin:
+            try:
+                return mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # An empty file cannot be mapped.
+                return nullcontext(b"")
+
+    def find_range(
+        self, data: mmap.mmap | bytes
+    ) -> tuple[int, int, list[GameOffset] | None]:
+        """Return the byte range of the games in the reference period.
+
+        Returns:
+          A tuple `(start, end, games)`, where `games` is the result of
+          `mjstat.index.scan_games` if a reference period is set, or None otherwise.
+        """
+
+        start = self.start
+        end = len(data) if self.end is None else self.end
+        if not (self.since or self.until):
+            return start, end, None
+
+        games = scan_games(data, start, end)
+        first, last = find_game_range(games, self.since, self.until, end)
+        return max(start, first), min(end, last), games
+
+    def iter_game_ranges(
+        self,
+        games: list[GameOffset],
+        start: int,
+        end: int,
+    ) -> Iterator[tuple[int, int]]:
+        """Yield the byte ranges of the games in the reference period, so that no
+        other game is decoded even if the games are not in chronological order.
+        """
+
+        since, until = self.since, self.until
+        offsets = [i for i in games if start <= i.offset < end]
+        if not offsets:
+            yield start, end
+            return
+
+        if start < offsets[0].offset:
+            # Whatever precedes the first game.
+            yield start, offsets[0].offset
+        for i, game in enumerate(offsets):
+            if (since and game.started_at < since) or (
+                until and until <= game.started_at
+            ):
+                continue
+            yield game.offset, offsets[i + 1].offset if i + 1 < len(offsets) else end
+
+    def read_bytes(self) -> bytes:
+        """Return the raw content of the games in the reference period."""
+
+        with stage("read_bytes"), self.map() as data:
+            start, end, _ = self.find_range(data)
+            count("bytes read", end - start)
+            return data[start:end]
+
+    def read(self) -> str:
+        """Return the decoded content of the games in the reference period."""
+
+        data = self.read_bytes()
+        with stage("decode"):
+            return data.decode(self.encoding, self.error_handler)
+
+    def iter_lines(self) -> Iterator[str]:
+        """Yield the lines of the games in the reference period.
+
+        The file is mapped into memory and decoded piece by piece, so that neither
+        the whole content nor all the lines are held at once.
+        """
+
+        with self.map() as data:
+            with stage("scan"):
+                start, end, games = self.find_range(data)
+            ranges = (
+                split_blocks(data, start, end)
+                if games is None
+                else self.iter_game_ranges(games, start, end)
+            )
+            yield from decode_lines(data, ranges, self.encoding, self.error_handler)
+
+
+def split_blocks(
+    data: mmap.mmap | bytes,
+    start: int,
+    end: int,
+    size: int = BLOCK_SIZE,
+) -> Iterator[tuple[int, int]]:
+    """Split `data[start:end]` into byte ranges of about `size` bytes each.
+
+    Every range but the last ends with a newline. No trail byte of a double-byte
+    character in Shift-JIS is b"\n", so that a range never splits a character.
+    """
+
+    while start < end:
+        stop = data.find(b"\n", min(start + size, end) - 1, end)
+        stop = end if stop < 0 else stop + 1
+        yield start, stop
+        start = stop
+
+
+def decode_lines(
+    data: mmap.mmap | bytes,
+    ranges: Iterable[tuple[int, int]],
+    encoding: str = ENCODING,
+    errors: str = "strict",
+) -> Iterator[str]:
+    """Decode the byte ranges of `data` and yield their lines without newlines.
+
+    Args:
+      :data:     The raw content of mjscore.txt, e.g. a bytes or an mmap object.
+      :ranges:   Pairs of byte offsets, each of which starts at the beginning of a
+                 line, e.g. the result of `split_blocks`.
+      :encoding: The encoding of `data`.
+      :errors:   The error handler of decoding.
+    """
+
+    for start, stop in ranges:
+        count("bytes read", stop - start)
+        text = data[start:stop].decode(encoding, errors)
+        lines = text.split("\n")
+        if text.endswith("\n"):
+            # The next range starts with a new line.
+            lines.pop()
+        yield from lines
@@ -75,6 +75,34 @@ Melding data
 
 """
 
+tmpl_intervals = """95% confidence intervals (bootstrap)
+  1st-place rate   {% for p in data %}{{p.intervals.first_placing_rate|map('format_percentage')|join(' - ')}}  {% endfor %}
+  4th-place rate   {% for p in data %}{{p.intervals.last_placing_rate|map('format_percentage')|join(' - ')}}  {% endfor %}
+  Mean place       {% for p in data %}{{p.intervals.mean_placing|map('format_float')|join(' - ')}}  {% endfor %}
+  Winning rate     {% for p in data %}{{p.intervals.winning_rate|map('format_percentage')|join(' - ')}}  {% endfor %}
+  Mean points      {% for p in data %}{{p.intervals.winning_mean|map('format_float')|join(' - ')}}  {% endfor %}
+  Mean han         {% for p in data %}{{p.intervals.winning_mean_han|map('format_float')|join(' - ')}}  {% endfor %}
+  Mean turns       {% for p in data %}{{p.intervals.winning_mean_turns|map('format_float')|join(' - ')}}  {% endfor %}
+  Deal-in rate     {% for p in data %}{{p.intervals.lod_rate|map('format_percentage')|join(' - ')}}  {% endfor %}
+  Mean points      {% for p in data %}{{p.intervals.lod_mean|map('format_float')|join(' - ')}}  {% endfor %}
+  Riichi rate      {% for p in data %}{{p.intervals.riichi_rate|map('format_percentage')|join(' - ')}}  {% endfor %}
+  Melding rate     {% for p in data %}{{p.intervals.melding_rate|map('format_percentage')|join(' - ')}}  {% endfor %}
+
+"""
+
+tmpl_start_hands = """Start hands
+  Mean shanten     {% for p in data %}{{p.start_shanten_mean|format_float}}  {% endfor %}
+  Mean ukeire      {% for p in data %}{{p.start_ukeire_mean|format_float}}  {% endfor %}
+  Shanten-win corr {% for p in data %}{{p.start_shanten_winning_corr|format_float}}  {% endfor %}
+
+"""
+
+tmpl_opponents = """Head-to-head
+  Player vs opponent   Games  Placed above  Dealt in  Dealt in by  Points
+{% for p in data %}{% for o in p.opponents %}  {{p.name}} vs {{o.name}}  {{o.games}}  {{o.placed_above_rate|format_percentage}}  {{o.dealt_in}}  {{o.dealt_in_by}}  {{o.points}}
+{% endfor %}{% endfor %}
+"""
+
 tmpl_yaku_freq = """Frequency of yaku
 {% for y in YakuTable -%}
 {{yaku_name_map[y]|indent(2, True)}}    {% for p in data %}{{ p.yaku_freq[y] }}  {% endfor %}
@@ -75,6 +75,34 @@ tmpl_fundamental = """着順データ
 
 """
 
+tmpl_intervals = """95%信頼区間 (ブートストラップ)
+  トップ率         {% for p in data %}{{p.intervals.first_placing_rate|map('format_percentage')|join(' - ')}}  {% endfor %}
+  ラス率           {% for p in data %}{{p.intervals.last_placing_rate|map('format_percentage')|join(' - ')}}  {% endfor %}
+  平均着順         {% for p in data %}{{p.intervals.mean_placing|map('format_float')|join(' - ')}}  {% endfor %}
+  アガリ率         {% for p in data %}{{p.intervals.winning_rate|map('format_percentage')|join(' - ')}}  {% endfor %}
+  平均得点         {% for p in data %}{{p.intervals.winning_mean|map('format_float')|join(' - ')}}  {% endfor %}
+  平均アガリ飜     {% for p in data %}{{p.intervals.winning_mean_han|map('format_float')|join(' - ')}}  {% endfor %}
+  平均アガリ巡目   {% for p in data %}{{p.intervals.winning_mean_turns|map('format_float')|join(' - ')}}  {% endfor %}
+  放銃率           {% for p in data %}{{p.intervals.lod_rate|map('format_percentage')|join(' - ')}}  {% endfor %}
+  平均失点         {% for p in data %}{{p.intervals.lod_mean|map('format_float')|join(' - ')}}  {% endfor %}
+  平均使用率       {% for p in data %}{{p.intervals.riichi_rate|map('format_percentage')|join(' - ')}}  {% endfor %}
+  鳴き使用率       {% for p in data %}{{p.intervals.melding_rate|map('format_percentage')|join(' - ')}}  {% endfor %}
+
+"""
+
+tmpl_start_hands = """配牌データ
+  平均向聴数       {% for p in data %}{{p.start_shanten_mean|format_float}}  {% endfor %}
+  平均受入枚数     {% for p in data %}{{p.start_ukeire_mean|format_float}}  {% endfor %}
+  向聴数とアガリの相関 {% for p in data %}{{p.start_shanten_winning_corr|format_float}}  {% endfor %}
+
+"""
+
+tmpl_opponents = """対戦成績
+  プレイヤー vs 相手   対戦数  先着率  放銃  被放銃  収支
+{% for p in data %}{% for o in p.opponents %}  {{p.name}} vs {{o.name}}  {{o.games}}  {{o.placed_above_rate|format_percentage}}  {{o.dealt_in}}  {{o.dealt_in_by}}  {{o.points}}
+{% endfor %}{% endfor %}
+"""
+
 tmpl_yaku_freq = """役分布
 {% for y in YakuTable -%}
 {{yaku_name_map[y]|indent(2, True)}}    {% for p in data %}{{ p.yaku_freq[y] }}  {% endfor %}
@@ -10,16 +10,32 @@ of score data.
 from __future__ import annotations
 
 import datetime
+from array import array
 from enum import Enum
 from itertools import chain, product
-from typing import TYPE_CHECKING, NamedTuple, TypedDict
+from typing import TYPE_CHECKING, NamedTuple, TypedDict, cast
 
 if TYPE_CHECKING:
     from argparse import Namespace
     from collections import Counter
-    from typing import Final, Required, Sequence
-
-import dateutil.parser  # type: ignore[import-untyped]
+    from typing import Any, Final, NotRequired, Required, Sequence
+
+    from .opponents import OpponentStats
+
+from .codec import (
+    ACTION_ARRAY_TYPE,
+    AGARI,
+    CHOW,
+    DISCARD,
+    DISCARD_AFTER_CALL,
+    DRAW,
+    KONG,
+    PUNG,
+    RIICHI,
+    action_seat,
+    action_tiles,
+    action_type,
+)
 
 DATETIME_FORMAT = r"%Y/%m/%d %H:%M"
 
@@ -109,14 +125,20 @@ class RoundStats(TypedDict, total=False):
     """Stats for a round.
 
     Attributes:
-      :action_table:       The sequence of all actions by players.
+      :action_table:       The sequence of all actions by players, encoded by
+                           `mjstat.codec.encode_action`.
       :balance:            Balance of players.
       :chows:              All the chows in this round.
+      :deal_in_seat:       The seat index (0-3) of the player who dealt in, if
+                           the round ended with ロン.
       :dora_table:         The collection of dora tiles.
+      :draw_counts:        The number of draws of each seat.
       :ending:             (ロン|ツモ|流局|四風連打|...)
       :game:               The game that this round occurred.
       :kongs:              All the kongs in this round.
       :pungs:              All the pungs in this round.
+      :riichi_positions:   The index of the first riichi of each seat in
+                           `action_table`, or -1.
       :seat_table:         An four-element array of the cardinal directions.
       :start_hand_table:   All starting hands of the players.
       :title:              The wind, round and repeat count (if presents).
@@ -126,14 +148,17 @@ class RoundStats(TypedDict, total=False):
       :winning_yaku_list:  The yaku that the winner has completed.
     """
 
-    action_table: list[str]
+    action_table: array[int]
     balance: dict[str, int]
     chows: list[list[str]]
+    deal_in_seat: int
     dora_table: list[str]
+    draw_counts: list[int]
     ending: str
     game: GameStats
     kongs: list[list[str]]
     pungs: list[list[str]]
+    riichi_positions: list[int]
     seat_table: Required[list[str]]
     start_hand_table: Required[list[str]]
     title: Required[str]
@@ -177,25 +202,65 @@ class ScoreSheet(TypedDict):
     """Document model.
 
     Attributes:
-      :games:     See GameStats.
-      :settings:  Application-dependent options.
-      :since:     from which date this program parses.
-      :until:     to which date this program parses.
+      :games:         See GameStats.
+      :settings:      Application-dependent options.
+      :since:         from which date this program parses.
+      :until:         to which date this program parses.
+      :player_index:  See function `get_player_index`.
     """
 
     games: list[GameStats]
     settings: Namespace
     since: str
     until: str
+    player_index: NotRequired[PlayerIndex]
+
+
+class PlayerIndex:
+    """An inverted index from player names to the games they played.
+
+    Attributes:
+      :entries:  Mapping from a name to a list of pairs of the index of a game in
+                 `games` and the seat index (0-3) of the player in the game, in the
+                 order of `games`. If a name appears twice in a game, the first seat
+                 is taken like `players.index(name)`.
+      :games:    The list of games indexed.
+      :size:     The number of games indexed so far.
+    """
+
+    def __init__(self, games: Sequence[GameStats]) -> None:
+        self.entries: dict[str, list[tuple[int, int]]] = {}
+        self.games = games
+        self.size = 0
+        self.update()
+
+    def update(self) -> None:
+        """Index the games appended to `self.games` since the last update."""
+
+        games, entries = self.games, self.entries
+        for game_index in range(self.size, len(games)):
+            players = games[game_index]["players"]
+            for seat, name in enumerate(players):
+                if players.index(name) == seat:
+                    if (entry := entries.get(name)) is None:
+                        entry = entries[name] = []
+                    entry.append((game_index, seat))
+        self.size = len(games)
 
 
 class PlayerStats(TypedDict, total=False):
     """Stats for a player.
 
     Attributes:
+      :count_games:         The number of matches the player has played.
       :count_rounds:        The number of rounds the player has played.
-      :games:               The matches the player has played.
+      :games:               The matches the player has played. This can be empty
+                            even if `count_games` is not zero; see
+                            `mjstat.stat.StatsTable.create_player_stats`.
+      :seats:               The seat index (0-3) of the player in each of `games`.
       :name:                One of "あなた","下家", "対面", or "上家".
+      :started_at:          The time the first match of the player started.
+      :finished_at:         The time the last match of the player finished.
       :first_placing_rate:  The rate of the top place
       :last_placing_rate:   The rate of the bottom place
       :placing_distr:       The numbers of times in 1st, ..., 4th place.
@@ -213,11 +278,23 @@ class PlayerStats(TypedDict, total=False):
       :winning_mean_han:    Mean value of numbers of han.
       :winning_mean_turns:  Mean value of turns.
       :yaku_freq:           Table of occurrences of yaku.
+      :start_shanten_mean:  Mean shanten number of start hands.
+      :start_ukeire_mean:   Mean number of tiles that improve start hands.
+      :start_shanten_winning_corr: Correlation between the shanten number of a
+                            start hand and winning the round.
+      :intervals:           The confidence intervals of some of the rates and means
+                            above; see `mjstat.bootstrap.evaluate_intervals`.
+      :opponents:           The stats against each opponent; see
+                            `mjstat.opponents.evaluate_opponents`.
     """
 
+    count_games: Required[int]
     count_rounds: Required[int]
     games: Required[list[GameStats]]
+    seats: Required[list[int]]
     name: Required[str]
+    started_at: Required[str]
+    finished_at: Required[str]
 
     first_placing_rate: float
     last_placing_rate: float
@@ -237,6 +314,11 @@ class PlayerStats(TypedDict, total=False):
     winning_mean_han: float
     winning_mean_turns: float
     yaku_freq: Counter[YakuTable]
+    start_shanten_mean: float
+    start_ukeire_mean: float
+    start_shanten_winning_corr: float
+    intervals: dict[str, tuple[float, float]]
+    opponents: list[OpponentStats]
 
 
 def create_score_records(settings: Namespace) -> ScoreSheet:
@@ -252,6 +334,26 @@ def create_score_records(settings: Namespace) -> ScoreSheet:
     return sheet
 
 
+def get_player_index(sheet: ScoreSheet) -> PlayerIndex:
+    """Return the index of the players of the games in `sheet`.
+
+    The index is built at the first call, and later calls only index the games
+    appended since then, so that the games of all players are found in time linear
+    in the number of games. If the list of games is replaced, the index is rebuilt.
+
+    Args:
+      :sheet: See function `create_score_records` above.
+    """
+
+    games = sheet["games"]
+    index = sheet.get("player_index")
+    if index is None or index.games is not games or index.size > len(games):
+        index = sheet["player_index"] = PlayerIndex(games)
+    else:
+        index.update()
+    return index
+
+
 def create_game_record(context: ScoreSheet) -> GameStats:
     """Create an empty game record.
 
@@ -267,7 +369,7 @@ def create_game_record(context: ScoreSheet) -> GameStats:
         finished_at="",
         rounds=[],
         players=("",) * 4,
-        result=[Place(player="", points=0)] * 4,
+        result=[Place(player="", points=0) for _ in range(4)],
         started_at="",
     )
     games.append(game)
@@ -287,7 +389,7 @@ def create_round_record(context: ScoreSheet) -> RoundStats:
     game = context["games"][-1]
     round_list = game["rounds"]
     round_stats = RoundStats(
-        action_table=[],
+        action_table=array(ACTION_ARRAY_TYPE),
         balance={},
         game=game,
         seat_table=[""] * 4,
@@ -322,7 +424,10 @@ def set_reference_period(sheet: ScoreSheet) -> None:
         today_date = datetime.date.today()
         since_date = today_date.strftime(DATETIME_FORMAT)
         until_date = (today_date + datetime.timedelta(1)).strftime(DATETIME_FORMAT)
-    else:
+    elif settings.since or settings.until:
+        # This is imported only here since it takes a while.
+        import dateutil.parser  # type: ignore[import-untyped]
+
         if settings.since:
             since_date = dateutil.parser.parse(settings.since).strftime(DATETIME_FORMAT)
 
@@ -341,14 +446,14 @@ def find_winner(round: RoundStats) -> None:
     """
 
     # first_or_default
-    if not (
-        winner := next((x for x in round["action_table"] if x.endswith("A")), None)
-    ):
+    if (
+        winner := next(
+            (x for x in round["action_table"] if action_type(x) == AGARI), None
+        )
+    ) is None:
         return
 
-    index = int(winner[0]) - 1
-    assert index in range(4)
-    round["winner"] = round["game"]["players"][index]
+    round["winner"] = round["game"]["players"][action_seat(winner)]
 
 
 def find_meldings(round: RoundStats) -> None:
@@ -365,37 +470,100 @@ def find_meldings(round: RoundStats) -> None:
     kongs: list[list[str]] = [[] for i in range(4)]
 
     for i, action in enumerate(actions):
-        assert len(action) > 1
-        action_type = action[1]
-        assert action_type in "ACDGKNRd"
-
-        assert action[0] in "1234"
-        index = int(action[0]) - 1
+        kind = action_type(action)
+        if kind not in (CHOW, PUNG, KONG):
+            continue
 
+        index = action_seat(action)
         prev_action = actions[i - 1] if i > 0 else None
 
-        match action_type:
-            case "C":
-                assert prev_action
-                chows[index].append(prev_action[2:] + action[2:])
-            case "N":
-                assert prev_action
-                pungs[index].append(prev_action[2:])
-            case "K":
-                # Test if this is extending a melded pung to a kong, or 加槓.
-                tile = action[2:]
-                if tile in pungs[index]:
-                    continue
-                # Test if this is a concealed kong, or 暗槓.
-                if prev_action and prev_action[1] == "G":
-                    continue
-                # Otherwise, this is a melded kong, or 大明槓.
-                assert (not prev_action) or (prev_action[1] in "dD")
-                kongs[index].append(tile)
+        if kind == CHOW:
+            assert prev_action is not None
+            chows[index].append(action_tiles(prev_action) + action_tiles(action))
+        elif kind == PUNG:
+            assert prev_action is not None
+            pungs[index].append(action_tiles(prev_action))
+        else:
+            # Test if this is extending a melded pung to a kong, or 加槓.
+            tile = action_tiles(action)
+            if tile in pungs[index]:
+                continue
+            # Test if this is a concealed kong, or 暗槓.
+            if prev_action is not None and action_type(prev_action) == DRAW:
+                continue
+            # Otherwise, this is a melded kong, or 大明槓.
+            assert prev_action is None or action_type(prev_action) in (
+                DISCARD,
+                DISCARD_AFTER_CALL,
+            )
+            kongs[index].append(tile)
+
+    round["chows"] = chows
+    round["pungs"] = pungs
+    round["kongs"] = kongs
+
+
+def scan_actions(round: RoundStats) -> None:
+    """Find everything the statistics need in a single pass over the actions.
+
+    In addition to what `find_winner` and `find_meldings` find, this function sets
+    'draw_counts', 'riichi_positions' and, if the round ended with ロン,
+    'deal_in_seat' of `round`.
+
+    Args:
+      :round: See function `create_round_record`.
+    """
+
+    actions = round["action_table"]
 
+    chows: list[list[str]] = [[] for i in range(4)]
+    pungs: list[list[str]] = [[] for i in range(4)]
+    kongs: list[list[str]] = [[] for i in range(4)]
+    draws = [0] * 4
+    riichi_positions = [-1] * 4
+    winner = -1
+
+    # See `mjstat.codec` for the layout of the codes.
+    for pos, action in enumerate(actions):
+        kind = action >> 2 & 7
+        if kind == DISCARD or kind == DISCARD_AFTER_CALL:
+            continue
+
+        seat = action & 3
+        if kind == DRAW:
+            draws[seat] += 1
+        elif kind == RIICHI:
+            if riichi_positions[seat] < 0:
+                riichi_positions[seat] = pos
+        elif kind == AGARI:
+            if winner < 0:
+                winner = seat
+        elif kind == CHOW:
+            assert pos > 0
+            chows[seat].append(action_tiles(actions[pos - 1]) + action_tiles(action))
+        elif kind == PUNG:
+            assert pos > 0
+            pungs[seat].append(action_tiles(actions[pos - 1]))
+        elif kind == KONG:
+            # Neither 加槓 nor 暗槓 is a new melding, like `find_meldings`.
+            tile = action_tiles(action)
+            if tile in pungs[seat]:
+                continue
+            if pos > 0 and action_type(actions[pos - 1]) == DRAW:
+                continue
+            kongs[seat].append(tile)
+
+    if winner >= 0:
+        round["winner"] = round["game"]["players"][winner]
     round["chows"] = chows
     round["pungs"] = pungs
     round["kongs"] = kongs
+    round["draw_counts"] = draws
+    round["riichi_positions"] = riichi_positions
+    if round.get("ending") == "ロン" and len(actions) > 1:
+        # For instance, if the action table ends with '... 1d3p 4A', player #4 wins
+        # from player #1.
+        round["deal_in_seat"] = actions[-2] & 3
 
 
 def apply_transforms(sheet: ScoreSheet) -> None:
@@ -407,10 +575,9 @@ def apply_transforms(sheet: ScoreSheet) -> None:
 
     settings = sheet["settings"]
     transforms = []
-    if settings.fundamental or settings.yaku:
-        transforms.append(find_winner)
-    if settings.fundamental:
-        transforms.append(find_meldings)
+    if settings.fundamental or settings.yaku or settings.start_hands:
+        # This covers both `find_winner` and `find_meldings`.
+        transforms.append(scan_actions)
 
     for i in sheet["games"]:
         for transform, round in product(transforms, i["rounds"]):
@@ -426,14 +593,120 @@ def merge_games(sheet_list: Sequence[ScoreSheet]) -> ScoreSheet:
 
     assert sheet_list
 
-    if not sheet_list[0]["games"]:
+    # Sheets without games, e.g. out of the reference period, are ignored.
+    if not (sheets_with_games := [i for i in sheet_list if i["games"]]):
         return sheet_list[0]
 
     sheets_sorted = sorted(
-        sheet_list, key=lambda sheet: sheet["games"][0]["started_at"]
+        sheets_with_games, key=lambda sheet: sheet["games"][0]["started_at"]
     )
 
     sheet = sheets_sorted[0].copy()
     sheet["games"] = list(chain.from_iterable(i["games"] for i in sheets_sorted))
 
     return sheet
+
+
+# mapping from yaku instances to their serial numbers in packed records
+YAKU_NUMBERS: Final = {yaku: i for i, yaku in enumerate(YakuTable)}
+
+
+def pack_game(game: GameStats) -> tuple[object, ...]:
+    """Convert a game record into a compact tuple of built-in objects.
+
+    The result does not contain any back-reference from a round to the game, so that
+    it can be pickled cheaply, e.g. in order to pass it to another process or to save
+    it to a file. Fields set by `apply_transforms` are not packed.
+
+    Args:
+      :game: See function `create_game_record`.
+
+    Returns:
+      A tuple that function `unpack_game` converts back into a game record.
+    """
+
+    return (
+        game["started_at"],
+        game["finished_at"],
+        game["players"],
+        tuple((i["player"], i["points"]) for i in game["result"]),
+        tuple(
+            (
+                round["title"],
+                tuple(round["seat_table"]),
+                tuple(round["start_hand_table"]),
+                tuple(round["dora_table"]),
+                tuple(round["balance"].items()),
+                round["action_table"].tobytes(),
+                round.get("ending"),
+                round.get("winning_value"),
+                round.get("winning_dora"),
+                (
+                    tuple(YAKU_NUMBERS[i] for i in yaku_list)
+                    if (yaku_list := round.get("winning_yaku_list")) is not None
+                    else None
+                ),
+            )
+            for round in game["rounds"]
+        ),
+    )
+
+
+def unpack_game(record: tuple[object, ...]) -> GameStats:
+    """Convert a tuple made by function `pack_game` back into a game record.
+
+    Args:
+      :record: See function `pack_game`.
+
+    Returns:
+      A new object of type GameStats.
+    """
+
+    started_at, finished_at, players, result, rounds = cast(
+        "tuple[str, str, tuple[str, str, str, str], Sequence[tuple[str, int]], Any]",
+        record,
+    )
+
+    game = GameStats(
+        finished_at=finished_at,
+        rounds=[],
+        players=players,
+        result=[Place(player=player, points=points) for player, points in result],
+        started_at=started_at,
+    )
+
+    yaku_list = tuple(YakuTable)
+    round_list = game["rounds"]
+    for (
+        title,
+        seat_table,
+        start_hand_table,
+        dora_table,
+        balance,
+        action_table,
+        ending,
+        winning_value,
+        winning_dora,
+        winning_yaku_list,
+    ) in rounds:
+        round_stats = RoundStats(
+            action_table=array(ACTION_ARRAY_TYPE, action_table),
+            balance=dict(balance),
+            game=game,
+            seat_table=list(seat_table),
+            start_hand_table=list(start_hand_table),
+            title=title,
+            dora_table=list(dora_table),
+            chows=[],
+            pungs=[],
+            kongs=[],
+        )
+        if ending is not None:
+            round_stats["ending"] = ending
+        if winning_value is not None:
+            round_stats["winning_value"] = winning_value
+            round_stats["winning_dora"] = winning_dora
+            round_stats["winning_yaku_list"] = [yaku_list[i] for i in winning_yaku_list]
+        round_list.append(round_stats)
+
+    return game
@@ -0,0 +1,191 @@
+"""opponents.py: Evaluate the stats of players against each of their opponents.
+
+Class `OpponentTable` is the head-to-head counterpart of `mjstat.stat.StatsTable`.
+It visits each game and each round only once and updates the tallies of every pair
+of players in them. The tallies are sparse: a row per player maps the IDs of the
+opponents the player has met to their counts, so that the table stays small with
+thousands of distinct names, each of whom meets only a few others.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, TypedDict
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+    from typing import Final
+
+    from .model import GameStats, PlayerStats, RoundStats, ScoreSheet
+
+from .model import scan_actions
+from .profiling import stage
+from .stat import get_key
+
+# The counts of a player against an opponent, in this order.
+GAMES: Final = 0  # The games both played.
+PLACED_ABOVE: Final = 1  # The games the player placed above the opponent.
+DEALT_IN: Final = 2  # The rounds the player dealt in to the opponent.
+POINTS: Final = 3  # The points the player paid to the opponent.
+
+NUM_COUNTS: Final = 4
+
+
+class OpponentStats(TypedDict):
+    """The stats of a player against an opponent.
+
+    Attributes:
+      :name:              The name of the opponent.
+      :games:             The number of games both played.
+      :placed_above:      The number of games the player placed above the opponent.
+      :placed_above_rate: `placed_above` over `games`.
+      :dealt_in:          The number of times the player dealt in to the opponent.
+      :dealt_in_by:       The number of times the opponent dealt in to the player.
+      :points:            The points the player won from the opponent minus those
+                          the player paid to the opponent, in the rounds that a
+                          player won.
+    """
+
+    name: str
+    games: int
+    placed_above: int
+    placed_above_rate: float
+    dealt_in: int
+    dealt_in_by: int
+    points: int
+
+
+class OpponentTable:
+    """Tallies of all the pairs of players, computed in a single pass over rounds.
+
+    Like `mjstat.stat.StatsTable`, a table consists of counts only, so that it can
+    be updated game by game and two tables can be merged.
+    """
+
+    def __init__(self) -> None:
+        self.player_ids: dict[str, int] = {}
+        self.names: list[str] = []
+        # Mappings from the IDs of opponents to `NUM_COUNTS` counts, by player ID.
+        self.rows: list[dict[int, list[int]]] = []
+
+    def get_player_id(self, name: str) -> int:
+        """Return the ID of a player, adding a new one if necessary."""
+
+        if (player_id := self.player_ids.get(name)) is not None:
+            return player_id
+
+        player_id = self.player_ids[name] = len(self.names)
+        self.names.append(name)
+        self.rows.append({})
+        return player_id
+
+    def get_counts(self, player_id: int, opponent_id: int) -> list[int]:
+        """Return the counts of a player against an opponent."""
+
+        row = self.rows[player_id]
+        if (counts := row.get(opponent_id)) is None:
+            counts = row[opponent_id] = [0] * NUM_COUNTS
+        return counts
+
+    def merge(self, other: OpponentTable) -> None:
+        """Add the tallies of `other` to this table."""
+
+        for name, other_id in other.player_ids.items():
+            player_id = self.get_player_id(name)
+            for other_opponent, other_counts in other.rows[other_id].items():
+                opponent_id = self.get_player_id(other.names[other_opponent])
+                counts = self.get_counts(player_id, opponent_id)
+                for i, value in enumerate(other_counts):
+                    counts[i] += value
+
+    def add_game(self, game: GameStats) -> None:
+        """Update the tallies with a game record."""
+
+        # Repeated names in a game count only once, like `mjstat.stat.StatsTable`.
+        names = list(dict.fromkeys(game["players"]))
+        ids = [self.get_player_id(i) for i in names]
+        for player_id in ids:
+            for opponent_id in ids:
+                if opponent_id != player_id:
+                    self.get_counts(player_id, opponent_id)[GAMES] += 1
+
+        # The first place of a name counts, like `mjstat.stat.evaluate_placing`.
+        ranking = [
+            self.player_ids[i]
+            for i in dict.fromkeys(place["player"] for place in game["result"])
+            if i in self.player_ids and i in names
+        ]
+        for i, player_id in enumerate(ranking):
+            for opponent_id in ranking[i + 1 :]:
+                self.get_counts(player_id, opponent_id)[PLACED_ABOVE] += 1
+
+        for round in game["rounds"]:
+            self.add_round(round, game["players"])
+
+    def add_round(self, round: RoundStats, players: Sequence[str]) -> None:
+        """Update the tallies with a round."""
+
+        if "draw_counts" not in round:
+            scan_actions(round)
+
+        if (winner := round.get("winner")) is None:
+            return
+
+        winner_id = self.player_ids[winner]
+        if (loser_seat := round.get("deal_in_seat")) is not None:
+            loser = players[loser_seat]
+            if loser != winner:
+                self.get_counts(self.player_ids[loser], winner_id)[DEALT_IN] += 1
+
+        # Every loss of the round, including riichi deposits, goes to the winner.
+        for name, points in round["balance"].items():
+            if points < 0 and name != winner and name in self.player_ids:
+                self.get_counts(self.player_ids[name], winner_id)[POINTS] -= points
+
+    def get_opponents(self, name: str) -> list[OpponentStats]:
+        """Return the stats of a player against each opponent, in the order of
+        `mjstat.stat.get_key`.
+        """
+
+        if (player_id := self.player_ids.get(name)) is None:
+            return []
+
+        row = self.rows[player_id]
+        opponents = []
+        for opponent_id in sorted(row, key=lambda i: get_key(self.names[i])):
+            counts = row[opponent_id]
+            reverse = self.rows[opponent_id][player_id]
+            opponents.append(
+                OpponentStats(
+                    name=self.names[opponent_id],
+                    games=counts[GAMES],
+                    placed_above=counts[PLACED_ABOVE],
+                    placed_above_rate=(
+                        counts[PLACED_ABOVE] / counts[GAMES] if counts[GAMES] else 0
+                    ),
+                    dealt_in=counts[DEALT_IN],
+                    dealt_in_by=reverse[DEALT_IN],
+                    points=reverse[POINTS] - counts[POINTS],
+                )
+            )
+        return opponents
+
+
+def evaluate_opponents(
+    sheet: ScoreSheet,
+    player_stats_list: Iterable[PlayerStats],
+) -> None:
+    """Store the stats of each player against each opponent as 'opponents' of each
+    element of `player_stats_list`.
+
+    Args:
+      :sheet:             See `mjstat.model.create_score_records`.
+      :player_stats_list: See `mjstat.stat.create_player_stats`.
+    """
+
+    table = OpponentTable()
+    with stage("tally_opponents"):
+        for game in sheet["games"]:
+            table.add_game(game)
+
+    for player_stats in player_stats_list:
+        player_stats["opponents"] = table.get_opponents(player_stats["name"])
@@ -0,0 +1,132 @@
+"""parallel.py: Parse input files of mjscore.txt in worker processes.
+
+Unless the cache is in use, each file is cut into chunks at the header lines of
+games, and the chunks are parsed independently. Each worker sends back its games as
+packed records (see `mjstat.model.pack_game`) rather than game records, because the
+latter have back-references from rounds to games, which are expensive to pickle.
+"""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from argparse import Namespace
+    from collections.abc import Sequence
+    from typing import Final
+
+from .index import find_game_range, scan_games
+from .io import MJScoreFileInput
+from .model import ScoreSheet, create_score_records, pack_game, unpack_game
+from .reader import MJScoreReader
+from .streamparser import MJScoreStreamParser
+
+# The minimum size of a chunk in bytes. Smaller chunks cost more than they gain.
+MIN_CHUNK_SIZE: Final = 1 << 20
+
+# The number of chunks per worker. More chunks balance the load better.
+CHUNKS_PER_JOB: Final = 4
+
+
+def read_file(
+    source_path: str,
+    settings: Namespace,
+    start: int = 0,
+    end: int | None = None,
+) -> list[tuple[object, ...]]:
+    """Parse a file, or a byte range of it, and return its games in the reference
+    period as packed records.
+
+    This is the task run by a worker process.
+    """
+
+    reader = MJScoreReader()
+    parser = MJScoreStreamParser()
+    source = MJScoreFileInput(source_path=source_path, start=start, end=end)
+    sheet = reader.read(source, parser, settings)
+    return [pack_game(i) for i in sheet["games"]]
+
+
+def split_file(
+    source_path: str,
+    since: str,
+    until: str,
+) -> tuple[list[int], int]:
+    """Return the offsets where a file can be cut and the end of the games in the
+    reference period.
+
+    The first element of the offsets is the start of the games in the period.
+    """
+
+    source = MJScoreFileInput(source_path=source_path)
+    with source.map() as data:
+        games = scan_games(data)
+        start, end = find_game_range(games, since, until, len(data))
+    return [start, *(i.offset for i in games if start < i.offset < end)], end
+
+
+def read_files(
+    source_paths: Sequence[str],
+    settings: Namespace,
+    jobs: int | None,
+) -> list[ScoreSheet]:
+    """Parse files in parallel and return a score sheet for each file.
+
+    Args:
+      :source_paths: The paths of input files.
+      :settings:     Command line arguments, etc.
+      :jobs:         The number of worker processes, or None for the number of CPUs.
+
+    Returns:
+      A list of `ScoreSheet` in the same order as `source_paths`.
+    """
+
+    template = create_score_records(settings)
+
+    # tasks[i] is a list of byte ranges of source_paths[i].
+    tasks: list[list[tuple[int, int | None]]]
+    if settings.cache:
+        # The cache works on the whole file.
+        tasks = [[(0, None)] for _ in source_paths]
+    else:
+        splits = [
+            split_file(i, template["since"], template["until"]) for i in source_paths
+        ]
+        total_size = sum(end - offsets[0] for offsets, end in splits)
+        chunk_size = max(
+            MIN_CHUNK_SIZE,
+            total_size // ((jobs or os.cpu_count() or 1) * CHUNKS_PER_JOB),
+        )
+        tasks = []
+        for offsets, end in splits:
+            chunks = list[tuple[int, int | None]]()
+            chunk_start = offsets[0]
+            for offset in offsets[1:]:
+                if offset - chunk_start >= chunk_size:
+                    chunks.append((chunk_start, offset))
+                    chunk_start = offset
+            chunks.append((chunk_start, end))
+            tasks.append(chunks)
+
+    paths = [path for path, chunks in zip(source_paths, tasks) for _ in chunks]
+    ranges = [i for chunks in tasks for i in chunks]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(
+            read_file,
+            paths,
+            repeat(settings),
+            (start for start, _ in ranges),
+            (end for _, end in ranges),
+        )
+        # Concatenate the games of chunks in order.
+        sheet_list = list[ScoreSheet]()
+        for chunks in tasks:
+            sheet = create_score_records(settings)
+            for _, records in zip(chunks, results):
+                sheet["games"].extend(unpack_game(i) for i in records)
+            sheet_list.append(sheet)
+
+    return sheet_list
@@ -0,0 +1,187 @@
+"""patterns.py: Define regular expressions for the lines of mjscore.txt.
+
+The patterns are shared by the state classes in `mjstat.states` and by class
+`mjstat.streamparser.MJScoreStreamParser`, so that this module must not depend on
+docutils.
+
+A state that expects one of several kinds of lines has a single pattern made by
+`compile_alternation`, so that a line is matched once instead of once per kind.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Final
+
+# ===== 東風戦：ランキング卓 64卓 開始 2016/01/01 00:43 =====
+GAME_OPENING_RE: Final = re.compile(
+    r"""
+    =*\s
+    東風戦：ランキング卓\s64卓\s開始\s
+    (?P<timestamp>
+    \d{4}/\d{2}/\d{2}\s\d{2}:\d{2}
+    )\s
+    =*
+    """,
+    re.VERBOSE,
+)
+
+# Regex for parsing players information, their names and ratings.
+INITIAL_CONDITION_RE: Final = re.compile(
+    r"""
+    持点\d+\s*      # e.g. 25000
+    \[1\](.+)\sR(?:\d+)\s*   # Player #1
+    \[2\](.+)\sR(?:\d+)\s*   # Player #2
+    \[3\](.+)\sR(?:\d+)\s*   # Player #3
+    \[4\](.+)\sR(?:\d+)\s*   # Player #4
+    """,
+    re.VERBOSE,
+)
+
+# 場 = east/south round
+# 局 = a round
+# 本場 = counter(s)
+# E.g. 東一局三本場 is translated to East, 1st round [with 0 counters].
+HAND_HEADER_RE: Final = re.compile(
+    r"""
+    (?P<title>[東南][1-4]局\s\d本場)
+    \(リーチ\d\)
+    \s?
+    (?P<balance>
+     (
+      (あなた|下家|対面|上家)\s?
+      ([+-]?\d+)\s?
+     ){,4}
+    )?
+""",
+    re.VERBOSE,
+)
+
+GAME_RESULT_RE: Final = re.compile(r"[-]+\s*試合結果\s*[-]+")
+
+# The value never contains ロ or ツ, so that a line without ロン or ツモ, e.g. 流局,
+# fails without backtracking.
+WINNING_RE: Final = re.compile(
+    r"""
+    (?P<winning_value>[^ロツ]+)
+    (?P<winning_decl>(ロン|ツモ))
+    \s
+    (
+      ((?P<winning_yaku_with_dora>.+)
+        \s
+        ドラ(?P<winning_dora>\d+)
+      )|
+      (?P<winning_yaku_without_dora>.+)
+    )
+""",
+    re.VERBOSE,
+)
+
+DRAW_RE: Final = re.compile(r"(流局|九種公九牌倒牌|三家和|四風連打|四槓開|四家リーチ)")
+
+# Regex for a start hand, or a players' dealt tiles at the beginning of a hand.
+START_HAND_RE: Final = re.compile(
+    r"""
+    \[
+      (?P<id>[1-4])                 # player id
+      (?P<seat>[東南西北])          # seat
+    \]
+    (?P<start_hand>
+        (
+            ([1-9]m)|           # character suit, or 萬子
+            (5M)|
+            ([1-9]p)|           # circle suit, or 筒子
+            (5P)|
+            ([1-9]s)|           # bamboo suit, or 索子
+            (5S)|
+            ([東南西北白発中])  # honor tiles, or 字牌
+        ){13}
+    )                   # 13 tiles of a start hand, or 配牌
+""",
+    re.VERBOSE,
+)
+
+# Regex for the line that indicates all of dora tiles.
+DORA_SET_RE: Final = re.compile(
+    r"""
+    \[表ドラ\](?P<dora>[^\s]+)
+    (\s*\[裏ドラ\](?P<uradora>.+))?      # XXX: dot matches any of tiles
+""",
+    re.VERBOSE,
+)
+
+# Regex for lines e.g. ``* 1G3s 1d1p 2G2s 2d9p ...``
+# Do not make regex so complicated here.
+ACTIONS_RE: Final = re.compile(
+    r"""
+    \A
+    \*\s*
+    (?P<actions>.+)
+    \Z
+""",
+    re.VERBOSE,
+)
+
+PLAYER_PLACE_RE: Final = re.compile(
+    r"""
+    (?P<rank>[1-4])位
+    \s+
+    (?P<player>(あなた|下家|対面|上家))
+    \s+
+    (?P<points>[+-]?\d+)
+""",
+    re.VERBOSE,
+)
+
+# ----- 64卓 終了 2016/01/01 00:47 -----
+GAME_CLOSING_RE: Final = re.compile(
+    r"""
+    [-]*\s64卓\s終了\s
+    (?P<timestamp>
+    \d{4}/\d{2}/\d{2}\s\d{2}:\d{2}
+    )
+    \s
+    [-]*
+""",
+    re.VERBOSE,
+)
+
+
+def compile_alternation(patterns: dict[str, re.Pattern[str]]) -> re.Pattern[str]:
+    """Return a pattern that matches what any of `patterns` matches.
+
+    The patterns are tried in the order of `patterns`, and the match of each is
+    enclosed in a group named after its key, so that `re.Match.lastgroup` tells
+    which one matched. The groups of the patterns themselves are kept, so that
+    their names must be distinct.
+
+    Args:
+      :patterns: A mapping from names to compiled patterns. A verbose pattern stays
+                 verbose.
+    """
+
+    return re.compile(
+        "|".join(
+            f"(?P<{name}>(?x:{pattern.pattern}\n))"
+            if pattern.flags & re.VERBOSE
+            else f"(?P<{name}>{pattern.pattern})"
+            for name, pattern in patterns.items()
+        )
+    )
+
+
+# The patterns of the lines that (3) the state of a round expects.
+ROUND_STATE_PATTERNS: Final = {
+    "summary": HAND_HEADER_RE,
+    "game_result": GAME_RESULT_RE,
+}
+
+ROUND_STATE_RE: Final = compile_alternation(ROUND_STATE_PATTERNS)
+
+# The patterns of the lines that (4) the closing of a round expects.
+ROUND_CLOSING_PATTERNS: Final = {
+    "winning": WINNING_RE,
+    "draw": DRAW_RE,
+}
+
+ROUND_CLOSING_RE: Final = compile_alternation(ROUND_CLOSING_PATTERNS)
@@ -0,0 +1,287 @@
+"""profiling.py: Measure the stages of mjscore.
+
+The functions `stage` and `count` are called from the other modules at points of
+interest. They cost almost nothing unless a `Profiler` is activated by `activate`,
+e.g. by option `--profile` of mjscore.
+
+While a profiler is active, the regexes used by `mjstat.streamparser` are replaced
+with proxies that count attempts and matches per state.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from typing import TYPE_CHECKING, TypedDict
+
+if TYPE_CHECKING:
+    import re
+    from collections.abc import Iterable, Iterator
+    from contextlib import AbstractContextManager
+    from types import ModuleType
+    from typing import Final
+
+# The states of `mjstat.streamparser.MJScoreStreamParser` that try each regex.
+PATTERN_STATES: Final = {
+    "GAME_OPENING_RE": "game_opening",
+    "INITIAL_CONDITION_RE": "game_initial_condition",
+    "HAND_HEADER_RE": "round_state",
+    "GAME_RESULT_RE": "round_state",
+    "ROUND_CLOSING_RE": "round_closing",
+    "START_HAND_RE": "round_start_hands",
+    "DORA_SET_RE": "round_dora_set",
+    "PLAYER_PLACE_RE": "game_player_place",
+    "GAME_CLOSING_RE": "game_closing",
+}
+
+NULL_CONTEXT: Final = nullcontext()
+
+
+class StageRecord(TypedDict):
+    """The cost of a stage.
+
+    Attributes:
+      :name:         The name of the stage.
+      :depth:        The number of enclosing stages.
+      :start:        The time the stage started, relative to the profiler.
+      :wall:         The elapsed time in seconds, including inner stages.
+      :cpu:          The CPU time of the process in seconds, including inner stages.
+      :children:     The elapsed time of the inner stages in seconds.
+      :peak_memory:  The peak size of memory allocated in the stage in bytes.
+      :blocks:       The change in the number of allocated memory blocks.
+    """
+
+    name: str
+    depth: int
+    start: float
+    wall: float
+    cpu: float
+    children: float
+    peak_memory: int
+    blocks: int
+
+
+class Profiler:
+    """Collect the costs of stages and counts of events.
+
+    The peak memory of stages is measured only if `trace_memory` is true, because
+    `tracemalloc` slows down the program a few times.
+    """
+
+    def __init__(self, trace_memory: bool = False) -> None:
+        self.trace_memory = trace_memory
+        self.origin = time.perf_counter()
+        self.stages: list[StageRecord] = []
+        self.counters: Counter[str] = Counter()
+        # The running peaks of memory of the enclosing stages.
+        self.peak_stack: list[int] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Measure the code in the `with` block as a stage named `name`."""
+
+        record = StageRecord(
+            name=name,
+            depth=len(self.peak_stack),
+            start=time.perf_counter() - self.origin,
+            wall=0.0,
+            cpu=0.0,
+            children=0.0,
+            peak_memory=0,
+            blocks=0,
+        )
+        self.stages.append(record)
+
+        baseline = 0
+        if self.trace_memory:
+            baseline, peak = tracemalloc.get_traced_memory()
+            if self.peak_stack:
+                self.peak_stack[-1] = max(self.peak_stack[-1], peak)
+            tracemalloc.reset_peak()
+        self.peak_stack.append(0)
+        blocks = sys.getallocatedblocks()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            record["wall"] = time.perf_counter() - wall
+            record["cpu"] = time.process_time() - cpu
+            record["blocks"] = sys.getallocatedblocks() - blocks
+            peak = self.peak_stack.pop()
+            if self.trace_memory:
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                record["peak_memory"] = peak - baseline
+                if self.peak_stack:
+                    self.peak_stack[-1] = max(self.peak_stack[-1], peak)
+            if parent := next(
+                (i for i in reversed(self.stages) if i["depth"] < record["depth"]),
+                None,
+            ):
+                parent["children"] += record["wall"]
+
+    def count_lines(self, lines: Iterable[str]) -> Iterator[str]:
+        """Yield `lines` as is, counting them."""
+
+        num_lines = 0
+        try:
+            for line in lines:
+                num_lines += 1
+                yield line
+        finally:
+            self.counters["lines read"] += num_lines
+
+    @contextmanager
+    def instrument_patterns(self, module: ModuleType) -> Iterator[None]:
+        """Replace the regexes in `module` with proxies that count attempts."""
+
+        saved: dict[str, re.Pattern[str]] = {}
+        for name, state in PATTERN_STATES.items():
+            if (pattern := getattr(module, name, None)) is not None:
+                saved[name] = pattern
+                setattr(
+                    module,
+                    name,
+                    CountingPattern(pattern, self.counters, f"{state}/{name}"),
+                )
+        try:
+            yield
+        finally:
+            for name, pattern in saved.items():
+                setattr(module, name, pattern)
+
+    def report(self) -> str:
+        """Return a human-readable report of the stages and the counters."""
+
+        header = (
+            f"{'stage':32} {'wall':>9} {'cpu':>9} {'self':>9}"
+            f" {'peak mem':>10} {'blocks':>9}"
+        )
+        lines = [header]
+        for i in self.stages:
+            name = f"{'  ' * i['depth']}{i['name']}"
+            peak = f"{i['peak_memory'] / 2**20:6.1f} MiB" if self.trace_memory else ""
+            lines.append(
+                f"{name:32} {i['wall']:8.3f}s {i['cpu']:8.3f}s"
+                f" {i['wall'] - i['children']:8.3f}s {peak:>10} {i['blocks']:9}"
+            )
+
+        if self.counters:
+            width = max(len(i) for i in self.counters)
+            lines.append("")
+            lines.append(f"{'counter':{width}} {'value':>12}")
+            lines.extend(
+                f"{name:{width}} {value:12}"
+                for name, value in sorted(self.counters.items())
+            )
+        return "\n".join(lines) + "\n"
+
+    def write_chrome_trace(self, path: str) -> None:
+        """Write the stages in the Trace Event Format of Chrome, which e.g.
+        chrome://tracing and Perfetto can open.
+        """
+
+        pid = os.getpid()
+        events = [
+            {
+                "name": i["name"],
+                "ph": "X",
+                "ts": i["start"] * 1e6,
+                "dur": i["wall"] * 1e6,
+                "pid": pid,
+                "tid": 0,
+                "args": {
+                    "cpu": i["cpu"],
+                    "peak_memory": i["peak_memory"],
+                    "blocks": i["blocks"],
+                },
+            }
+            for i in self.stages
+        ]
+        end = max((i["start"] + i["wall"] for i in self.stages), default=0.0)
+        events.extend(
+            {
+                "name": name,
+                "ph": "C",
+                "ts": end * 1e6,
+                "pid": pid,
+                "tid": 0,
+                "args": {"value": value},
+            }
+            for name, value in sorted(self.counters.items())
+        )
+        with open(path, "w", encoding="utf-8") as fout:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fout)
+
+
+class CountingPattern:
+    """A proxy of a compiled regex that counts its attempts and matches."""
+
+    def __init__(
+        self,
+        pattern: re.Pattern[str],
+        counters: Counter[str],
+        name: str,
+    ) -> None:
+        self.pattern = pattern
+        self.counters = counters
+        self.attempts_key = f"regex attempts: {name}"
+        self.matches_key = f"regex matches: {name}"
+
+    def match(self, string: str, *args: int) -> re.Match[str] | None:
+        self.counters[self.attempts_key] += 1
+        if match := self.pattern.match(string, *args):
+            self.counters[self.matches_key] += 1
+        return match
+
+    def __getattr__(self, name: str) -> object:
+        return getattr(self.pattern, name)
+
+
+# The profiler in use, if any.
+active_profiler: Profiler | None = None
+
+
+def get_profiler() -> Profiler | None:
+    """Return the active profiler, or None."""
+
+    return active_profiler
+
+
+@contextmanager
+def activate(profiler: Profiler) -> Iterator[Profiler]:
+    """Make `profiler` active in the `with` block."""
+
+    global active_profiler
+
+    from . import streamparser
+
+    if profiler.trace_memory:
+        tracemalloc.start()
+    active_profiler = profiler
+    try:
+        with profiler.instrument_patterns(streamparser):
+            yield profiler
+    finally:
+        active_profiler = None
+        if profiler.trace_memory:
+            tracemalloc.stop()
+
+
+def stage(name: str) -> AbstractContextManager[None]:
+    """Return a context manager that measures a stage if a profiler is active."""
+
+    if active_profiler is None:
+        return NULL_CONTEXT
+    return active_profiler.stage(name)
+
+
+def count(name: str, value: int = 1) -> None:
+    """Add `value` to a counter if a profiler is active."""
+
+    if active_profiler is not None:
+        active_profiler.counters[name] += value
@@ -2,14 +2,24 @@
 
 from __future__ import annotations
 
+from pathlib import Path
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from argparse import Namespace
+    from collections.abc import Iterable
+
+    from docutils.io import Input  # type: ignore[import-untyped]
+
+    from .model import GameStats
+    from .parser import MJScoreParser
+    from .stat import StatsTable
 
 from docutils.readers import Reader  # type: ignore[import-untyped]
 
-from .model import ScoreSheet, create_score_records
+from .io import MJScoreFileInput
+from .model import ScoreSheet, create_score_records, merge_games
+from .streamparser import MJScoreStreamParser
 
 
 class MJScoreReader(Reader):  # type: ignore[misc]
@@ -22,6 +32,39 @@ class MJScoreReader(Reader):  # type: ignore[misc]
     def get_transforms(self) -> None:
         pass
 
+    def read(
+        self,
+        source: Input,
+        parser: MJScoreParser | MJScoreStreamParser,
+        settings: Namespace,
+    ) -> ScoreSheet:
+        """Read `source` and return the score sheet.
+
+        If the parser allows it, the lines of `source` are passed to the parser one
+        by one instead of the whole content. Moreover, if `source` is an instance of
+        `MJScoreFileInput`, only the games in the reference period are read, and if
+        `settings.cache` is set, the games parsed before are read from the cache.
+        """
+
+        parser = self.parser or parser
+        if not isinstance(parser, MJScoreStreamParser):
+            return super().read(source, parser, settings)  # type: ignore[no-any-return]
+
+        self.source = source
+        self.parser = parser
+        self.settings = settings
+        self.document = document = self.new_document()
+        if isinstance(source, MJScoreFileInput) and settings.cache:
+            from .cache import read_cached
+
+            read_cached(source, parser, document, Path(settings.cache_dir))
+        elif isinstance(source, MJScoreFileInput):
+            source.set_reference_period(document["since"], document["until"])
+            parser.parse_lines(source.iter_lines(), document)
+        else:
+            parser.parse(source.read(), document)
+        return document
+
     def parse(self) -> None:
         self.document = document = self.new_document()
 
@@ -33,3 +76,54 @@ class MJScoreReader(Reader):  # type: ignore[misc]
     def new_document(self) -> ScoreSheet:
         settings: Namespace = self.settings
         return create_score_records(settings)
+
+
+def fold_games(
+    sources: Iterable[Input],
+    settings: Namespace,
+) -> tuple[ScoreSheet, StatsTable]:
+    """Read `sources` and fold each game into a `StatsTable` as soon as it is parsed.
+
+    Unlike evaluating the score sheets after reading them, this function holds only
+    the game being parsed, so that the memory does not grow with the history. The
+    games are always parsed; the cache is not used, since it holds all the games.
+
+    Returns:
+      A pair of the merged score sheet and the table. The score sheet has no games
+      except ones that are not closed at the end of a source.
+    """
+
+    from .stat import StatsTable
+
+    sheets = list[ScoreSheet]()
+    tables = list[tuple[str, StatsTable]]()
+    for source in sources:
+        table = StatsTable(settings.start_hands)
+
+        def fold(game: GameStats, table: StatsTable = table) -> None:
+            table.add_game(game)
+            # Break the reference cycles between the game and its rounds, so that
+            # the memory is freed at once.
+            game["rounds"].clear()
+
+        sheet = create_score_records(settings)
+        parser = MJScoreStreamParser(on_game=fold)
+        if isinstance(source, MJScoreFileInput):
+            source.set_reference_period(sheet["since"], sheet["until"])
+            parser.parse_lines(source.iter_lines(), sheet)
+        else:
+            parser.parse(source.read(), sheet)
+
+        for game in sheet["games"]:
+            table.add_game(game)
+        sheets.append(sheet)
+        tables.append((min(filter(None, table.started_at), default=""), table))
+
+    if len(tables) == 1:
+        return sheets[0], tables[0][1]
+
+    # Merge the tables in chronological order like `mjstat.model.merge_games`.
+    result = StatsTable()
+    for _, table in sorted(tables, key=lambda i: i[0]):
+        result.merge(table)
+    return merge_games(sheets), result
@@ -0,0 +1,140 @@
+"""series.py: Evaluate the fundamental stats of players as time series.
+
+A series is either rolling, i.e. a window of a fixed number of the latest games of a
+player, or bucketed, i.e. the games of a player that started in the same day, month
+or year. The terms of the stats of each game are taken once into arrays by
+`mjstat.bootstrap.Samples`, and the sums over any window or bucket are differences
+of their prefix sums, so that the cost does not depend on the number of windows.
+
+The values of a row are the items of `mjstat.bootstrap.RATIOS`, which are the same
+as those `mjstat.stat.evaluate_players` stores for the games in the row.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+    from typing import Final, TextIO
+
+    from numpy.typing import NDArray
+
+    from .model import ScoreSheet
+
+from .bootstrap import GAME_TERMS, RATIOS, ROUND_TERMS, Samples
+from .profiling import stage
+
+# The length of the prefix of `GameStats["started_at"]`, e.g. "2016/01/01 00:43",
+# that identifies a bucket.
+BUCKETS: Final = {"day": 10, "month": 7, "year": 4}
+
+FORMATS: Final = ("csv", "json")
+
+# The columns of a row.
+FIELDS: Final = ("player", "period", "games", "rounds", *RATIOS)
+
+Row = dict[str, object]
+
+
+def create_series(
+    sheet: ScoreSheet,
+    players: Sequence[str],
+    window: int = 0,
+    bucket: str | None = None,
+) -> list[Row]:
+    """Return the rows of the series of `players`.
+
+    Either `window` or `bucket` must be specified. 'period' of a row is
+    'started_at' of the last game of a window, or the key of a bucket, e.g.
+    "2016/01" for a month.
+
+    Args:
+      :sheet:   See `mjstat.model.create_score_records`.
+      :players: The names of the players.
+      :window:  The number of games in a window. Only full windows make rows.
+      :bucket:  One of the keys of `BUCKETS`.
+    """
+
+    if bucket is not None and bucket not in BUCKETS:
+        raise ValueError(f"unknown bucket: {bucket}")
+    if not window and bucket is None:
+        raise ValueError("either window or bucket is required")
+
+    games = sheet["games"]
+    samples = Samples(sheet, players)
+    with stage("series"):
+        values = np.concatenate((samples.games, samples.sum_rounds_by_game()), axis=2)
+        started_at = np.array([i["started_at"] for i in games], dtype=str)
+        terms = {name: i for i, name in enumerate(GAME_TERMS + ROUND_TERMS)}
+
+        rows: list[Row] = []
+        for player_id, name in enumerate(samples.players):
+            played = np.flatnonzero(values[:, player_id, terms["count_games"]])
+            if not len(played):
+                continue
+            # Stable, so that games of the same minute stay in the input order.
+            played = played[np.argsort(started_at[played], kind="stable")]
+            # The sums of the first 0, 1, ... games of the player.
+            prefix = np.zeros((len(played) + 1, len(terms)))
+            np.cumsum(values[played, player_id], axis=0, out=prefix[1:])
+
+            if window:
+                ends = np.arange(window, len(played) + 1)
+                starts = ends - window
+                periods = started_at[played[ends - 1]]
+            else:
+                # Casting to a shorter string type truncates the timestamps.
+                keys = started_at[played].astype(f"U{BUCKETS[bucket]}")
+                starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+                ends = np.r_[starts[1:], len(played)]
+                periods = keys[starts]
+
+            sums = prefix[ends] - prefix[starts]
+            rows.extend(create_rows(name, periods.tolist(), sums, terms))
+    return rows
+
+
+def create_rows(
+    player: str,
+    periods: Sequence[str],
+    sums: NDArray[np.float64],
+    terms: dict[str, int],
+) -> list[Row]:
+    """Convert the sums of the terms of periods into rows."""
+
+    columns: dict[str, list[float]] = {}
+    for item, (numerator, denominator) in RATIOS.items():
+        x = sums[:, terms[numerator]]
+        y = sums[:, terms[denominator]]
+        # A ratio is 0 if there is nothing to divide, like `mjstat.stat`.
+        columns[item] = np.divide(x, y, out=np.zeros_like(x), where=y > 0).tolist()
+
+    return [
+        {
+            "player": player,
+            "period": period,
+            "games": int(sums[i, terms["count_games"]]),
+            "rounds": int(sums[i, terms["count_rounds"]]),
+            **{item: values[i] for item, values in columns.items()},
+        }
+        for i, period in enumerate(periods)
+    ]
+
+
+def write_series(rows: Sequence[Row], fout: TextIO, format: str = "csv") -> None:
+    """Write `rows` in CSV with a header line, or in JSON as an array of objects."""
+
+    if format == "csv":
+        writer = csv.DictWriter(fout, FIELDS, lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(rows)
+    elif format == "json":
+        json.dump(rows, fout, ensure_ascii=False, indent=1)
+        fout.write("\n")
+    else:
+        raise ValueError(f"unknown format: {format}")
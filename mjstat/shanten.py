@@ -0,0 +1,368 @@
+"""shanten.py: Evaluate the tile efficiency of hands.
+
+A hand is represented by the counts of the 34 kinds of tiles, indexed as 1-9m (0-8),
+1-9p (9-17), 1-9s (18-26) and 東南西北白発中 (27-33); red fives count as fives.
+
+The shanten number of a regular hand is ``8 - 2 * M - min(T, 4 - M) - H``, where M
+is the number of melds, T that of partial melds (pairs and incomplete chows) and H
+is 1 if a pair is left for the head. Since no meld spans two suits, each suit is
+decomposed separately into a *vector*: the maximum T of the suit for each M (0-4),
+without and with the head. The vectors of the four suits are then combined.
+
+Both steps are looked up in tables. A suit is keyed by its counts as a base-5
+number, so that a key identifies the same vector in any hand. Few vectors are
+distinct, so that they are interned into small IDs, and combining two vectors is
+also a lookup by a pair of IDs. The tables are filled on demand rather than for all
+the 405,350 possible suits in advance, which would take minutes in Python; a few
+thousand keys cover most of the start hands.
+
+The shanten number of a hand is the minimum of those of the regular form, seven
+pairs (七対子) and thirteen orphans (国士無双). It is 0 for a ready hand, and -1
+for a complete hand of 14 tiles.
+"""
+
+from __future__ import annotations
+
+from operator import itemgetter, mul
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+    from typing import Final
+
+# The number of kinds of tiles and the index of the first honor.
+NUM_KINDS: Final = 34
+HONORS: Final = 27
+
+KIND_INDICES: Final = {
+    **{
+        f"{i + 1}{suit}": base + i
+        for base, suit in ((0, "m"), (9, "p"), (18, "s"))
+        for i in range(9)
+    },
+    **{honor: HONORS + i for i, honor in enumerate("東南西北白発中")},
+    "5M": 4,
+    "5P": 13,
+    "5S": 22,
+}
+
+# 1-9m, 1-9p, 1-9s and the honors.
+TERMINALS: Final = (0, 8, 9, 17, 18, 26, *range(HONORS, NUM_KINDS))
+IS_TERMINAL: Final = tuple(i in TERMINALS for i in range(NUM_KINDS))
+get_terminals: Final = itemgetter(*TERMINALS)
+
+# The first index and the number of kinds of each suit, the honors last.
+SUITS: Final = ((0, 9), (9, 9), (18, 9), (HONORS, 7))
+
+POWERS: Final = tuple(5**i for i in range(9))
+
+# A vector holds the maximum number of partial melds for each number of melds
+# without the head (indices 0-4) and with the head (indices 5-9), or -1 if the
+# number of melds is impossible.
+Vector = tuple[int, ...]
+
+EMPTY_VECTOR: Final = (0, -1, -1, -1, -1, -1, -1, -1, -1, -1)
+
+# Interned vectors and their IDs.
+vectors: list[Vector] = []
+vector_ids: dict[Vector, int] = {}
+
+# The shanten number of the regular form for each vector ID, and for each number
+# of melds called (0-4) in `meld_shanten`.
+vector_shanten: list[int] = []
+meld_shanten: list[tuple[int, ...]] = []
+
+# Mappings from the keys of suits to vector IDs, filled by `decompose`.
+number_table: dict[int, int] = {}
+honor_table: dict[int, int] = {}
+
+# Mapping from pairs of vector IDs to the ID of their combination.
+combination_table: dict[tuple[int, int], int] = {}
+
+# Mapping from the vector IDs of the other suits and the keys of suits to the
+# results of `get_draw_mask`.
+draw_table: dict[tuple[int, int, bool], int] = {}
+
+
+class Efficiency(NamedTuple):
+    """The tile efficiency of a hand.
+
+    Attributes:
+      :shanten:  The shanten number.
+      :ukeire:   The number of tiles that decrease the shanten number when drawn,
+                 not counting those in the hand.
+    """
+
+    shanten: int
+    ukeire: int
+
+
+def count_tiles(hand: str) -> list[int]:
+    """Return the counts of the tiles of `hand`, e.g. "1m2m5M東", by kind."""
+
+    counts = [0] * NUM_KINDS
+    i, size = 0, len(hand)
+    while i < size:
+        if hand[i].isdigit():
+            counts[KIND_INDICES[hand[i : i + 2]]] += 1
+            i += 2
+        else:
+            counts[KIND_INDICES[hand[i]]] += 1
+            i += 1
+    return counts
+
+
+def intern_vector(vector: Vector) -> int:
+    """Return the ID of `vector`, adding it to the tables if necessary."""
+
+    if (vector_id := vector_ids.get(vector)) is not None:
+        return vector_id
+
+    vector_id = vector_ids[vector] = len(vectors)
+    vectors.append(vector)
+    # The called melds take the place of melds in the hand.
+    meld_shanten.append(
+        tuple(
+            8
+            - max(
+                2 * (i % 5 + melds) + min(t, 4 - i % 5 - melds) + (i >= 5)
+                for i, t in enumerate(vector)
+                if t >= 0 and i % 5 + melds <= 4
+            )
+            for melds in range(5)
+        )
+    )
+    vector_shanten.append(meld_shanten[-1][0])
+    return vector_id
+
+
+def merge_into(best: list[int], vector: Vector, melds: int, partials: int) -> None:
+    """Update `best` with `vector` plus `melds` melds and `partials` partial melds."""
+
+    for i, t in enumerate(vector):
+        if t < 0:
+            continue
+        m = i % 5 + melds
+        if m > 4:
+            continue
+        j = m + 5 if i >= 5 else m
+        t = min(t + partials, 4 - m)
+        best[j] = max(best[j], t)
+
+
+def decompose(key: int, table: dict[int, int], sequences: bool) -> int:
+    """Return the vector ID of a suit keyed by `key`.
+
+    The lowest rank in the suit is taken out as a meld, a pair or a partial meld,
+    or discarded, and the rest is decomposed recursively. Since the rest is also
+    memoized in `table`, every key is decomposed once.
+
+    Args:
+      :key:       The counts of the ranks of the suit as a base-5 number.
+      :table:     Either `number_table` or `honor_table`.
+      :sequences: True unless the suit is of honors, which make no chows.
+    """
+
+    if (vector_id := table.get(key)) is not None:
+        return vector_id
+
+    rank, rest = 0, key
+    while not rest % 5:
+        rest //= 5
+        rank += 1
+    count = rest % 5
+    unit = POWERS[rank]
+    next1 = rest // 5 % 5 if sequences and rank < 8 else 0
+    next2 = rest // 25 % 5 if sequences and rank < 7 else 0
+
+    best = list(vectors[decompose(key - unit, table, sequences)])
+    if count >= 3:
+        merge_into(best, vectors[decompose(key - 3 * unit, table, sequences)], 1, 0)
+    if count >= 2:
+        pair = vectors[decompose(key - 2 * unit, table, sequences)]
+        merge_into(best, pair, 0, 1)
+        # The pair as the head.
+        for i in range(5):
+            best[i + 5] = max(best[i + 5], pair[i])
+    if next1 and next2:
+        merge_into(best, vectors[decompose(key - 31 * unit, table, sequences)], 1, 0)
+    if next1:
+        merge_into(best, vectors[decompose(key - 6 * unit, table, sequences)], 0, 1)
+    if next2:
+        merge_into(best, vectors[decompose(key - 26 * unit, table, sequences)], 0, 1)
+
+    vector_id = table[key] = intern_vector(tuple(best))
+    return vector_id
+
+
+def combine(a: int, b: int) -> int:
+    """Return the ID of the combination of the vectors of IDs `a` and `b`."""
+
+    if (vector_id := combination_table.get((a, b))) is not None:
+        return vector_id
+
+    best = [-1] * 10
+    vector_b = vectors[b]
+    for i, t in enumerate(vectors[a]):
+        if t < 0:
+            continue
+        for j, u in enumerate(vector_b):
+            # Only one of them can have the head.
+            if u < 0 or (i >= 5 and j >= 5):
+                continue
+            m = i % 5 + j % 5
+            if m > 4:
+                continue
+            k = m + 5 if i >= 5 or j >= 5 else m
+            best[k] = max(best[k], min(t + u, 4 - m))
+
+    vector_id = intern_vector(tuple(best))
+    combination_table[a, b] = combination_table[b, a] = vector_id
+    return vector_id
+
+
+intern_vector(EMPTY_VECTOR)
+number_table[0] = honor_table[0] = 0
+
+# The table of each suit in `SUITS`.
+SUIT_TABLES: Final = (number_table, number_table, number_table, honor_table)
+
+
+def get_suit_keys(counts: Sequence[int]) -> list[int]:
+    """Return the keys of the three suits and the honors of `counts`."""
+
+    return [
+        sum(map(mul, counts[0:9], POWERS)),
+        sum(map(mul, counts[9:18], POWERS)),
+        sum(map(mul, counts[18:27], POWERS)),
+        sum(map(mul, counts[HONORS:NUM_KINDS], POWERS)),
+    ]
+
+
+def get_vector_ids(keys: Sequence[int]) -> list[int]:
+    """Return the vector IDs of the suits keyed by `keys`."""
+
+    return [
+        decompose(keys[0], number_table, True),
+        decompose(keys[1], number_table, True),
+        decompose(keys[2], number_table, True),
+        decompose(keys[3], honor_table, False),
+    ]
+
+
+def calculate_regular_shanten(counts: Sequence[int], melds: int = 0) -> int:
+    """Return the shanten number of the regular form of a hand.
+
+    Args:
+      :counts: The counts of the tiles in the hand, not including called melds.
+      :melds:  The number of melds called.
+    """
+
+    ids = get_vector_ids(get_suit_keys(counts))
+    vector_id = combine(combine(ids[0], ids[1]), combine(ids[2], ids[3]))
+    return meld_shanten[vector_id][melds]
+
+
+def calculate_seven_pairs_shanten(counts: Sequence[int]) -> int:
+    """Return the shanten number of seven pairs of a hand."""
+
+    kinds = NUM_KINDS - counts.count(0)
+    pairs = kinds - counts.count(1)
+    return 6 - pairs + max(0, 7 - kinds)
+
+
+def calculate_orphans_shanten(counts: Sequence[int]) -> int:
+    """Return the shanten number of thirteen orphans of a hand."""
+
+    terminals = get_terminals(counts)
+    return 13 - (len(terminals) - terminals.count(0)) - (max(terminals) >= 2)
+
+
+def calculate_shanten(counts: Sequence[int]) -> int:
+    """Return the shanten number of a hand of 13 or 14 tiles."""
+
+    return min(
+        calculate_regular_shanten(counts),
+        calculate_seven_pairs_shanten(counts),
+        calculate_orphans_shanten(counts),
+    )
+
+
+def get_draw_mask(rest: int, key: int, is_honor: bool) -> int:
+    """Return the ranks of a suit whose tile decreases the shanten number of the
+    regular form when drawn, as a bit mask.
+
+    Args:
+      :rest:     The vector ID of the other suits.
+      :key:      The key of the suit.
+      :is_honor: True if the suit is of honors.
+    """
+
+    if (mask := draw_table.get((rest, key, is_honor))) is not None:
+        return mask
+
+    table = honor_table if is_honor else number_table
+    current = vector_shanten[combine(rest, decompose(key, table, not is_honor))]
+    counts = [key // i % 5 for i in POWERS]
+    mask = 0
+    for rank in range(7 if is_honor else 9):
+        # Only a tile next to a tile of the hand makes a new (partial) meld.
+        if counts[rank] >= 4 or not (
+            counts[rank] if is_honor else any(counts[max(0, rank - 2) : rank + 3])
+        ):
+            continue
+        new_id = decompose(key + POWERS[rank], table, not is_honor)
+        if vector_shanten[combine(rest, new_id)] < current:
+            mask |= 1 << rank
+    draw_table[rest, key, is_honor] = mask
+    return mask
+
+
+def evaluate_hand(counts: Sequence[int]) -> Efficiency:
+    """Return the shanten number and the ukeire of a hand of 13 tiles.
+
+    A drawn tile decreases the shanten number by one at most. For the regular form,
+    it changes the vector of its suit only, so that which tiles decrease the number
+    depends on the key of the suit and the combination of the other three suits;
+    see `get_draw_mask`.
+    """
+
+    keys = get_suit_keys(counts)
+    m, p, s, h = get_vector_ids(keys)
+    mp, sh = combine(m, p), combine(s, h)
+    # The combination of all the suits but one for each suit.
+    rests = (combine(p, sh), combine(m, sh), combine(mp, h), combine(mp, s))
+    regular = vector_shanten[combine(mp, sh)]
+
+    kinds = NUM_KINDS - counts.count(0)
+    pairs = kinds - counts.count(1)
+    terminals = get_terminals(counts)
+    orphans = len(terminals) - terminals.count(0)
+    orphan_pair = max(terminals) >= 2
+    seven_pairs = 6 - pairs + max(0, 7 - kinds)
+    shanten = min(regular, seven_pairs, 13 - orphans - orphan_pair)
+
+    ukeire = 0
+    for suit, (base, size) in enumerate(SUITS):
+        # The ranks that decrease the shanten number of the regular form.
+        draws = (
+            get_draw_mask(rests[suit], keys[suit], suit == 3)
+            if regular == shanten
+            else 0
+        )
+        for rank in range(size):
+            kind = base + rank
+            if (n := counts[kind]) >= 4:
+                continue
+            if (
+                draws >> rank & 1
+                or (seven_pairs == shanten and (n == 1 or (not n and kinds < 7)))
+                or (
+                    IS_TERMINAL[kind]
+                    and 13 - orphans - orphan_pair == shanten
+                    and (not n or (n == 1 and not orphan_pair))
+                )
+            ):
+                ukeire += 4 - n
+
+    return Efficiency(shanten, ukeire)
@@ -1,19 +1,33 @@
 """stat.py: The module for mahjong statistics.
 
 This module contains function `create_player_data` and several
-functions in order to evaluate player's statistical information.
+functions in order to evaluate player's statistical information, and
+class `StatsTable` which evaluates them for all players at once.
 """
 
 from __future__ import annotations
 
+import math
 import re
+from array import array
 from collections import Counter
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from typing import Final, Iterable
-
-from .model import YAKUMAN_SCALAR, PlayerStats, ScoreSheet, YakuTable
+    from typing import Final, Iterable, Sequence
+
+from .model import (
+    YAKUMAN_SCALAR,
+    GameStats,
+    PlayerStats,
+    RoundStats,
+    ScoreSheet,
+    YakuTable,
+    get_player_index,
+    scan_actions,
+)
+from .profiling import stage
+from .shanten import count_tiles, evaluate_hand
 
 # Mapping from special player names to key values.
 DEFAULT_PLAYERS: Final = {
@@ -37,18 +51,24 @@ def create_player_stats(sheet: ScoreSheet, *players: str) -> list[PlayerStats]:
       :players: A list of target players' names.
 
     Returns:
-      A list which contains dict objects which contain 'count_rounds', 'games', and
-      'name' as keys.
+      A list which contains dict objects which contain 'count_games', 'count_rounds',
+      'games', 'seats', 'name', 'started_at' and 'finished_at' as keys.
     """
 
     games: Final = sheet["games"]
+    entries: Final = get_player_index(sheet).entries
     player_stats_list = list[PlayerStats]()
     for i in sorted(players, key=get_key):
-        target_games = [g for g in games if i in g["players"]]
+        entry = entries.get(i, [])
+        target_games = [games[j] for j, _ in entry]
         stats = PlayerStats(
+            count_games=len(target_games),
             count_rounds=sum(len(g["rounds"]) for g in target_games),
             games=target_games,
+            seats=[seat for _, seat in entry],
             name=i,
+            started_at=target_games[0]["started_at"] if target_games else "",
+            finished_at=target_games[-1]["finished_at"] if target_games else "",
         )
         player_stats_list.append(stats)
     return player_stats_list
@@ -124,6 +144,39 @@ WINNING_VALUE_RE: Final = re.compile(
 HAN_CHAR_TABLE: Final = {k: v for v, k in enumerate("一二三四", 1)}
 
 
+def count_winning_han(
+    value: str,
+    yaku_list: Iterable[YakuTable],
+    dora: int,
+    is_concealed: bool,
+) -> int:
+    """Count the number of han of a winning hand.
+
+    Args:
+      :value:        The winning value, e.g. "40符 二飜", "満貫", or "役満".
+      :yaku_list:    The yaku that the winner has completed.
+      :dora:         The number of dora the winner has won.
+      :is_concealed: Determine if the winner has not melded any tile.
+    """
+
+    if hu_han := WINNING_VALUE_RE.match(value):
+        return HAN_CHAR_TABLE[hu_han.group("han")]
+
+    # Pattern 満貫 covers 満貫 itself as well as
+    # 跳満, 倍満 and 三倍満.
+    if value.find("満貫") != -1:
+        # Manually count how many han are.
+        return count_han(yaku_list, is_concealed) + dora
+
+    index = value.find("役満")
+    if index > 0:
+        yakuman_prefix: str = value[:index]
+        return 13 * YAKUMAN_SCALAR[yakuman_prefix]
+    if index == 0:
+        return 13
+    raise ValueError(f"unknown winning: {value}")
+
+
 def evaluate_winning(player_stats: PlayerStats) -> None:
     """Evaluate target player's winning data.
 
@@ -152,11 +205,7 @@ def evaluate_winning(player_stats: PlayerStats) -> None:
     total_turns: int = 0
     total_han: int = 0
     name: Final[str] = player_stats["name"]
-    for i in player_stats["games"]:
-        # pattern must be 1G, 2G, 3G or 4G.
-        index = i["players"].index(name)
-        pattern = f"{index + 1:d}G"
-
+    for i, index in zip(player_stats["games"], player_stats["seats"]):
         for round in i["rounds"]:
             if name != round.get("winner", None):
                 continue
@@ -165,39 +214,20 @@ def evaluate_winning(player_stats: PlayerStats) -> None:
             total_points += round["balance"][name]
             num_winning += 1
 
-            total_turns += sum(
-                1 for j in round["action_table"] if j.startswith(pattern)
+            total_turns += round["draw_counts"][index]
+
+            is_concealed = (
+                not round["chows"][index]
+                and not round["pungs"][index]  # including 加槓
+                and not round["kongs"][index]
+            )  # only 大明槓
+            total_han += count_winning_han(
+                round["winning_value"],
+                round["winning_yaku_list"],
+                round["winning_dora"],
+                is_concealed,
             )
 
-            value = round["winning_value"]
-            han: int
-            if hu_han := WINNING_VALUE_RE.match(value):
-                han = HAN_CHAR_TABLE[hu_han.group("han")]
-            else:
-                # Pattern 満貫 covers 満貫 itself as well as
-                # 跳満, 倍満 and 三倍満.
-                if value.find("満貫") != -1:
-                    # Manually count how many han are.
-                    is_concealed = (
-                        not round["chows"][index]
-                        and not round["pungs"][index]  # including 加槓
-                        and not round["kongs"][index]
-                    )  # only 大明槓
-                    han = count_han(round["winning_yaku_list"], is_concealed)
-
-                    han += round["winning_dora"]
-                else:
-                    index = value.find("役満")
-                    if index > 0:
-                        yakuman_prefix: str = value[:index]
-                        han = 13 * YAKUMAN_SCALAR[yakuman_prefix]
-                    elif index == 0:
-                        han = 13
-                    else:
-                        raise ValueError(f"unknown winning: {value}")
-
-            total_han += han
-
     if num_winning:
         player_stats["winning_count"] = num_winning
         player_stats["winning_rate"] = num_winning / num_rounds
@@ -228,16 +258,9 @@ def evaluate_losing(player_stats: PlayerStats) -> None:
     num_lod: int = 0
     total_losing_points: int = 0
     name: Final[str] = player_stats["name"]
-    for i in player_stats["games"]:
-        index = i["players"].index(name)
+    for i, index in zip(player_stats["games"], player_stats["seats"]):
         for round in i["rounds"]:
-            if (
-                round["ending"] == "ロン"
-                and
-                # For instance, if the action table ends with
-                # '... 1d3p 4A', player #4 wins from player #1.
-                index == int(round["action_table"][-2][0]) - 1
-            ):
+            if round.get("deal_in_seat") == index:
                 assert round["balance"]
                 num_lod += 1
                 # sum of negative values
@@ -267,20 +290,12 @@ def evaluate_riichi(player_stats: PlayerStats) -> None:
         return
 
     num_riichi: int = 0
-    name: Final[str] = player_stats["name"]
-    for i in player_stats["games"]:
-        player_index = i["players"].index(name) + 1
-        riichi_mark = f"{player_index}R"
+    for i, index in zip(player_stats["games"], player_stats["seats"]):
         for round in i["rounds"]:
-            actions = round["action_table"]
-
-            try:
-                pos = actions.index(riichi_mark)
-            except ValueError:
+            if (pos := round["riichi_positions"][index]) < 0:
                 continue
 
-            rest_actions = actions[pos + 1 :]
-            num_rest_actions = len(rest_actions)
+            num_rest_actions = len(round["action_table"]) - pos - 1
             if num_rest_actions == 1 or num_rest_actions > 2:
                 # the 4th riichi in a 四家立直
                 # or rest_actions[0] does not deal in another
@@ -314,9 +329,7 @@ def evaluate_melding(player_stats: PlayerStats) -> None:
         return
 
     num_melding: int = 0
-    name: Final[str] = player_stats["name"]
-    for game in player_stats["games"]:
-        pos = game["players"].index(name)
+    for game, pos in zip(player_stats["games"], player_stats["seats"]):
         for round in game["rounds"]:
             # If できすぎくん's style is preferred,
             # just increment num_melding one only if rhs > 1.
@@ -346,3 +359,441 @@ def evaluate_yaku_frequency(player_stats: PlayerStats) -> None:
     ):
         yaku_counter.update(yaku_list)
     player_stats["yaku_freq"] = yaku_counter
+
+
+def evaluate_start_hands(player_stats: PlayerStats) -> None:
+    """Evaluate the tile efficiency of target player's start hands.
+
+    This function stores the following items to `player_stats`:
+
+    :start_shanten_mean: the mean shanten number of the start hands.
+    :start_ukeire_mean: the mean number of tiles that improve the start hands.
+    :start_shanten_winning_corr: the correlation between the shanten number of a
+      start hand and winning the round.
+
+    Args:
+      :player_stats: See `mjstat.stat.create_player_stats`.
+    """
+
+    num_hands: int = 0
+    total_shanten: int = 0
+    total_shanten_sq: int = 0
+    total_ukeire: int = 0
+    num_winning: int = 0
+    total_winning_shanten: int = 0
+    name: Final[str] = player_stats["name"]
+    for i, index in zip(player_stats["games"], player_stats["seats"]):
+        for round in i["rounds"]:
+            counts = count_tiles(round["start_hand_table"][index])
+            if sum(counts) != 13:
+                continue
+
+            shanten, ukeire = evaluate_hand(counts)
+            num_hands += 1
+            total_shanten += shanten
+            total_shanten_sq += shanten * shanten
+            total_ukeire += ukeire
+            if name == round.get("winner", None):
+                num_winning += 1
+                total_winning_shanten += shanten
+
+    store_start_hands(
+        player_stats,
+        num_hands,
+        total_shanten,
+        total_shanten_sq,
+        total_ukeire,
+        num_winning,
+        total_winning_shanten,
+    )
+
+
+def store_start_hands(
+    player_stats: PlayerStats,
+    num_hands: int,
+    total_shanten: int,
+    total_shanten_sq: int,
+    total_ukeire: int,
+    num_winning: int,
+    total_winning_shanten: int,
+) -> None:
+    """Store the items of `evaluate_start_hands` from the sums over start hands.
+
+    The correlation is Pearson's between the shanten number and 1 for a win or 0
+    otherwise, and it is 0 if either of them is constant.
+    """
+
+    player_stats["start_shanten_mean"] = 0
+    player_stats["start_ukeire_mean"] = 0
+    player_stats["start_shanten_winning_corr"] = 0
+    if not num_hands:
+        return
+
+    player_stats["start_shanten_mean"] = total_shanten / num_hands
+    player_stats["start_ukeire_mean"] = total_ukeire / num_hands
+
+    # Since a win is 0 or 1, the sum of its squares is `num_winning`.
+    variance_x = num_hands * total_shanten_sq - total_shanten**2
+    variance_y = num_hands * num_winning - num_winning**2
+    if variance_x and variance_y:
+        covariance = num_hands * total_winning_shanten - total_shanten * num_winning
+        player_stats["start_shanten_winning_corr"] = covariance / math.sqrt(
+            variance_x * variance_y
+        )
+
+
+class StatsTable:
+    """Tallies of all the players, computed in a single pass over rounds.
+
+    Unlike the `evaluate_*` functions above, which walk all the games of a player
+    for each player and for each kind of statistics, this object visits each round
+    only once and updates the tallies of all the four seats at the same time. The
+    tallies are stored in arrays indexed by player IDs.
+
+    A table consists of counts and sums only, so that it can be updated game by game
+    and two tables can be merged, e.g. tables of years into an all-time one. It can
+    also be pickled; see `mjstat.cache.update_totals`.
+    """
+
+    # The names of integer columns indexed by player IDs.
+    COLUMNS: Final = (
+        "count_games",
+        "count_rounds",
+        "winning_count",
+        "winning_points",
+        "winning_turns",
+        "winning_han",
+        "lod_count",
+        "lod_points",
+        "riichi_count",
+        "melding_count",
+        "start_hands",
+        "start_shanten",
+        "start_shanten_sq",
+        "start_ukeire",
+        "start_winning",
+        "start_winning_shanten",
+    )
+
+    def __init__(self, start_hands: bool = False) -> None:
+        # Evaluating start hands costs more than the rest, so that it is optional.
+        self.start_hands = start_hands
+        self.player_ids: dict[str, int] = {}
+        self.columns = {name: array("q") for name in self.COLUMNS}
+        # Four counts per player.
+        self.placing_distr = array("q")
+        self.yaku_freq: list[Counter[YakuTable]] = []
+        # The first start and the last finish of the games of each player.
+        self.started_at: list[str] = []
+        self.finished_at: list[str] = []
+
+    def get_player_id(self, name: str) -> int:
+        """Return the ID of a player, adding a new one if necessary."""
+
+        if (player_id := self.player_ids.get(name)) is not None:
+            return player_id
+
+        player_id = self.player_ids[name] = len(self.player_ids)
+        for column in self.columns.values():
+            column.append(0)
+        self.placing_distr.extend((0, 0, 0, 0))
+        self.yaku_freq.append(Counter())
+        self.started_at.append("")
+        self.finished_at.append("")
+        return player_id
+
+    def merge(self, other: StatsTable) -> None:
+        """Add the tallies of `other` to this table."""
+
+        for name, other_id in other.player_ids.items():
+            player_id = self.get_player_id(name)
+            for column, other_column in zip(
+                self.columns.values(), other.columns.values()
+            ):
+                column[player_id] += other_column[other_id]
+            for i in range(4):
+                self.placing_distr[player_id * 4 + i] += other.placing_distr[
+                    other_id * 4 + i
+                ]
+            self.yaku_freq[player_id].update(other.yaku_freq[other_id])
+            if other.started_at[other_id] and (
+                not self.started_at[player_id]
+                or other.started_at[other_id] < self.started_at[player_id]
+            ):
+                self.started_at[player_id] = other.started_at[other_id]
+            self.finished_at[player_id] = max(
+                self.finished_at[player_id], other.finished_at[other_id]
+            )
+
+    def add_game(self, game: GameStats) -> None:
+        """Update the tallies with a game record after `apply_transforms`."""
+
+        players = game["players"]
+        ids = [self.get_player_id(i) for i in players]
+        columns = self.columns
+
+        # Repeated names in a game count only once, like `create_player_stats`.
+        rounds = game["rounds"]
+        for player_id in set(ids):
+            if not columns["count_games"][player_id]:
+                self.started_at[player_id] = game["started_at"]
+            self.finished_at[player_id] = game["finished_at"]
+            columns["count_games"][player_id] += 1
+            columns["count_rounds"][player_id] += len(rounds)
+
+        # Same as `evaluate_placing`, the first place of a name counts.
+        seen = set[str]()
+        for i, place in enumerate(game["result"]):
+            name = place["player"]
+            if name in seen or name not in self.player_ids or name not in players:
+                continue
+            seen.add(name)
+            self.placing_distr[self.player_ids[name] * 4 + i] += 1
+
+        for round in rounds:
+            self.add_round(round, players, ids)
+
+    def add_round(
+        self,
+        round: RoundStats,
+        players: Sequence[str],
+        ids: Sequence[int],
+    ) -> None:
+        """Update the tallies of all the four seats with a round."""
+
+        columns = self.columns
+        if "draw_counts" not in round:
+            scan_actions(round)
+
+        num_actions = len(round["action_table"])
+        draws = round["draw_counts"]
+        riichi_pos = round["riichi_positions"]
+
+        # A seat of a player is the first one in `players`, which matters only if
+        # a name appears twice in a game; like `add_start_hands`, the other seats of
+        # the name do not count.
+        chows, pungs, kongs = round["chows"], round["pungs"], round["kongs"]
+        for seat, (name, player_id) in enumerate(zip(players, ids)):
+            if players.index(name) != seat:
+                continue
+            columns["melding_count"][player_id] += (
+                len(chows[seat]) + len(pungs[seat]) + len(kongs[seat])
+            )
+            if (pos := riichi_pos[seat]) >= 0:
+                # Do not count a riichi whose declaration tile deals in.
+                num_rest_actions = num_actions - pos - 1
+                if num_rest_actions == 1 or num_rest_actions > 2:
+                    columns["riichi_count"][player_id] += 1
+
+        if (winner := round.get("winner")) is not None:
+            seat = players.index(winner)
+            player_id = ids[seat]
+            assert round["balance"]
+            columns["winning_count"][player_id] += 1
+            columns["winning_points"][player_id] += round["balance"][winner]
+            columns["winning_turns"][player_id] += draws[seat]
+            columns["winning_han"][player_id] += count_winning_han(
+                round["winning_value"],
+                round["winning_yaku_list"],
+                round["winning_dora"],
+                not chows[seat] and not pungs[seat] and not kongs[seat],
+            )
+            self.yaku_freq[player_id].update(round["winning_yaku_list"])
+
+        # Like `evaluate_losing`, a deal-in counts only from the first seat of a name.
+        if (loser_seat := round.get("deal_in_seat")) is not None and (
+            players.index(loser := players[loser_seat]) == loser_seat
+        ):
+            player_id = ids[loser_seat]
+            assert round["balance"]
+            columns["lod_count"][player_id] += 1
+            columns["lod_points"][player_id] += round["balance"][loser]
+
+        if self.start_hands:
+            self.add_start_hands(round, players, ids)
+
+    def add_start_hands(
+        self,
+        round: RoundStats,
+        players: Sequence[str],
+        ids: Sequence[int],
+    ) -> None:
+        """Update the tallies of `evaluate_start_hands` with a round."""
+
+        columns = self.columns
+        winner = round.get("winner")
+        for seat, player_id in enumerate(ids):
+            # Like `evaluate_start_hands`, only the first seat of a name counts.
+            if players.index(players[seat]) != seat:
+                continue
+            counts = count_tiles(round["start_hand_table"][seat])
+            if sum(counts) != 13:
+                continue
+
+            shanten, ukeire = evaluate_hand(counts)
+            columns["start_hands"][player_id] += 1
+            columns["start_shanten"][player_id] += shanten
+            columns["start_shanten_sq"][player_id] += shanten * shanten
+            columns["start_ukeire"][player_id] += ukeire
+            if winner == players[seat]:
+                columns["start_winning"][player_id] += 1
+                columns["start_winning_shanten"][player_id] += shanten
+
+    def create_player_stats(self, *players: str) -> list[PlayerStats]:
+        """Create new player data objects like `mjstat.stat.create_player_stats`.
+
+        The game records are not kept in the table, so that 'games' of each object
+        is empty.
+        """
+
+        player_stats_list = list[PlayerStats]()
+        for name in sorted(players, key=get_key):
+            if (player_id := self.player_ids.get(name)) is None:
+                stats = PlayerStats(
+                    count_games=0,
+                    count_rounds=0,
+                    games=[],
+                    seats=[],
+                    name=name,
+                    started_at="",
+                    finished_at="",
+                )
+            else:
+                stats = PlayerStats(
+                    count_games=self.columns["count_games"][player_id],
+                    count_rounds=self.columns["count_rounds"][player_id],
+                    games=[],
+                    seats=[],
+                    name=name,
+                    started_at=self.started_at[player_id],
+                    finished_at=self.finished_at[player_id],
+                )
+            player_stats_list.append(stats)
+        return player_stats_list
+
+    def fill_player_stats(
+        self,
+        player_stats: PlayerStats,
+        fundamental: bool = True,
+        yaku: bool = True,
+        start_hands: bool = False,
+    ) -> None:
+        """Store the statistics of a player like the `evaluate_*` functions.
+
+        Args:
+          :player_stats: See `mjstat.stat.create_player_stats`.
+          :fundamental:  Store the items of `evaluate_placing`, `evaluate_winning`,
+                         `evaluate_losing`, `evaluate_riichi` and `evaluate_melding`.
+          :yaku:         Store the item of `evaluate_yaku_frequency`.
+          :start_hands:  Store the items of `evaluate_start_hands`, which are zero
+                         unless this table was created with `start_hands`.
+        """
+
+        name = player_stats["name"]
+        player_id = self.player_ids.get(name)
+
+        def get(column: str) -> int:
+            return self.columns[column][player_id] if player_id is not None else 0
+
+        if start_hands:
+            store_start_hands(
+                player_stats,
+                get("start_hands"),
+                get("start_shanten"),
+                get("start_shanten_sq"),
+                get("start_ukeire"),
+                get("start_winning"),
+                get("start_winning_shanten"),
+            )
+
+        if yaku:
+            player_stats["yaku_freq"] = (
+                Counter(self.yaku_freq[player_id])
+                if player_id is not None
+                else Counter()
+            )
+
+        if not fundamental:
+            return
+
+        placing_distr = (
+            self.placing_distr[player_id * 4 : player_id * 4 + 4].tolist()
+            if player_id is not None
+            else [0] * 4
+        )
+        player_stats["placing_distr"] = placing_distr
+        if num_games := player_stats["count_games"]:
+            player_stats["mean_placing"] = (
+                sum((v * i) for i, v in enumerate(placing_distr, 1)) / num_games
+            )
+            player_stats["first_placing_rate"] = placing_distr[0] / num_games
+            player_stats["last_placing_rate"] = placing_distr[-1] / num_games
+        else:
+            player_stats["mean_placing"] = 0
+            player_stats["first_placing_rate"] = 0
+            player_stats["last_placing_rate"] = 0
+
+        player_stats["winning_count"] = 0
+        player_stats["winning_rate"] = 0
+        player_stats["winning_mean"] = 0
+        player_stats["winning_mean_han"] = 0
+        player_stats["winning_mean_turns"] = 0
+        player_stats["lod_count"] = 0
+        player_stats["lod_rate"] = 0
+        player_stats["lod_mean"] = 0
+        player_stats["riichi_count"] = 0
+        player_stats["riichi_rate"] = 0
+        player_stats["melding_count"] = 0
+        player_stats["melding_rate"] = 0
+        if not (num_rounds := player_stats["count_rounds"]):
+            return
+
+        if num_winning := get("winning_count"):
+            player_stats["winning_count"] = num_winning
+            player_stats["winning_rate"] = num_winning / num_rounds
+            player_stats["winning_mean"] = get("winning_points") / num_winning
+            player_stats["winning_mean_han"] = get("winning_han") / num_winning
+            player_stats["winning_mean_turns"] = get("winning_turns") / num_winning
+
+        if num_lod := get("lod_count"):
+            player_stats["lod_count"] = num_lod
+            player_stats["lod_rate"] = num_lod / num_rounds
+            player_stats["lod_mean"] = get("lod_points") / num_lod
+
+        if num_riichi := get("riichi_count"):
+            player_stats["riichi_count"] = num_riichi
+            player_stats["riichi_rate"] = num_riichi / num_rounds
+
+        if num_melding := get("melding_count"):
+            player_stats["melding_count"] = num_melding
+            player_stats["melding_rate"] = num_melding / num_rounds
+
+
+def evaluate_players(
+    sheet: ScoreSheet,
+    player_stats_list: Iterable[PlayerStats],
+    fundamental: bool = True,
+    yaku: bool = True,
+    start_hands: bool = False,
+) -> None:
+    """Evaluate the statistics of players in a single pass over all rounds.
+
+    The result is the same as applying the `evaluate_*` functions to each element of
+    `player_stats_list`.
+
+    Args:
+      :sheet:             See `mjstat.model.create_score_records`.
+      :player_stats_list: See `mjstat.stat.create_player_stats`.
+      :fundamental:       See `StatsTable.fill_player_stats`.
+      :yaku:              See `StatsTable.fill_player_stats`.
+      :start_hands:       See `StatsTable.fill_player_stats`.
+    """
+
+    table = StatsTable(start_hands)
+    with stage("tally"):
+        for game in sheet["games"]:
+            table.add_game(game)
+
+    with stage("fill"):
+        for player_stats in player_stats_list:
+            table.fill_player_stats(player_stats, fundamental, yaku, start_hands)
@@ -15,16 +15,37 @@ Summary of the transitions::
     -> (9) GameClosing
     -> return to (1)
 
+A state that expects one of several kinds of lines has a single transition
+`MJScoreState.dispatch`, whose pattern is an alternation of those of the kinds, so
+that the state machine tries one regex per line.
 """
 
 from __future__ import annotations
 
-import re
-from typing import Final, cast
+from typing import TYPE_CHECKING, Final, cast
 
 from docutils.statemachine import State  # type: ignore[import-untyped]
 
+from .codec import encode_action
 from .model import YAKU_MAP, ScoreSheet, create_game_record, create_round_record
+from .patterns import (
+    ACTIONS_RE,
+    DORA_SET_RE,
+    DRAW_RE,
+    GAME_CLOSING_RE,
+    GAME_OPENING_RE,
+    GAME_RESULT_RE,
+    HAND_HEADER_RE,
+    INITIAL_CONDITION_RE,
+    PLAYER_PLACE_RE,
+    ROUND_CLOSING_RE,
+    ROUND_STATE_RE,
+    START_HAND_RE,
+    WINNING_RE,
+)
+
+if TYPE_CHECKING:
+    import re
 
 type TransitionResult = tuple[object, str, list[object]]
 
@@ -34,21 +55,24 @@ type TransitionResult = tuple[object, str, list[object]]
 class MJScoreState(State):  # type: ignore[misc]
     """Base class of state classes."""
 
+    def dispatch(
+        self,
+        match: re.Match[str],
+        context: ScoreSheet,
+        next_state: str,
+    ) -> TransitionResult:
+        """Call the method ``handle_<name>``, where <name> is the name of the
+        alternative of `mjstat.patterns.compile_alternation` that matched.
+        """
+
+        method = getattr(self, f"handle_{match.lastgroup}")
+        return cast(TransitionResult, method(match, context, next_state))
+
 
 class GameOpening(MJScoreState):
     """(1) Parse the first line of a match."""
 
-    game_opening_re: Final = re.compile(
-        r"""
-        =*\s
-        東風戦：ランキング卓\s64卓\s開始\s
-        (?P<timestamp>
-        \d{4}/\d{2}/\d{2}\s\d{2}:\d{2}
-        )\s
-        =*
-        """,
-        re.VERBOSE,
-    )
+    game_opening_re: Final = GAME_OPENING_RE
 
     patterns: Final = dict(
         handle_game_opening=game_opening_re,
@@ -85,17 +109,7 @@ class GameInitialCondition(MJScoreState):
     """(2) Parse amount of point a player have before the start of the match, and the
     four players."""
 
-    # Regex for parsing players information, their names and ratings.
-    initial_condition_re: Final = re.compile(
-        r"""
-        持点\d+\s*      # e.g. 25000
-        \[1\](.+)\sR(?:\d+)\s*   # Player #1
-        \[2\](.+)\sR(?:\d+)\s*   # Player #2
-        \[3\](.+)\sR(?:\d+)\s*   # Player #3
-        \[4\](.+)\sR(?:\d+)\s*   # Player #4
-        """,
-        re.VERBOSE,
-    )
+    initial_condition_re: Final = INITIAL_CONDITION_RE
 
     patterns: Final = dict(handle_initial_condition=initial_condition_re)
     initial_transitions: Final = ["handle_initial_condition"]
@@ -117,35 +131,15 @@ class GameInitialCondition(MJScoreState):
 class RoundState(MJScoreState):
     """(3) State for a round of the opening or closing of the final round."""
 
-    # 場 = east/south round
-    # 局 = a round
-    # 本場 = counter(s)
-    # E.g. 東一局三本場 is translated to East, 1st round [with 0 counters].
-    hand_header_re: Final = re.compile(
-        r"""
-        (?P<title>[東南][1-4]局\s\d本場)
-        \(リーチ\d\)
-        \s?
-        (?P<balance>
-         (
-          (あなた|下家|対面|上家)\s?
-          ([+-]?\d+)\s?
-         ){,4}
-        )?
-    """,
-        re.VERBOSE,
-    )
+    hand_header_re: Final = HAND_HEADER_RE
 
-    game_result_re: Final = re.compile(r"[-]+\s*試合結果\s*[-]+")
+    game_result_re: Final = GAME_RESULT_RE
 
-    patterns: Final = dict(
-        handle_summary=hand_header_re,
-        handle_game_result=game_result_re,
-    )
-    initial_transitions: Final = [
-        "handle_summary",
-        "handle_game_result",
-    ]
+    # The alternation of the two above.
+    round_state_re: Final = ROUND_STATE_RE
+
+    patterns: Final = dict(dispatch=round_state_re)
+    initial_transitions: Final = ["dispatch"]
 
     def handle_summary(
         self,
@@ -184,35 +178,15 @@ class RoundClosing(MJScoreState):
     draw.
     """
 
-    winning_re: Final = re.compile(
-        r"""
-        (?P<winning_value>.+)
-        (?P<winning_decl>(ロン|ツモ))
-        \s
-        (
-          ((?P<winning_yaku_with_dora>.+)
-            \s
-            ドラ(?P<winning_dora>\d+)
-          )|
-          (?P<winning_yaku_without_dora>.+)
-        )
-    """,
-        re.VERBOSE,
-    )
+    winning_re: Final = WINNING_RE
 
-    draw_re: Final = re.compile(
-        r"(流局|九種公九牌倒牌|三家和|四風連打|四槓開|四家リーチ)"
-    )
+    draw_re: Final = DRAW_RE
 
-    patterns: Final = dict(
-        handle_winning=winning_re,
-        handle_draw=draw_re,
-    )
+    # The alternation of the two above.
+    round_closing_re: Final = ROUND_CLOSING_RE
 
-    initial_transitions: Final = [
-        "handle_winning",
-        "handle_draw",
-    ]
+    patterns: Final = dict(dispatch=round_closing_re)
+    initial_transitions: Final = ["dispatch"]
 
     def handle_winning(
         self,
@@ -259,27 +233,7 @@ class RoundClosing(MJScoreState):
 class RoundStartHands(MJScoreState):
     """(5) State for parsing start hands (dealt tiles to players) of a round."""
 
-    # Regex for a start hand, or a players' dealt tiles at the beginning of a hand.
-    start_hand_re: Final = re.compile(
-        r"""
-        \[
-          (?P<id>[1-4])                 # player id
-          (?P<seat>[東南西北])          # seat
-        \]
-        (?P<start_hand>
-            (
-                ([1-9]m)|           # character suit, or 萬子
-                (5M)|
-                ([1-9]p)|           # circle suit, or 筒子
-                (5P)|
-                ([1-9]s)|           # bamboo suit, or 索子
-                (5S)|
-                ([東南西北白発中])  # honor tiles, or 字牌
-            ){13}
-        )                   # 13 tiles of a start hand, or 配牌
-    """,
-        re.VERBOSE,
-    )
+    start_hand_re: Final = START_HAND_RE
 
     patterns: Final = dict(handle_start_hands=start_hand_re)
     initial_transitions: Final = ["handle_start_hands"]
@@ -315,14 +269,7 @@ class RoundStartHands(MJScoreState):
 class RoundDoraSet(MJScoreState):
     """(6) State for parsing dora set of a hand."""
 
-    # Regex for the line that indicates all of dora tiles.
-    dora_set_re: Final = re.compile(
-        r"""
-        \[表ドラ\](?P<dora>[^\s]+)
-        (\s*\[裏ドラ\](?P<uradora>.+))?      # XXX: dot matches any of tiles
-    """,
-        re.VERBOSE,
-    )
+    dora_set_re: Final = DORA_SET_RE
 
     patterns: Final = dict(handle_dora_set=dora_set_re)
     initial_transitions: Final = ["handle_dora_set"]
@@ -348,17 +295,7 @@ class RoundDoraSet(MJScoreState):
 class RoundActionHistory(MJScoreState):
     """(7) State for parsing the action history of a hand."""
 
-    # Regex for lines e.g. ``* 1G3s 1d1p 2G2s 2d9p ...``
-    # Do not make regex so complicated here.
-    actions_re: Final = re.compile(
-        r"""
-        \A
-        \*\s*
-        (?P<actions>.+)
-        \Z
-    """,
-        re.VERBOSE,
-    )
+    actions_re: Final = ACTIONS_RE
 
     patterns: Final = dict(handle_actions=actions_re)
     initial_transitions: Final = ["handle_actions"]
@@ -377,7 +314,7 @@ class RoundActionHistory(MJScoreState):
         action_table = round["action_table"]
 
         actions = match.group("actions").split()
-        action_table.extend(actions)
+        action_table.extend(map(encode_action, actions))
 
         while True:
             line = self.state_machine.next_line()
@@ -386,7 +323,7 @@ class RoundActionHistory(MJScoreState):
                 break
             match = next_match
             actions = match.group("actions").split()
-            action_table.extend(actions)
+            action_table.extend(map(encode_action, actions))
 
         return context, "RoundState", []
 
@@ -394,16 +331,7 @@ class RoundActionHistory(MJScoreState):
 class GamePlayerPlace(MJScoreState):
     """(8) State for parsing player's place after a match."""
 
-    player_place_re: Final = re.compile(
-        r"""
-        (?P<rank>[1-4])位
-        \s+
-        (?P<player>(あなた|下家|対面|上家))
-        \s+
-        (?P<points>[+-]?\d+)
-    """,
-        re.VERBOSE,
-    )
+    player_place_re: Final = PLAYER_PLACE_RE
 
     patterns: Final = dict(handle_player_place=player_place_re)
     initial_transitions: Final = ["handle_player_place"]
@@ -435,17 +363,7 @@ class GamePlayerPlace(MJScoreState):
 class GameClosing(MJScoreState):
     """(9) Parse the last line of a match."""
 
-    game_closing_re: Final = re.compile(
-        r"""
-        [-]*\s64卓\s終了\s
-        (?P<timestamp>
-        \d{4}/\d{2}/\d{2}\s\d{2}:\d{2}
-        )
-        \s
-        [-]*
-    """,
-        re.VERBOSE,
-    )
+    game_closing_re: Final = GAME_CLOSING_RE
 
     patterns: Final = dict(handle_game_closing=game_closing_re)
     initial_transitions: Final = [
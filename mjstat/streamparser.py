@@ -0,0 +1,249 @@
+"""streamparser.py: Define class MJScoreStreamParser.
+
+Unlike `mjstat.parser.MJScoreParser`, this parser does not make use of the docutils
+state machine. It consumes lines one by one from any iterable, so that a file object
+can be passed as is, and it tests a cheap line prefix before it tries a regex. The
+closing line of a round, which has no such prefix, is matched by a single
+alternation of `mjstat.patterns` instead, and the parser branches on the name of the
+alternative that matched.
+
+The states and the transitions are the same as ones described in `mjstat.states`.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, cast
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+    from typing import Final
+
+    from .model import GameStats
+
+from .codec import encode_action
+from .model import YAKU_MAP, ScoreSheet, create_game_record, create_round_record
+from .patterns import (
+    DORA_SET_RE,
+    GAME_CLOSING_RE,
+    GAME_OPENING_RE,
+    GAME_RESULT_RE,
+    HAND_HEADER_RE,
+    INITIAL_CONDITION_RE,
+    PLAYER_PLACE_RE,
+    ROUND_CLOSING_RE,
+    START_HAND_RE,
+)
+from .profiling import count, get_profiler, stage
+
+# A state is a method that takes the current line and the rest of the lines, and
+# returns the next state.
+type StateMethod = Callable[[str, Iterator[str]], "StateMethod"]
+
+
+class MJScoreStreamParser:
+    """Parse the content of mjscore.txt line by line.
+
+    If `on_game` is given, each game is passed to it as soon as the last line of the
+    game is parsed, and then removed from the score sheet, so that the games are
+    never held all at once. A game that is not closed, e.g. the one being written,
+    remains in the score sheet.
+    """
+
+    def __init__(self, on_game: Callable[[GameStats], object] | None = None) -> None:
+        self.score_sheet: ScoreSheet
+        self.on_game = on_game
+
+    def parse(self, input_string: str, sheet: ScoreSheet) -> None:
+        """Parse `input_string` and populate `sheet`, a list of game records."""
+
+        self.parse_lines(input_string.split("\n"), sheet)
+
+    def parse_lines(self, lines: Iterable[str], sheet: ScoreSheet) -> None:
+        """Parse `lines` and populate `sheet`, a list of game records.
+
+        Args:
+          :lines: An iterable of lines, e.g. a file object opened in text mode.
+          :sheet: See `mjstat.model.create_score_records`.
+        """
+
+        self.score_sheet = sheet
+
+        if profiler := get_profiler():
+            lines = profiler.count_lines(lines)
+
+        line_iter = iter(lines)
+        state: StateMethod = self.game_opening
+        with stage("parse"):
+            try:
+                for line in line_iter:
+                    state = state(line.strip(), line_iter)
+            except StopIteration:
+                # A state consumed the last line by itself.
+                pass
+
+    def game_opening(self, line: str, lines: Iterator[str]) -> StateMethod:
+        """(1) Parse the first line of a match."""
+
+        if not (line.startswith("=") and (match := GAME_OPENING_RE.match(line))):
+            return self.game_opening
+
+        # Determine whether to parse this match or not.
+        sheet = self.score_sheet
+        started_at: Final[str] = match.group("timestamp")
+        if (since_date := sheet["since"]) and started_at < since_date:
+            return self.game_opening
+        if (until_date := sheet["until"]) and until_date <= started_at:
+            return self.game_opening
+
+        game = create_game_record(sheet)
+        game["started_at"] = started_at
+        count("games created")
+
+        return self.game_initial_condition
+
+    def game_initial_condition(self, line: str, lines: Iterator[str]) -> StateMethod:
+        """(2) Parse initial points and players."""
+
+        if not (
+            line.startswith("持点") and (match := INITIAL_CONDITION_RE.match(line))
+        ):
+            return self.game_initial_condition
+
+        game = self.score_sheet["games"][-1]
+        game["players"] = cast(tuple[str, str, str, str], match.groups())
+
+        return self.round_state
+
+    def round_state(self, line: str, lines: Iterator[str]) -> StateMethod:
+        """(3) Parse the header of a round or the header of the game result."""
+
+        if line.startswith(("東", "南")) and (match := HAND_HEADER_RE.match(line)):
+            round = create_round_record(self.score_sheet)
+            round["title"] = match.group("title")
+            count("rounds created")
+            if player_balance := match.group("balance").strip().split():
+                round["balance"].update([
+                    (
+                        player_balance[i],
+                        int(player_balance[i + 1]),
+                    )
+                    for i in range(0, len(player_balance), 2)
+                ])
+            return self.round_closing
+
+        if line.startswith("-") and GAME_RESULT_RE.match(line):
+            return self.game_player_place
+
+        return self.round_state
+
+    def round_closing(self, line: str, lines: Iterator[str]) -> StateMethod:
+        """(4) Parse the line that contains the winner's hand or exhaustive/abortive
+        draw.
+        """
+
+        if not (match := ROUND_CLOSING_RE.match(line)):
+            return self.round_closing
+
+        round = self.score_sheet["games"][-1]["rounds"][-1]
+        if match.lastgroup == "winning":
+            round["ending"] = match.group("winning_decl")
+            round["winning_value"] = match.group("winning_value")
+
+            if dora := match.group("winning_dora"):
+                yaku_list = match.group("winning_yaku_with_dora")
+                round["winning_dora"] = int(dora)
+            else:
+                yaku_list = match.group("winning_yaku_without_dora")
+                round["winning_dora"] = 0
+            round["winning_yaku_list"] = [YAKU_MAP[i] for i in yaku_list.split()]
+        else:
+            round["ending"] = match.group()
+
+        return self.round_start_hands
+
+    def round_start_hands(self, line: str, lines: Iterator[str]) -> StateMethod:
+        """(5) Parse the lines of start hands (dealt tiles to players)."""
+
+        if not (line.startswith("[") and (match := START_HAND_RE.match(line))):
+            return self.round_start_hands
+
+        round = self.score_sheet["games"][-1]["rounds"][-1]
+        for i in range(4):
+            if i:
+                next_match = START_HAND_RE.match(next(lines).strip())
+                assert next_match
+                match = next_match
+            player, seat, start_hand = match.group("id", "seat", "start_hand")
+            index = int(player) - 1
+            round["seat_table"][index] = seat
+            round["start_hand_table"][index] = start_hand
+
+        return self.round_dora_set
+
+    def round_dora_set(self, line: str, lines: Iterator[str]) -> StateMethod:
+        """(6) Parse the line of dora tiles."""
+
+        if not (line.startswith("[表ドラ]") and (match := DORA_SET_RE.match(line))):
+            return self.round_dora_set
+
+        round = self.score_sheet["games"][-1]["rounds"][-1]
+        round["dora_table"].extend(match.group("dora", "uradora"))
+
+        return self.round_action_history
+
+    def round_action_history(self, line: str, lines: Iterator[str]) -> StateMethod:
+        """(7) Parse all the lines that describe actions, e.g.
+        ``* 1G3s 1d1p 2G2s 2d9p ...``.
+        """
+
+        # The format is so simple that no regex is required.
+        if not (line.startswith("*") and (actions := line[1:].split())):
+            return self.round_action_history
+
+        round = self.score_sheet["games"][-1]["rounds"][-1]
+        action_table = round["action_table"]
+        action_table.extend(map(encode_action, actions))
+
+        for next_line in lines:
+            line = next_line.strip()
+            if not (line.startswith("*") and (actions := line[1:].split())):
+                break
+            action_table.extend(map(encode_action, actions))
+        else:
+            return self.round_state
+
+        # The line that follows the actions belongs to the next state.
+        return self.round_state(line, lines)
+
+    def game_player_place(self, line: str, lines: Iterator[str]) -> StateMethod:
+        """(8) Parse the ranking list of a game."""
+
+        if not (line[1:2] == "位" and (match := PLAYER_PLACE_RE.match(line))):
+            return self.game_player_place
+
+        ranking = self.score_sheet["games"][-1]["result"]
+        for i in range(4):
+            if i:
+                next_match = PLAYER_PLACE_RE.match(next(lines).strip())
+                assert next_match
+                match = next_match
+            pos = int(match.group("rank")) - 1
+            ranking[pos]["player"] = match.group("player")
+            ranking[pos]["points"] = int(match.group("points"))
+
+        return self.game_closing
+
+    def game_closing(self, line: str, lines: Iterator[str]) -> StateMethod:
+        """(9) Parse the last line of a match."""
+
+        if not (line.startswith("-") and (match := GAME_CLOSING_RE.match(line))):
+            return self.game_closing
+
+        games = self.score_sheet["games"]
+        game = games[-1]
+        game["finished_at"] = match.group("timestamp")
+        if self.on_game is not None:
+            self.on_game(game)
+            games.pop()
+
+        return self.game_opening
@@ -0,0 +1,632 @@
+"""synth.py: Generate synthetic mjscore.txt files.
+
+Usage:
+  python -m mjstat.synth [--seed <N>] [--games <N> | --size <SIZE>]
+    [--since <DATE>] [--pool <N>] <OUTPUT>
+
+Each round is played by a crude simulation: tiles are dealt from a shuffled wall, the
+players draw and discard at random, call pungs and chows now and then, declare riichi,
+and win with a probability that grows as the round goes on. The winning hand itself
+is not simulated, but the yaku, the dora and the value of a win are consistent with
+one another, and so are the balances of the players. The result is in the exact
+format that `mjstat.streamparser` and `mjstat.states` expect.
+
+The same seed always produces the same file.
+"""
+
+from __future__ import annotations
+
+import datetime
+import random
+import re
+from typing import TYPE_CHECKING
+
+import click
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from typing import Final
+
+from .index import ENCODING
+from .model import DATETIME_FORMAT, YakuTable
+
+# The names of players #1 to #4.
+PLAYERS: Final = ("あなた", "下家", "対面", "上家")
+
+WINDS: Final = "東南西北"
+
+# All the kinds of tiles in the order of start hands.
+TILE_KINDS: Final = (
+    *(f"{n}{suit}" for suit in "mps" for n in range(1, 10)),
+    *"東南西北白発中",
+)
+
+# The red fives replace one of the four fives of each suit.
+RED_FIVES: Final = {"5m": "5M", "5p": "5P", "5s": "5S"}
+
+TILE_ORDER: Final = {
+    **{tile: (i, 0) for i, tile in enumerate(TILE_KINDS)},
+    **{red: (TILE_KINDS.index(five), 1) for five, red in RED_FIVES.items()},
+}
+
+# The number of actions in a line of action history.
+ACTIONS_PER_LINE: Final = 14
+
+# The number of tiles that cannot be drawn at the end of the wall.
+DEAD_WALL_SIZE: Final = 14
+
+# The probabilities per turn that grow as the round goes on.
+TSUMO_HAZARD: Final = 0.0008
+RON_HAZARD: Final = 0.0006
+RIICHI_RATE: Final = 0.06
+PUNG_RATE: Final = 0.3
+CHOW_RATE: Final = 0.12
+KONG_RATE: Final = 0.3
+
+# Yaku that can be added to a win, with weights.
+COMMON_YAKU: Final = {
+    YakuTable.Yaku04: 30,  # 断ヤオ
+    YakuTable.Yaku05: 18,  # 平和
+    YakuTable.Yaku06: 5,  # 一盃口
+    YakuTable.Yaku07: 8,  # 自風
+    YakuTable.Yaku08: 8,  # 場風
+    YakuTable.Yaku09: 8,  # 白
+    YakuTable.Yaku10: 8,  # 発
+    YakuTable.Yaku11: 8,  # 中
+    YakuTable.Yaku12: 1,  # 嶺上開花
+    YakuTable.Yaku14: 1,  # 海底撈月
+    YakuTable.Yaku16: 4,  # 三色同順
+    YakuTable.Yaku17: 3,  # 一気通貫
+    YakuTable.Yaku18: 2,  # 全帯
+    YakuTable.Yaku19: 4,  # 七対子
+    YakuTable.Yaku20: 3,  # 対々和
+    YakuTable.Yaku21: 1,  # 三暗刻
+    YakuTable.Yaku27: 6,  # 混一色
+    YakuTable.Yaku28: 1,  # 純全帯
+    YakuTable.Yaku30: 1,  # 清一色
+}
+
+# Yaku that require a concealed hand.
+CONCEALED_ONLY: Final = frozenset((
+    YakuTable.Yaku01,
+    YakuTable.Yaku02,
+    YakuTable.Yaku03,
+    YakuTable.Yaku05,
+    YakuTable.Yaku06,
+    YakuTable.Yaku19,
+))
+
+YAKUMAN_RATE: Final = 0.003
+YAKUMAN_LIST: Final = tuple(i for i in YakuTable if i.value.han >= 13)
+
+HAN_CHARS: Final = "一二三四"
+
+# The basic points of a limit hand by the number of han.
+LIMIT_POINTS: Final = (
+    (13, 8000, "役満"),
+    (11, 6000, "三倍満貫"),
+    (8, 4000, "倍満貫"),
+    (6, 3000, "ハネ満貫"),
+    (5, 2000, "満貫"),
+)
+
+SIZE_RE: Final = re.compile(r"(?P<number>\d+)(?P<unit>[KMG]?)B?", re.IGNORECASE)
+
+
+def sort_tiles(tiles: list[str]) -> list[str]:
+    """Sort tiles in the order of start hands."""
+
+    return sorted(tiles, key=TILE_ORDER.__getitem__)
+
+
+def normalize(tile: str) -> str:
+    """Return a tile with a red five replaced with the normal five."""
+
+    return tile.lower() if tile[0] == "5" else tile
+
+
+def create_wall(rnd: random.Random) -> list[str]:
+    """Return 136 shuffled tiles including the three red fives."""
+
+    wall = [tile for tile in TILE_KINDS for _ in range(4)]
+    for five, red in RED_FIVES.items():
+        wall[wall.index(five)] = red
+    rnd.shuffle(wall)
+    return wall
+
+
+def evaluate_win(
+    rnd: random.Random,
+    riichi: bool,
+    concealed: bool,
+    tsumo: bool,
+) -> tuple[str, list[YakuTable], int, int]:
+    """Choose the yaku of a win at random and evaluate it.
+
+    Returns:
+      A tuple of the winning value, e.g. "30符 二飜" or "満貫", the yaku, the
+      number of dora and the basic points.
+    """
+
+    if rnd.random() < YAKUMAN_RATE:
+        yaku = rnd.choice(YAKUMAN_LIST)
+        scalar = yaku.value.han // 13
+        value = "役満" if scalar == 1 else "ダブル役満"
+        return value, [yaku], 0, 8000 * scalar
+
+    yaku_list = list[YakuTable]()
+    if riichi:
+        yaku_list.append(YakuTable.Yaku01)
+        if rnd.random() < 0.15:
+            yaku_list.append(YakuTable.Yaku02)
+    if tsumo and concealed:
+        yaku_list.append(YakuTable.Yaku03)
+
+    candidates = [i for i in COMMON_YAKU if concealed or i not in CONCEALED_ONLY]
+    weights = [COMMON_YAKU[i] for i in candidates]
+    num_extra = rnd.choices((0, 1, 2, 3), (30, 45, 20, 5))[0]
+    if not yaku_list:
+        num_extra = max(1, num_extra)
+    for yaku in rnd.choices(candidates, weights, k=num_extra):
+        if yaku not in yaku_list:
+            yaku_list.append(yaku)
+
+    dora = rnd.choices((0, 1, 2, 3, 4), (40, 30, 17, 8, 5))[0]
+    han = dora + sum(
+        i.value.han + (1 if i.value.has_concealed_bonus and concealed else 0)
+        for i in yaku_list
+    )
+    fu = 25 if YakuTable.Yaku19 in yaku_list else rnd.choice((30, 30, 40, 50))
+
+    for min_han, points, value in LIMIT_POINTS:
+        if han >= min_han:
+            return value, yaku_list, dora, points
+
+    points = fu * 2 ** (han + 2)
+    if points >= 2000:
+        return "満貫", yaku_list, dora, 2000
+    return f"{fu}符 {HAN_CHARS[han - 1]}飜", yaku_list, dora, points
+
+
+def ceil100(points: float) -> int:
+    """Round up points to a multiple of 100."""
+
+    return -(-int(points) // 100) * 100
+
+
+class RoundResult:
+    """What happened in a round.
+
+    Attributes:
+      :lines:       The lines of the round, without the header line.
+      :deltas:      The points that each player has gained or lost.
+      :winner:      The index of the winner, or -1 if no one has won.
+      :tenpai:      The readiness of each player at an exhaustive draw.
+      :num_riichi:  The number of riichi declared in the round.
+    """
+
+    def __init__(self) -> None:
+        self.lines: list[str] = []
+        self.deltas = [0] * 4
+        self.winner = -1
+        self.tenpai = [False] * 4
+        self.num_riichi = 0
+
+
+def play_round(
+    rnd: random.Random,
+    dealer: int,
+    honba: int,
+    deposits: int,
+) -> RoundResult:
+    """Simulate a round.
+
+    Args:
+      :rnd:      The random number generator.
+      :dealer:   The index of the dealer.
+      :honba:    The number of counters.
+      :deposits: The number of riichi sticks on the table before the round.
+    """
+
+    result = RoundResult()
+    wall = create_wall(rnd)
+    start_hands = [sort_tiles(wall[i * 13 : i * 13 + 13]) for i in range(4)]
+    hands = [list(i) for i in start_hands]
+    dora, uradora = wall[-6], wall[-5]
+    live_wall = wall[52:-DEAD_WALL_SIZE]
+
+    actions = list[str]()
+    turns = [0] * 4
+    riichi = [False] * 4
+    melded = [False] * 4
+    player = dealer
+    draw = True
+    tsumo = False
+    loser = -1
+    while True:
+        p = player + 1
+        hand = hands[player]
+        drawn = ""
+        if draw:
+            if not live_wall:
+                break
+            drawn = live_wall.pop()
+            hand.append(drawn)
+            actions.append(f"{p}G{drawn}")
+            turns[player] += 1
+
+            factor = 2 if riichi[player] else 1
+            if rnd.random() < TSUMO_HAZARD * turns[player] * factor:
+                actions.append(f"{p}A")
+                result.winner, tsumo = player, True
+                break
+
+            # A concealed kong, followed by a replacement draw.
+            if not riichi[player] and rnd.random() < KONG_RATE:
+                kinds = [normalize(i) for i in hand]
+                if quad := next((i for i in kinds if kinds.count(i) == 4), None):
+                    actions.append(f"{p}K{quad}")
+                    hands[player] = hand = [i for i in hand if normalize(i) != quad]
+                    continue
+
+            if (
+                not riichi[player]
+                and not melded[player]
+                and turns[player] >= 4
+                and rnd.random() < RIICHI_RATE
+            ):
+                actions.append(f"{p}R")
+                riichi[player] = True
+                result.num_riichi += 1
+
+        # Discard the drawn tile or a tile from the hand.
+        if drawn and (riichi[player] or rnd.random() < 0.35):
+            hand.remove(drawn)
+            discard = drawn
+            actions.append(f"{p}D{discard}")
+        else:
+            discard = hand.pop(rnd.randrange(len(hand)))
+            actions.append(f"{p}d{discard}")
+
+        others = [(player + i) % 4 for i in range(1, 4)]
+        ron = next(
+            (
+                i
+                for i in others
+                if rnd.random()
+                < RON_HAZARD * max(turns[i], 1) * (2 if riichi[i] else 1)
+            ),
+            None,
+        )
+        if ron is not None:
+            actions.append(f"{ron + 1}A")
+            result.winner, loser = ron, player
+            break
+
+        kind = normalize(discard)
+        caller = next(
+            (
+                i
+                for i in others
+                if not riichi[i]
+                and sum(normalize(j) == kind for j in hands[i]) >= 2
+                and rnd.random() < PUNG_RATE
+            ),
+            None,
+        )
+        if caller is not None:
+            actions.append(f"{caller + 1}N")
+            for _ in range(2):
+                hands[caller].remove(
+                    next(j for j in hands[caller] if normalize(j) == kind)
+                )
+            melded[caller] = True
+            player, draw = caller, False
+            continue
+
+        follower = others[0]
+        if (
+            len(kind) == 2
+            and not riichi[follower]
+            and rnd.random() < CHOW_RATE
+            and (chow := find_chow(hands[follower], kind))
+        ):
+            actions.append(f"{follower + 1}C{''.join(chow)}")
+            for tile in chow:
+                hands[follower].remove(tile)
+            melded[follower] = True
+            player, draw = follower, False
+            continue
+
+        player, draw = follower, True
+
+    for i in range(0, len(actions), ACTIONS_PER_LINE):
+        result.lines.append(f"    * {' '.join(actions[i : i + ACTIONS_PER_LINE])}")
+
+    deltas = result.deltas
+    for i in range(4):
+        if riichi[i]:
+            deltas[i] -= 1000
+
+    winner = result.winner
+    if winner >= 0:
+        value, yaku_list, num_dora, points = evaluate_win(
+            rnd, riichi[winner], not melded[winner], tsumo
+        )
+        decl = "ツモ" if tsumo else "ロン"
+        yaku_text = " ".join(i.value.name for i in yaku_list)
+        dora_text = f" ドラ{num_dora}" if num_dora else ""
+        ending = f"    {value}{decl} {yaku_text}{dora_text}"
+
+        factor = 6 if winner == dealer else 4
+        if tsumo:
+            for i in range(4):
+                if i == winner:
+                    continue
+                share = 2 if i == dealer or winner == dealer else 1
+                payment = ceil100(points * share) + honba * 100
+                deltas[i] -= payment
+                deltas[winner] += payment
+        else:
+            payment = ceil100(points * factor) + honba * 300
+            deltas[loser] -= payment
+            deltas[winner] += payment
+        deltas[winner] += (deposits + result.num_riichi) * 1000
+    else:
+        ending = "    流局"
+        tenpai = [riichi[i] or rnd.random() < 0.4 for i in range(4)]
+        num_tenpai = sum(tenpai)
+        if 0 < num_tenpai < 4:
+            for i in range(4):
+                if tenpai[i]:
+                    deltas[i] += 3000 // num_tenpai
+                else:
+                    deltas[i] -= 3000 // (4 - num_tenpai)
+        result.tenpai = tenpai
+
+    hand_lines = [
+        f"    [{i + 1}{WINDS[(i - dealer) % 4]}]{''.join(start_hands[i])}"
+        for i in range(4)
+    ]
+    dora_line = f"    [表ドラ]{dora}"
+    if winner >= 0 and riichi[winner]:
+        dora_line += f" [裏ドラ]{uradora}"
+
+    result.lines[:0] = [ending, *hand_lines, dora_line]
+    return result
+
+
+def find_chow(hand: list[str], kind: str) -> tuple[str, str] | None:
+    """Return two tiles in `hand` that make a chow with a tile of `kind`."""
+
+    number, suit = int(kind[0]), kind[1]
+    kinds = {normalize(i): i for i in hand}
+    for a, b in ((-2, -1), (-1, 1), (1, 2)):
+        if 1 <= number + a and number + b <= 9:
+            first, second = f"{number + a}{suit}", f"{number + b}{suit}"
+            if first in kinds and second in kinds:
+                return kinds[first], kinds[second]
+    return None
+
+
+def generate_game_body(rnd: random.Random) -> tuple[str, int]:
+    """Simulate a game and return the lines between its header and its closing.
+
+    Returns:
+      A pair of the text and the number of rounds.
+    """
+
+    scores = [25000] * 4
+    ratings = [rnd.randrange(1200, 2200, 10) for _ in range(4)]
+    lines = [
+        "  持点25000 "
+        + " ".join(f"[{i + 1}]{PLAYERS[i]} R{ratings[i]}" for i in range(4))
+    ]
+
+    first_dealer = rnd.randrange(4)
+    round_number = 1
+    honba = 0
+    deposits = 0
+    num_rounds = 0
+    # A round header has room for one digit of counters.
+    while round_number <= 4 and num_rounds < 10:
+        dealer = (first_dealer + round_number - 1) % 4
+        result = play_round(rnd, dealer, honba, deposits)
+        num_rounds += 1
+
+        balance = " ".join(
+            f"{PLAYERS[i]} {result.deltas[i]}"
+            for i in sorted(range(4), key=lambda i: (i != result.winner, i))
+            if result.deltas[i]
+        )
+        lines.append(
+            f"  東{round_number}局 {honba}本場(リーチ{min(deposits, 9)}) {balance} "
+        )
+        lines.extend(result.lines)
+        lines.append("")
+
+        for i in range(4):
+            scores[i] += result.deltas[i]
+        if result.winner >= 0:
+            deposits = 0
+        else:
+            deposits += result.num_riichi
+
+        if min(scores) < 0:
+            break
+        if result.winner == dealer or (result.winner < 0 and result.tenpai[dealer]):
+            honba += 1
+        else:
+            honba = 0 if result.winner >= 0 else honba + 1
+            round_number += 1
+
+    # The remaining deposits go to the top player.
+    ranking = sorted(range(4), key=lambda i: (-scores[i], (i - first_dealer) % 4))
+    scores[ranking[0]] += deposits * 1000
+    lines.append("  ---- 試合結果 ----")
+    for rank, i in enumerate(ranking):
+        points = round((scores[i] - 30000) / 1000) + (20, 10, -10, -20)[rank]
+        if rank == 0:
+            points += 20
+        name = PLAYERS[i]
+        lines.append(f"  {rank + 1}位 {name}{' ' * (14 - 2 * len(name))}{points:+d}")
+
+    return "\n".join(lines), num_rounds
+
+
+def format_game(
+    started_at: datetime.datetime,
+    finished_at: datetime.datetime,
+    body: str,
+) -> str:
+    """Put the header and the closing around the body of a game."""
+
+    return (
+        f"===== 東風戦：ランキング卓 64卓 開始 {started_at.strftime(DATETIME_FORMAT)}"
+        " =====\n"
+        f"{body}\n"
+        f"----- 64卓 終了 {finished_at.strftime(DATETIME_FORMAT)} -----\n"
+        "\n"
+    )
+
+
+def generate_games(
+    seed: int = 0,
+    since: datetime.datetime | None = None,
+    pool_size: int = 0,
+) -> Iterator[str]:
+    """Yield the text of synthetic games endlessly in chronological order.
+
+    Args:
+      :seed:      The seed of the random number generator.
+      :since:     The time the first game starts.
+      :pool_size: If positive, only this number of games are simulated and then
+                  reused with new timestamps, which is much faster for large files.
+    """
+
+    rnd = random.Random(seed)
+    started_at = since or datetime.datetime(2016, 1, 1)
+    pool = list[tuple[str, int]]()
+    while True:
+        if not pool_size or len(pool) < pool_size:
+            body, num_rounds = generate_game_body(rnd)
+            if pool_size:
+                pool.append((body, num_rounds))
+        else:
+            body, num_rounds = rnd.choice(pool)
+
+        finished_at = started_at + datetime.timedelta(minutes=num_rounds + 1)
+        yield format_game(started_at, finished_at, body)
+        started_at = finished_at + datetime.timedelta(
+            minutes=rnd.choice((1, 1, 2, 5, 30, 180, 720))
+        )
+
+
+def write_mjscore(
+    path: str,
+    seed: int = 0,
+    num_games: int | None = None,
+    size: int | None = None,
+    since: datetime.datetime | None = None,
+    pool_size: int = 0,
+) -> int:
+    """Write a synthetic mjscore.txt.
+
+    Args:
+      :path:      The output path.
+      :seed:      See `generate_games`.
+      :num_games: The number of games to write.
+      :size:      The size in bytes to reach, if `num_games` is None.
+      :since:     See `generate_games`.
+      :pool_size: See `generate_games`.
+
+    Returns:
+      The number of games written.
+    """
+
+    if num_games is None and size is None:
+        raise ValueError("either num_games or size is required")
+
+    count = 0
+    written = 0
+    with open(path, "wb") as fout:
+        for text in generate_games(seed, since, pool_size):
+            if num_games is not None and count >= num_games:
+                break
+            if size is not None and written >= size:
+                break
+            data = text.encode(ENCODING)
+            fout.write(data)
+            written += len(data)
+            count += 1
+    return count
+
+
+def parse_size(text: str) -> int:
+    """Convert e.g. "2G" or "500MB" into a number of bytes."""
+
+    if not (m := SIZE_RE.fullmatch(text.strip())):
+        raise click.BadParameter(f"invalid size: {text}")
+    return int(m["number"]) * 1024 ** " KMG".index(m["unit"].upper() or " ")
+
+
+@click.command()
+@click.help_option(help="show this message and exit")
+@click.argument("output", type=click.Path(dir_okay=False))
+@click.option("--seed", type=int, default=0, help="set the random seed")
+@click.option(
+    "-n",
+    "--games",
+    type=click.IntRange(min=0),
+    metavar="N",
+    help="write N games",
+)
+@click.option(
+    "--size",
+    metavar="SIZE",
+    help="write games until the file reaches SIZE, e.g. 100M or 2G",
+)
+@click.option(
+    "--since",
+    type=click.DateTime(("%Y/%m/%d", "%Y-%m-%d", "%Y/%m/%d %H:%M")),
+    metavar="DATE",
+    help="set the start time of the first game",
+)
+@click.option(
+    "--pool",
+    type=click.IntRange(min=0),
+    default=0,
+    metavar="N",
+    help="simulate only N games and reuse them (0 to simulate all)",
+)
+def main(
+    output: str,
+    seed: int,
+    games: int | None,
+    size: str | None,
+    since: datetime.datetime | None,
+    pool: int,
+) -> None:
+    """Write a synthetic mjscore.txt to OUTPUT.
+
+    \b
+    Examples:
+    python -m mjstat.synth -n 1000 mjscore.txt
+    python -m mjstat.synth --size 2G --pool 5000 --seed 1 large.txt
+    """
+
+    if games is None and size is None:
+        games = 1000
+    count = write_mjscore(
+        output,
+        seed=seed,
+        num_games=games,
+        size=parse_size(size) if size is not None else None,
+        since=since,
+        pool_size=pool,
+    )
+    click.echo(f"{count} games written to {output}", err=True)
+
+
+if __name__ == "__main__":
+    main()
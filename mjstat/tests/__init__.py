@@ -0,0 +1,4 @@
+"""tests: Unit tests of mjstat.
+
+Run ``python -m unittest discover -s mjstat/tests -t .`` in the repository root.
+"""
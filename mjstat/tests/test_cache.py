@@ -0,0 +1,94 @@
+"""test_cache.py: Test function `mjstat.cache.read_cached` on a growing file."""
+
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+from argparse import Namespace
+from pathlib import Path
+
+from mjstat.cache import read_cached
+from mjstat.index import ENCODING
+from mjstat.io import MJScoreFileInput
+from mjstat.model import ScoreSheet
+from mjstat.streamparser import MJScoreStreamParser
+from mjstat.testdata import TEST_INPUT
+
+GAME = TEST_INPUT.encode(ENCODING)
+
+# The second game starts a day later than the first one.
+NEXT_GAME = TEST_INPUT.replace("2016/01/01", "2016/01/02").encode(ENCODING)
+
+
+class TestReadCached(unittest.TestCase):
+    """The games appended to a file are read from the cache and the tail."""
+
+    def setUp(self) -> None:
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.cache_dir = Path(temp_dir.name, "cache")
+        self.source_path = os.path.join(temp_dir.name, "mjscore.txt")
+
+    def write(self, data: bytes) -> None:
+        """Replace the content of the source file."""
+
+        with open(self.source_path, "wb") as fout:
+            fout.write(data)
+
+    def read(self) -> list[tuple[str, str]]:
+        """Return the start and finish times of the games read with the cache."""
+
+        sheet = ScoreSheet(
+            games=[],
+            settings=Namespace(debug=False, verbose=False),
+            since="",
+            until="",
+        )
+        read_cached(
+            MJScoreFileInput(source_path=self.source_path),
+            MJScoreStreamParser(),
+            sheet,
+            self.cache_dir,
+        )
+        return [(i["started_at"], i["finished_at"]) for i in sheet["games"]]
+
+    def test_partial_header(self) -> None:
+        # The header line of the second game is being written.
+        header_end = NEXT_GAME.index(b"\n")
+        self.write(GAME + NEXT_GAME[: header_end // 2])
+        self.assertEqual(self.read(), [("2016/01/01 00:43", "2016/01/01 00:47")])
+
+        self.write(GAME + NEXT_GAME)
+        self.assertEqual(
+            self.read(),
+            [
+                ("2016/01/01 00:43", "2016/01/01 00:47"),
+                ("2016/01/02 00:43", "2016/01/02 00:47"),
+            ],
+        )
+
+    def test_partial_action_line(self) -> None:
+        # An action line of the second game is being written, e.g. "* 2G8m 2d南 3G9".
+        line = NEXT_GAME.index(b"* 2G8m")
+        self.write(GAME + NEXT_GAME[: line + 15])
+        self.assertEqual(
+            self.read(),
+            [
+                ("2016/01/01 00:43", "2016/01/01 00:47"),
+                ("2016/01/02 00:43", ""),
+            ],
+        )
+
+        self.write(GAME + NEXT_GAME)
+        self.assertEqual(
+            self.read(),
+            [
+                ("2016/01/01 00:43", "2016/01/01 00:47"),
+                ("2016/01/02 00:43", "2016/01/02 00:47"),
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
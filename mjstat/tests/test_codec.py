@@ -0,0 +1,110 @@
+"""test_codec.py: Test module `mjstat.codec`."""
+
+from __future__ import annotations
+
+import unittest
+from typing import TYPE_CHECKING
+
+from mjstat.codec import (
+    ACTION_TYPES,
+    CHOW,
+    RED_RANK,
+    TILE_CODES,
+    TILES,
+    action_seat,
+    action_tile,
+    action_tiles,
+    action_type,
+    decode_action,
+    decode_actions,
+    encode_action,
+    encode_actions,
+    make_action,
+    parse_action,
+)
+from mjstat.testdata import TEST_INPUT
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+def generate_actions() -> Iterator[str]:
+    """Yield every valid action: each seat and type with no tile or any tile, and
+    each chow of a tile of a suit and another tile of the same suit.
+    """
+
+    for seat in "1234":
+        for kind in ACTION_TYPES:
+            yield f"{seat}{kind}"
+            for tile in TILES:
+                yield f"{seat}{kind}{tile}"
+        for first in TILES:
+            # Honors make no chows.
+            if len(first) < 2:
+                continue
+            suit = first[1].lower()
+            for rank in range(1, 10):
+                yield f"{seat}C{first}{rank}{suit}"
+            yield f"{seat}C{first}5{suit.upper()}"
+
+
+class TestCodec(unittest.TestCase):
+    """Actions survive encoding and decoding."""
+
+    def test_round_trip(self) -> None:
+        actions = list(generate_actions())
+        codes = [encode_action(i) for i in actions]
+        self.assertEqual(len(set(codes)), len(actions))
+        self.assertTrue(all(0 <= i < 1 << 15 for i in codes))
+        for action, code in zip(actions, codes):
+            with self.subTest(action=action):
+                self.assertEqual(decode_action(code), action)
+                self.assertEqual(parse_action(action), code)
+                self.assertEqual(action_seat(code), int(action[0]) - 1)
+                self.assertEqual(action_type(code), ACTION_TYPES.index(action[1]))
+                self.assertEqual(action_tiles(code), action[2:])
+        self.assertEqual(decode_actions(encode_actions(actions)), actions)
+
+    def test_fields(self) -> None:
+        for action, seat, kind, tile, rank in (
+            ("4C4s5S", 3, CHOW, "4s", RED_RANK),
+            ("4C4s5s", 3, CHOW, "4s", 5),
+            ("1C5M6m", 0, CHOW, "5M", 6),
+            ("2N東", 1, ACTION_TYPES.index("N"), "東", 0),
+            ("3R", 2, ACTION_TYPES.index("R"), None, 0),
+        ):
+            with self.subTest(action=action):
+                code = encode_action(action)
+                self.assertEqual(action_tile(code), TILE_CODES.get(tile, 0))
+                self.assertEqual(code >> 11, rank)
+                if not rank:
+                    self.assertEqual(code, make_action(seat, kind, action_tile(code)))
+
+    def test_test_input(self) -> None:
+        actions = [
+            action
+            for line in TEST_INPUT.splitlines()
+            if line.startswith("    * ")
+            for action in line.split()[1:]
+        ]
+        self.assertTrue(actions)
+        self.assertEqual(decode_actions(encode_actions(actions)), actions)
+
+    def test_invalid_actions(self) -> None:
+        for action in (
+            "",
+            "1",
+            "5G1m",
+            "1X1m",
+            "1G0m",
+            "1G1m2m",
+            "1C1m2p",
+            "1C東南",
+            "1C1m2m3m",
+        ):
+            with self.subTest(action=action), self.assertRaises(ValueError):
+                parse_action(action)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+"""test_shanten.py: Test module `mjstat.shanten` against a brute-force search."""
+
+from __future__ import annotations
+
+import random
+import unittest
+from functools import cache
+from typing import TYPE_CHECKING
+
+from mjstat.shanten import (
+    HONORS,
+    NUM_KINDS,
+    TERMINALS,
+    calculate_regular_shanten,
+    calculate_shanten,
+    count_tiles,
+    evaluate_hand,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+    from typing import Final
+
+# The number of random hands of each test.
+NUM_HANDS: Final = 200
+
+
+def search_regular_shanten(counts: Sequence[int], melds: int = 0) -> int:
+    """Return the shanten number of the regular form by trying every way to take
+    the lowest tiles out as a meld, the head, a partial meld or isolated tiles.
+    """
+
+    return search(tuple(counts), melds, 0, 0)
+
+
+@cache
+def search(counts: tuple[int, ...], m: int, t: int, h: int) -> int:
+    """Return the least shanten number of `counts` with `m` melds, `t` partial
+    melds and `h` heads already taken out.
+    """
+
+    kind = next((i for i, n in enumerate(counts) if n), NUM_KINDS)
+    if kind == NUM_KINDS:
+        return 8 - 2 * m - min(t, 4 - m) - h
+
+    def take(offsets: tuple[int, ...], m: int, t: int, h: int) -> int:
+        rest = list(counts)
+        for i in offsets:
+            rest[kind + i] -= 1
+        return search(tuple(rest), m, t, h)
+
+    n = counts[kind]
+    rank = kind % 9 if kind < HONORS else 9
+    # The copies left isolated go all at once; the others are taken out first.
+    results = [take((0,) * n, m, t, h)]
+    if n >= 3 and m < 4:
+        results.append(take((0, 0, 0), m + 1, t, h))
+    if n >= 2:
+        results.append(take((0, 0), m, t + 1, h))
+        if not h:
+            results.append(take((0, 0), m, t, 1))
+    if rank < 7 and counts[kind + 1] and counts[kind + 2] and m < 4:
+        results.append(take((0, 1, 2), m + 1, t, h))
+    if rank < 8 and counts[kind + 1]:
+        results.append(take((0, 1), m, t + 1, h))
+    if rank < 7 and counts[kind + 2]:
+        results.append(take((0, 2), m, t + 1, h))
+    return min(results)
+
+
+def search_shanten(counts: Sequence[int]) -> int:
+    """Return the shanten number of a hand of 13 or 14 tiles."""
+
+    kinds = sum(1 for n in counts if n)
+    pairs = sum(1 for n in counts if n >= 2)
+    terminals = [counts[i] for i in TERMINALS]
+    return min(
+        search_regular_shanten(counts),
+        6 - pairs + max(0, 7 - kinds),
+        13 - sum(1 for n in terminals if n) - any(n >= 2 for n in terminals),
+    )
+
+
+def search_ukeire(counts: Sequence[int]) -> int:
+    """Return the ukeire of a hand of 13 tiles by drawing each kind of tile."""
+
+    shanten = search_shanten(counts)
+    ukeire = 0
+    for kind, n in enumerate(counts):
+        if n >= 4:
+            continue
+        drawn = list(counts)
+        drawn[kind] += 1
+        if search_shanten(drawn) < shanten:
+            ukeire += 4 - n
+    return ukeire
+
+
+def deal(rnd: random.Random, kinds: Sequence[int], size: int) -> list[int]:
+    """Return the counts of `size` tiles dealt from four tiles of each of `kinds`."""
+
+    counts = [0] * NUM_KINDS
+    for kind in rnd.sample([i for i in kinds for _ in range(4)], size):
+        counts[kind] += 1
+    return counts
+
+
+class TestShanten(unittest.TestCase):
+    """The memoized tables agree with the brute-force search."""
+
+    def assert_hands(self, hands: Sequence[list[int]]) -> None:
+        for counts in hands:
+            with self.subTest(counts=counts):
+                self.assertEqual(
+                    tuple(evaluate_hand(counts)),
+                    (search_shanten(counts), search_ukeire(counts)),
+                )
+
+    def test_known_hands(self) -> None:
+        for hand, shanten in (
+            ("1m2m3m4p5p6p7s8s9s東東東白", 0),
+            ("1m9m1p9p1s9s東南西北白発中", 0),
+            ("1m1m3m3m5p5p7p7p9s9s東東白", 0),
+            ("1m4m7m2p5p8p3s6s9s東南西北", 6),
+            ("1m2m3m4m5m6m7m8m9m1p1p1p2p", 0),
+        ):
+            with self.subTest(hand=hand):
+                self.assertEqual(calculate_shanten(count_tiles(hand)), shanten)
+        self.assert_hands([count_tiles("1m2m3m4p5p6p7s8s9s東東東白")])
+
+    def test_random_hands(self) -> None:
+        rnd = random.Random(0)
+        self.assert_hands([deal(rnd, range(NUM_KINDS), 13) for _ in range(NUM_HANDS)])
+
+    def test_one_suit_hands(self) -> None:
+        # Many tiles in a suit take the most paths of `decompose`.
+        rnd = random.Random(1)
+        self.assert_hands([
+            deal(rnd, range(base, base + size), 13)
+            for base, size in ((0, 9), (9, 9), (HONORS, 7))
+            for _ in range(NUM_HANDS // 10)
+        ])
+
+    def test_called_melds(self) -> None:
+        rnd = random.Random(2)
+        for _ in range(NUM_HANDS):
+            melds = rnd.randrange(5)
+            counts = deal(rnd, range(NUM_KINDS), 13 - 3 * melds + rnd.randrange(2))
+            with self.subTest(counts=counts, melds=melds):
+                self.assertEqual(
+                    calculate_regular_shanten(counts, melds),
+                    search_regular_shanten(counts, melds),
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
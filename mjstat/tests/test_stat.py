@@ -0,0 +1,100 @@
+"""test_stat.py: Test function `mjstat.stat.evaluate_players`."""
+
+from __future__ import annotations
+
+import unittest
+from itertools import islice
+from typing import TYPE_CHECKING
+
+from mjstat.bench import create_settings
+from mjstat.model import ScoreSheet, apply_transforms
+from mjstat.stat import (
+    create_player_stats,
+    evaluate_losing,
+    evaluate_melding,
+    evaluate_placing,
+    evaluate_players,
+    evaluate_riichi,
+    evaluate_start_hands,
+    evaluate_winning,
+    evaluate_yaku_frequency,
+)
+from mjstat.streamparser import MJScoreStreamParser
+from mjstat.synth import generate_games
+
+if TYPE_CHECKING:
+    from argparse import Namespace
+    from typing import Final
+
+    from mjstat.model import PlayerStats
+
+# The functions `evaluate_players` stands for, in the order of `mjscore`.
+EVALUATE_FUNCTIONS: Final = (
+    evaluate_placing,
+    evaluate_winning,
+    evaluate_losing,
+    evaluate_riichi,
+    evaluate_melding,
+    evaluate_yaku_frequency,
+    evaluate_start_hands,
+)
+
+
+def create_sheet(text: str, settings: Namespace) -> ScoreSheet:
+    """Return the transformed score sheet of `text`."""
+
+    sheet = ScoreSheet(games=[], settings=settings, since="", until="")
+    MJScoreStreamParser().parse(text, sheet)
+    apply_transforms(sheet)
+    return sheet
+
+
+def to_records(player_stats_list: list[PlayerStats]) -> list[dict[str, object]]:
+    """Return `player_stats_list` without the games, which are shared by both."""
+
+    return [
+        {key: value for key, value in i.items() if key != "games"}
+        for i in player_stats_list
+    ]
+
+
+class TestEvaluatePlayers(unittest.TestCase):
+    """`evaluate_players` stores the same stats as the `evaluate_*` functions."""
+
+    def evaluate_both(self, text: str) -> None:
+        """Evaluate the players of `text` with `-F -Y -T all` both ways and assert
+        that the stats are equal.
+        """
+
+        settings = create_settings(start_hands=True)
+        sheet = create_sheet(text, settings)
+        names = sorted({name for game in sheet["games"] for name in game["players"]})
+
+        expected = create_player_stats(sheet, *names)
+        for player_stats in expected:
+            for func in EVALUATE_FUNCTIONS:
+                func(player_stats)
+
+        actual = create_player_stats(sheet, *names)
+        evaluate_players(
+            sheet,
+            actual,
+            settings.fundamental,
+            settings.yaku,
+            settings.start_hands,
+        )
+        self.assertEqual(to_records(actual), to_records(expected))
+
+    def test_synthetic_games(self) -> None:
+        for seed in range(3):
+            with self.subTest(seed=seed):
+                self.evaluate_both("".join(islice(generate_games(seed), 20)))
+
+    def test_name_in_two_seats(self) -> None:
+        # Only the first seat of a name counts.
+        text = "".join(islice(generate_games(0), 20))
+        self.evaluate_both(text.replace("下家", "対面"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""test_streamparser.py: Test class `mjstat.streamparser.MJScoreStreamParser`."""
+
+from __future__ import annotations
+
+import unittest
+from argparse import Namespace
+from typing import TYPE_CHECKING
+
+from mjstat.model import ScoreSheet
+from mjstat.parser import MJScoreParser
+from mjstat.streamparser import MJScoreStreamParser
+from mjstat.testdata import TEST_INPUT
+
+if TYPE_CHECKING:
+    from mjstat.model import GameStats
+
+
+def create_sheet(since: str = "", until: str = "") -> ScoreSheet:
+    """Return an empty score sheet for a period."""
+
+    return ScoreSheet(
+        games=[],
+        settings=Namespace(debug=False, verbose=False),
+        since=since,
+        until=until,
+    )
+
+
+def to_records(games: list[GameStats]) -> list[dict[str, object]]:
+    """Return `games` without the back-references from rounds to games, which
+    cannot be compared.
+    """
+
+    return [
+        {
+            **game,
+            "rounds": [
+                {key: value for key, value in round.items() if key != "game"}
+                for round in game["rounds"]
+            ],
+        }
+        for game in games
+    ]
+
+
+class TestEquivalence(unittest.TestCase):
+    """Both parsers build the same records."""
+
+    def parse_both(
+        self,
+        text: str,
+        since: str = "",
+        until: str = "",
+    ) -> list[dict[str, object]]:
+        """Parse `text` with both parsers, assert that the records are equal and
+        return them.
+        """
+
+        expected = create_sheet(since, until)
+        MJScoreParser().parse(text, expected)
+        actual = create_sheet(since, until)
+        MJScoreStreamParser().parse(text, actual)
+
+        records = to_records(expected["games"])
+        self.assertEqual(to_records(actual["games"]), records)
+        return records
+
+    def test_finished_game(self) -> None:
+        (game,) = self.parse_both(TEST_INPUT)
+        self.assertEqual(game["started_at"], "2016/01/01 00:43")
+        self.assertEqual(game["finished_at"], "2016/01/01 00:47")
+        self.assertEqual(len(game["rounds"]), 5)
+
+    def test_games_in_a_row(self) -> None:
+        games = self.parse_both(TEST_INPUT * 3)
+        self.assertEqual(len(games), 3)
+
+    def test_unfinished_game(self) -> None:
+        # The game is cut before every line up to the last one, e.g. while it is
+        # being written.
+        lines = TEST_INPUT.split("\n")
+        closing = next(i for i, line in enumerate(lines) if "終了" in line)
+        for i in range(closing + 1):
+            with self.subTest(lines=i):
+                games = self.parse_both("\n".join(lines[:i]))
+                if games:
+                    self.assertEqual(games[0]["finished_at"], "")
+
+    def test_period(self) -> None:
+        self.assertEqual(self.parse_both(TEST_INPUT, since="2016/01/02"), [])
+        self.assertEqual(self.parse_both(TEST_INPUT, until="2016/01/01 00:43"), [])
+        self.assertEqual(len(self.parse_both(TEST_INPUT, since="2016/01/01")), 1)
+
+
+class TestOnGame(unittest.TestCase):
+    """A finished game is passed to `on_game` and removed from the sheet."""
+
+    def test_on_game(self) -> None:
+        games: list[GameStats] = []
+        sheet = create_sheet()
+        unfinished = TEST_INPUT[: TEST_INPUT.index("  ---- 試合結果")]
+        MJScoreStreamParser(games.append).parse(TEST_INPUT + unfinished, sheet)
+
+        self.assertEqual(len(games), 1)
+        self.assertEqual(games[0]["finished_at"], "2016/01/01 00:47")
+        self.assertEqual(len(sheet["games"]), 1)
+        self.assertEqual(sheet["games"][0]["finished_at"], "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,30 +2,22 @@
 
 from __future__ import annotations
 
-from itertools import product
+import os
+from importlib import import_module
 from types import ModuleType
-from typing import TYPE_CHECKING, TypedDict, cast
+from typing import TYPE_CHECKING, NamedTuple, TypedDict, cast
 
 if TYPE_CHECKING:
-    from collections.abc import Callable, Collection, MutableSequence
+    from collections.abc import Callable, Collection, Iterable, Sequence
     from typing import Final
 
-from docutils.io import Output  # type: ignore[import-untyped]
-from jinja2 import Environment
+    from docutils.io import Output  # type: ignore[import-untyped]
+    from jinja2 import Environment, Template
 
 from .languages import get_language
-from .model import PlayerStats, ScoreSheet, YakuTable
-from .stat import (
-    create_player_stats,
-    evaluate_losing,
-    evaluate_melding,
-    evaluate_placing,
-    evaluate_riichi,
-    evaluate_winning,
-    evaluate_yaku_frequency,
-)
-
-type EvaluatorType = Callable[[PlayerStats], None]
+from .model import PlayerStats, ScoreSheet, YakuTable, get_player_index
+from .profiling import stage
+from .stat import StatsTable, create_player_stats, evaluate_players
 
 
 class Parts(TypedDict):
@@ -43,14 +35,25 @@ class MJScoreWriter:
         self.output: str
         self.destination: Output
         self.parts: Parts
+        self.stats_table: StatsTable | None = None
+
+    def write(
+        self,
+        sheet: ScoreSheet,
+        destination: Output,
+        table: StatsTable | None = None,
+    ) -> str:
+        """Output `sheet` into `destination`.
 
-    def write(self, sheet: ScoreSheet, destination: Output) -> str:
-        """Output `sheet` into `destination`."""
+        If `table` is given, the statistics are taken from it rather than evaluated
+        from the games of `sheet`.
+        """
 
         settings: Final = sheet["settings"]
         self.language = get_language(settings.language)
         self.score_sheet = sheet
         self.destination = destination
+        self.stats_table = table
 
         self.translate()
         return cast(str, self.destination.write(self.output))
@@ -59,11 +62,19 @@ class MJScoreWriter:
         """Translate `self.score_sheet` into `self.output`."""
 
         self.assemble_parts()
-        self.output = fill_template(
-            self.parts["player_data"],
-            self.language,
-            **self.parts["options"],
+
+        # Compiled templates are saved along with the game cache, if any.
+        settings = self.score_sheet["settings"]
+        bytecode_dir = (
+            os.path.join(settings.cache_dir, "templates") if settings.cache else None
         )
+        with stage("fill_template"):
+            self.output = fill_template(
+                self.parts["player_data"],
+                self.language,
+                **self.parts["options"],
+                bytecode_dir=bytecode_dir,
+            )
 
     def assemble_parts(self) -> None:
         """Assemble the `self.parts` dictionary."""
@@ -71,37 +82,75 @@ class MJScoreWriter:
         sheet = self.score_sheet
         settings = sheet["settings"]
         target_player = settings.target_player
+        table = self.stats_table
 
         player_names: Collection[str]
-        if target_player == "all":
+        if target_player == "all" and table is not None:
+            player_names = table.player_ids.keys()
+        elif target_player == "all":
             # Detect all players from game data.
-            # Note: g['players'] is a tuple of str
-            player_names = set()
-            for g in sheet["games"]:
-                player_names.update(g["players"])
+            player_names = get_player_index(sheet).entries.keys()
         else:
             player_names = (target_player,)
 
-        player_stats_list: Final = create_player_stats(sheet, *player_names)
-
-        evaluators: list[EvaluatorType] = []
-        if settings.fundamental:
-            evaluators.extend((
-                evaluate_placing,
-                evaluate_winning,
-                evaluate_losing,
-                evaluate_riichi,
-                evaluate_melding,
-            ))
-        if settings.yaku:
-            evaluators.append(evaluate_yaku_frequency)
-
-        for func, player in product(evaluators, player_stats_list):
-            func(player)
+        with stage("create_player_stats"):
+            player_stats_list: Final = (
+                table.create_player_stats(*player_names)
+                if table is not None
+                else create_player_stats(sheet, *player_names)
+            )
+
+        if table is not None:
+            with stage("fill_player_stats"):
+                for player_stats in player_stats_list:
+                    table.fill_player_stats(
+                        player_stats,
+                        fundamental=settings.fundamental,
+                        yaku=settings.yaku,
+                        start_hands=settings.start_hands,
+                    )
+        elif settings.fundamental or settings.yaku or settings.start_hands:
+            # All the players at once rather than one by one.
+            with stage("evaluate_players"):
+                evaluate_players(
+                    sheet,
+                    player_stats_list,
+                    fundamental=settings.fundamental,
+                    yaku=settings.yaku,
+                    start_hands=settings.start_hands,
+                )
+
+        # The bootstrap needs the games, which a table does not keep.
+        resamples = int(settings.bootstrap)
+        intervals = bool(settings.fundamental and resamples and table is None)
+        if intervals:
+            from .bootstrap import evaluate_intervals
+
+            evaluate_intervals(
+                sheet,
+                player_stats_list,
+                resamples,
+                settings.bootstrap_unit,
+                settings.seed,
+            )
+
+        # Unlike the others, this is about pairs of players, which a table lacks.
+        opponents = bool(settings.head_to_head and table is None)
+        if opponents:
+            from .opponents import evaluate_opponents
+
+            with stage("evaluate_opponents"):
+                evaluate_opponents(sheet, player_stats_list)
 
         self.parts = Parts(
             player_data=player_stats_list,
-            options=dict(fundamental=settings.fundamental, yaku=settings.yaku),
+            options=dict(
+                fundamental=settings.fundamental,
+                yaku=settings.yaku,
+                start_hands=settings.start_hands,
+                intervals=intervals,
+                opponents=opponents,
+            ),
         )
 
 
@@ -115,40 +164,199 @@ def format_percentage(val: float) -> str:
     return f"{val:.2%}"
 
 
-def fill_template(
-    player_stats: MutableSequence[PlayerStats],
-    lang: ModuleType,
-    fundamental: bool,
-    yaku: bool,
-) -> str:
-    """Build long text which shows the statistics of the target player(s)."""
+class LanguageTemplates(NamedTuple):
+    """The compiled templates of a language module.
+
+    Attributes:
+      :summary:        The template `tmpl_summary`.
+      :fundamental:    The template `tmpl_fundamental`.
+      :yaku_freq:      The template `tmpl_yaku_freq`.
+      :start_hands:    The template `tmpl_start_hands`.
+      :intervals:      The template `tmpl_intervals`.
+      :opponents:      The template `tmpl_opponents`.
+      :yaku_name_map:  The mapping from yaku to their names in the language.
+    """
+
+    summary: Template
+    fundamental: Template
+    yaku_freq: Template
+    start_hands: Template
+    intervals: Template
+    opponents: Template
+    yaku_name_map: dict[YakuTable, str]
+
+
+# Environments keyed by the directory of the bytecode cache.
+environment_cache: dict[str | None, Environment] = {}
+
+# Templates keyed by the name of the language module and the directory above.
+template_cache: dict[tuple[str, str | None], LanguageTemplates] = {}
+
+
+def load_template(name: str) -> tuple[str, None, Callable[[], bool]]:
+    """Load the source of a template named e.g. "mjstat.languages.en:tmpl_summary".
+
+    The templates are constants of language modules, so that they are always up to
+    date.
+    """
+
+    module_name, _, attr = name.partition(":")
+    return getattr(import_module(module_name), attr), None, lambda: True
+
+
+def get_environment(bytecode_dir: str | None = None) -> Environment:
+    """Return the Jinja2 environment shared by all reports.
+
+    Args:
+      :bytecode_dir: The directory where compiled templates are saved, so that later
+                     runs can skip compiling them. None means they are kept only in
+                     memory.
+    """
 
-    target_games: Final = player_stats[0]["games"] if player_stats else None
-    if not target_games:
-        return "NO DATA\n"
+    if bytecode_dir in environment_cache:
+        return environment_cache[bytecode_dir]
 
-    env = Environment(autoescape=False)
+    # Jinja2 is imported only when a report is rendered.
+    from jinja2 import Environment, FileSystemBytecodeCache, FunctionLoader
+
+    bytecode_cache = None
+    if bytecode_dir is not None:
+        os.makedirs(bytecode_dir, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(bytecode_dir)
+
+    env = Environment(
+        loader=FunctionLoader(load_template),
+        bytecode_cache=bytecode_cache,
+        autoescape=False,
+        auto_reload=False,
+    )
     env.filters.update(
         format_float=format_float,
         format_percentage=format_percentage,
     )
+    environment_cache[bytecode_dir] = env
+    return env
 
-    output_text = env.from_string(lang.tmpl_summary).render(
-        count_games=len(target_games),
-        started_at=target_games[0]["started_at"],
-        finished_at=target_games[-1]["finished_at"],
-        data=player_stats,
+
+def get_templates(
+    lang: ModuleType,
+    bytecode_dir: str | None = None,
+) -> LanguageTemplates:
+    """Return the compiled templates of a language module.
+
+    Args:
+      :lang:         A module returned by `mjstat.languages.get_language`.
+      :bytecode_dir: See `get_environment`.
+    """
+
+    key = (lang.__name__, bytecode_dir)
+    if key in template_cache:
+        return template_cache[key]
+
+    env = get_environment(bytecode_dir)
+    templates = LanguageTemplates(
+        summary=env.get_template(f"{lang.__name__}:tmpl_summary"),
+        fundamental=env.get_template(f"{lang.__name__}:tmpl_fundamental"),
+        yaku_freq=env.get_template(f"{lang.__name__}:tmpl_yaku_freq"),
+        start_hands=env.get_template(f"{lang.__name__}:tmpl_start_hands"),
+        intervals=env.get_template(f"{lang.__name__}:tmpl_intervals"),
+        opponents=env.get_template(f"{lang.__name__}:tmpl_opponents"),
+        yaku_name_map={y: lang.yaku_names[i] for i, y in enumerate(YakuTable)},
     )
+    template_cache[key] = templates
+    return templates
+
+
+def fill_template(
+    player_stats: Sequence[PlayerStats],
+    lang: ModuleType,
+    fundamental: bool,
+    yaku: bool,
+    bytecode_dir: str | None = None,
+    start_hands: bool = False,
+    intervals: bool = False,
+    opponents: bool = False,
+) -> str:
+    """Build long text which shows the statistics of the target player(s)."""
+
+    return fill_templates(
+        (player_stats,),
+        lang,
+        fundamental,
+        yaku,
+        bytecode_dir,
+        start_hands,
+        intervals,
+        opponents,
+    )[0]
 
-    if fundamental:
-        output_text += env.from_string(lang.tmpl_fundamental).render(data=player_stats)
 
-    if yaku:
-        yaku_name_map = {y: lang.yaku_names[i] for i, y in enumerate(YakuTable)}
-        output_text += env.from_string(lang.tmpl_yaku_freq).render(
+def fill_templates(
+    player_stats_lists: Iterable[Sequence[PlayerStats]],
+    lang: ModuleType,
+    fundamental: bool,
+    yaku: bool,
+    bytecode_dir: str | None = None,
+    start_hands: bool = False,
+    intervals: bool = False,
+    opponents: bool = False,
+) -> list[str]:
+    """Build the text of a report for each element of `player_stats_lists`, e.g. for
+    many players or many reference periods, with the same templates.
+
+    Args:
+      :player_stats_lists: Lists returned by `mjstat.stat.create_player_stats`.
+      :lang:               A module returned by `mjstat.languages.get_language`.
+      :fundamental:        Include the fundamental statistics.
+      :yaku:               Include the frequency of yaku.
+      :bytecode_dir:       See `get_environment`.
+      :start_hands:        Include the tile efficiency of start hands.
+      :intervals:          Include the confidence intervals of the fundamental
+                           statistics, which must have been evaluated.
+      :opponents:          Include the stats against each opponent, which must have
+                           been evaluated.
+
+    Returns:
+      A list of the texts in the same order as `player_stats_lists`.
+    """
+
+    templates: LanguageTemplates | None = None
+    output_texts = list[str]()
+    for player_stats in player_stats_lists:
+        target = player_stats[0] if player_stats else None
+        if not target or not target["count_games"]:
+            output_texts.append("NO DATA\n")
+            continue
+
+        # Nothing is compiled unless there is something to render.
+        if templates is None:
+            templates = get_templates(lang, bytecode_dir)
+
+        output_text = templates.summary.render(
+            count_games=target["count_games"],
+            started_at=target["started_at"],
+            finished_at=target["finished_at"],
             data=player_stats,
-            YakuTable=YakuTable,
-            yaku_name_map=yaku_name_map,
         )
 
-    return output_text
+        if fundamental:
+            output_text += templates.fundamental.render(data=player_stats)
+            if intervals:
+                output_text += templates.intervals.render(data=player_stats)
+
+        if yaku:
+            output_text += templates.yaku_freq.render(
+                data=player_stats,
+                YakuTable=YakuTable,
+                yaku_name_map=templates.yaku_name_map,
+            )
+
+        if start_hands:
+            output_text += templates.start_hands.render(data=player_stats)
+
+        if opponents:
+            output_text += templates.opponents.render(data=player_stats)
+
+        output_texts.append(output_text)
+
+    return output_texts